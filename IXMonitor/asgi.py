@@ -0,0 +1,274 @@
+# asgi.py
+"""
+Asyncio entry point (python run.py --asgi).
+MJPEG fan-out, telemetry SSE and the AI-server proxy routes run as
+coroutines on one event loop, so an idle viewer costs a task instead of
+an OS thread. Blocking hardware calls go to a small thread pool and
+every other route is served by the Flask app through a WSGI bridge.
+"""
+import asyncio
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from a2wsgi import WSGIMiddleware
+from simple_websocket import ConnectionClosed
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+import main
+from config import ASGI_HARDWARE_WORKERS, ASGI_WEBSOCKET_WORKERS, ASGI_WSGI_WORKERS
+from robot import server_client
+from robot.camera import DETECTION_SPLITTER_PORT, RAW_SPLITTER_PORT
+from robot.frame_broker import MJPEG_MIMETYPE, MJPEG_PART_HEADER, MJPEG_PART_TRAILER, frame_send_seconds
+from robot.telemetry import format_event
+
+hardware_pool = ThreadPoolExecutor(max_workers=ASGI_HARDWARE_WORKERS, thread_name_prefix="hardware")
+websocket_pool = ThreadPoolExecutor(max_workers=ASGI_WEBSOCKET_WORKERS, thread_name_prefix="websocket")
+
+
+async def run_blocking(func, *args):
+    """Run a blocking (hardware) call on the hardware pool."""
+    return await asyncio.get_running_loop().run_in_executor(hardware_pool, func, *args)
+
+
+class AsyncWaker:
+    """An asyncio.Event that other threads can set without blocking."""
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def __call__(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class LoopWaker:
+    """
+    Wakes every event-loop viewer of one broker with a single callback
+    per publish. The encoder thread only schedules the callback (at most
+    one pending at a time); waking the viewers happens on the loop.
+    """
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.pending = False
+        self.viewers = 0
+
+    def __call__(self):
+        if not self.pending:
+            self.pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self.pending = False
+        # Replace the event so viewers that wait again need the next publish
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+# -----------------
+# MJPEG streaming
+# -----------------
+_loop_wakers = {}  # port -> LoopWaker shared by that port's viewers
+
+def _join_viewers(port, broker):
+    waker = _loop_wakers.get(port)
+    if waker is None:
+        waker = _loop_wakers[port] = LoopWaker()
+        broker.add_waker(waker)
+    waker.viewers += 1
+    return waker
+
+
+def _leave_viewers(port, broker, waker):
+    waker.viewers -= 1
+    if waker.viewers == 0 and _loop_wakers.get(port) is waker:
+        del _loop_wakers[port]
+        broker.remove_waker(waker)
+
+
+async def _mjpeg(port):
+    """
+    Stream one splitter port, holding a subscription for the generator's
+    lifetime. Acquiring here rather than in the route means a client
+    that disconnects before the body starts never takes a subscription.
+    """
+    broker = main.streams.outputs[port].broker
+    send_series = frame_send_seconds.labels(stream=main.streams.names[port])
+    acquired = False
+    subscriber = waker = None
+    try:
+        await run_blocking(main.streams.acquire, port)
+        acquired = True
+        subscriber = broker.subscribe()
+        waker = _join_viewers(port, broker)
+        while True:
+            # Take the event before checking so a publish in between is not lost
+            event = waker.event
+            frame = subscriber.next_frame(timeout=0)
+            if frame is None:
+                await event.wait()
+                continue
+            seq, view, skipped = frame
+            start = time.monotonic()
+            yield MJPEG_PART_HEADER % (len(view), seq, skipped)
+            yield view
+            yield MJPEG_PART_TRAILER
+            send_series.observe(time.monotonic() - start)
+    finally:
+        if waker is not None:
+            _leave_viewers(port, broker, waker)
+        if subscriber is not None:
+            subscriber.close()
+        if acquired:
+            main.streams.release(port)
+
+
+async def _stream_response(port):
+    await run_blocking(main.get_camera)
+    return StreamingResponse(_mjpeg(port), media_type=MJPEG_MIMETYPE)
+
+
+async def video_feed(request):
+    return await _stream_response(RAW_SPLITTER_PORT)
+
+
+async def video_feed_detection(request):
+    return await _stream_response(DETECTION_SPLITTER_PORT)
+
+
+# -----------------
+# Telemetry (Server-Sent Events)
+# -----------------
+async def telemetry_stream(request):
+    hub = main.telemetry
+
+    async def events():
+        waker = AsyncWaker()
+        client = hub.subscribe(waker=waker)
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                waker.event.clear()
+                try:
+                    changes = client.get_nowait()
+                except queue.Empty:
+                    try:
+                        await asyncio.wait_for(waker.event.wait(), hub.heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                    continue
+                yield format_event(changes)
+        finally:
+            hub.unsubscribe(client)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# -----------------
+# AI server proxy routes
+# -----------------
+async def chat_text(request):
+    from robot.audio import send_text_to_server_async, play_audio_message
+
+    data = await request.json()
+    text = data.get("text", "").strip()
+    if not text:
+        return JSONResponse({"success": False, "error": "Text cannot be empty"}, status_code=400)
+
+    result = await send_text_to_server_async(text)
+    if result["success"] and data.get("speak", True):
+        play_audio_message(result.get("ai_response", ""), wait=False)
+    return JSONResponse(result)
+
+
+async def vision_analyze(request):
+    from robot.autonomous import capture_frame_from_camera
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    prompt = data.get("prompt", "Describe what you see in detail")
+    try:
+        cam, _, raw_stream = await run_blocking(main.get_camera)
+        frame_bytes = await run_blocking(capture_frame_from_camera, cam, raw_stream)
+        response = await server_client.async_post(
+            "/vision/analyze",
+            files={'image': ('frame.jpg', frame_bytes, 'image/jpeg')},
+            data={'prompt': prompt}
+        )
+        response.raise_for_status()
+        return JSONResponse(response.json())
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+# -----------------
+# WebSockets
+# -----------------
+class BlockingWebSocket:
+    """
+    The flask-sock interface (receive/send) over a Starlette WebSocket,
+    so the existing handlers run unchanged on the websocket pool.
+    """
+    def __init__(self, websocket, loop):
+        self.websocket = websocket
+        self.loop = loop
+
+    async def _receive(self):
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise ConnectionClosed()
+        return message.get("text") if message.get("text") is not None else message.get("bytes")
+
+    def receive(self, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(self._receive(), self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            return None
+
+    def send(self, data):
+        if isinstance(data, str):
+            coro = self.websocket.send_text(data)
+        else:
+            coro = self.websocket.send_bytes(bytes(data))
+        asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+def _flask_sock_handler(endpoint):
+    # flask-sock registers a wrapper; functools.wraps keeps the handler
+    return main.app.view_functions[endpoint].__wrapped__
+
+
+def websocket_route(endpoint):
+    handler = _flask_sock_handler(endpoint)
+
+    async def route(websocket):
+        await websocket.accept()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(websocket_pool, handler, BlockingWebSocket(websocket, loop))
+        except (ConnectionClosed, WebSocketDisconnect):
+            return
+        await websocket.close()
+
+    return route
+
+
+routes = [
+    Route("/video_feed", video_feed),
+    Route("/video_feed_detection", video_feed_detection),
+    Route("/telemetry/stream", telemetry_stream),
+    Route("/chat/text", chat_text, methods=["POST"]),
+    Route("/vision/analyze", vision_analyze, methods=["POST"]),
+    WebSocketRoute("/teleop/ws", websocket_route("teleop_ws")),
+    WebSocketRoute("/chat/record/ws", websocket_route("chat_record_ws")),
+    # Everything else is served by the Flask app
+    Mount("/", WSGIMiddleware(main.app, workers=ASGI_WSGI_WORKERS)),
+]
+
+app = Starlette(routes=routes)
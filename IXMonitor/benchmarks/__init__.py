@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+"""
+Measurement scripts. Run from the IXMonitor directory, e.g.
+python -m benchmarks.distance_filters
+"""
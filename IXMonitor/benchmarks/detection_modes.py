@@ -0,0 +1,139 @@
+# benchmarks/detection_modes.py
+"""
+Compare image-mode and boxes-mode detection against stub_server.py.
+
+Feeds synthetic CAMERA_RES frames at CAMERA_FPS into a StreamingOutput
+per mode. The stub server runs in-process with a fixed --delay. Reports
+bytes per detection request in both directions and the capture-to-
+stream latency of detection results. In boxes mode that latency
+includes waiting for the next live frame to draw on, up to one frame
+period. Robot and stub share this
+machine's CPU, so absolute latencies are pessimistic. Compare the modes
+with each other.
+
+Usage: python -m benchmarks.detection_modes [--seconds 10] [--delay 0.05]
+"""
+import argparse
+import io
+import time
+from threading import Thread
+import numpy as np
+from PIL import Image, ImageDraw
+from werkzeug.serving import WSGIRequestHandler, make_server
+import stub_server
+from config import CAMERA_RES, CAMERA_FPS, DETECTION_FRAME_SKIP, DETECTION_TIMEOUT
+from robot.camera import StreamingOutput, detection_result_seconds
+
+MODES = [
+    ("image", {"mode": "image"}),
+    ("boxes", {"mode": "boxes", "tracking": False}),
+    ("boxes+tracking", {"mode": "boxes", "tracking": True}),
+]
+
+
+def make_frames(count=30, seed=1):
+    """Textured frames with a moving block, JPEG encoded like the camera's."""
+    rng = np.random.default_rng(seed)
+    width, height = CAMERA_RES
+    # Smooth texture plus sensor noise, close to a real scene's JPEG size
+    texture = Image.fromarray(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8))
+    background = np.asarray(texture.resize(CAMERA_RES, Image.BICUBIC), dtype=np.int16)
+    background = np.clip(background + rng.normal(0, 4, background.shape), 0, 255).astype(np.uint8)
+    frames = []
+    for i in range(count):
+        image = Image.fromarray(background)
+        x = int((width - 80) * i / count)
+        ImageDraw.Draw(image).rectangle([x, 60, x + 80, 180], fill=(200, 170, 150))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_stub(delay):
+    stub_server.delay = delay
+    server = make_server("127.0.0.1", 0, stub_server.app, threaded=True, request_handler=_QuietHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _latency_series(mode):
+    return detection_result_seconds.snapshot().get((mode,), {"count": 0, "sum": 0.0, "buckets": None})
+
+
+def _percentile(buckets_before, buckets_after, fraction):
+    """Upper bucket bound holding the given fraction of the new observations."""
+    counts = np.array(buckets_after) - (np.array(buckets_before) if buckets_before else 0)
+    if counts.sum() == 0:
+        return None
+    index = int(np.searchsorted(np.cumsum(counts), fraction * counts.sum()))
+    bounds = detection_result_seconds.buckets
+    return bounds[index] * 1000 if index < len(bounds) else float("inf")
+
+
+def run_mode(name, options, base_url, frames, seconds):
+    url = base_url + ("/detect/boxes" if options["mode"] == "boxes" else "/detect")
+    output = StreamingOutput(face_server_url=url, frame_skip=DETECTION_FRAME_SKIP,
+                             timeout=DETECTION_TIMEOUT, **options)
+    output.set_name(name)
+    before = _latency_series(options["mode"])
+    period = 1.0 / CAMERA_FPS
+    next_tick = time.monotonic()
+    end = next_tick + seconds
+    i = 0
+    while time.monotonic() < end:
+        output.write(frames[i % len(frames)])
+        i += 1
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    time.sleep(DETECTION_TIMEOUT)  # let the last request finish
+    after = _latency_series(options["mode"])
+
+    stats = output.get_detection_stats()
+    requests = stats["annotated"] + stats["failed"]
+    count = after["count"] - before["count"]
+    return {
+        "frames": i,
+        "requests": requests,
+        "failed": stats["failed"],
+        "sent_per_request": stats["bytes_sent"] / requests if requests else 0,
+        "received_per_request": stats["bytes_received"] / requests if requests else 0,
+        "sent_per_frame": stats["bytes_sent"] / i,
+        "received_per_frame": stats["bytes_received"] / i,
+        "latency_avg_ms": (after["sum"] - before["sum"]) / count * 1000 if count else None,
+        "latency_p95_ms": _percentile(before["buckets"], after["buckets"], 0.95) if count else None,
+    }
+
+
+def run(seconds=10.0, delay=0.05):
+    frames = make_frames()
+    server, base_url = start_stub(delay)
+    print(f"{CAMERA_RES[0]}x{CAMERA_RES[1]} @ {CAMERA_FPS} fps, frame {np.mean([len(f) for f in frames]) / 1024:.1f} KB, "
+          f"frame_skip {DETECTION_FRAME_SKIP}, stub delay {delay * 1000:.0f} ms, {seconds:.0f} s per mode")
+    print(f"{'mode':15} {'requests':>8} {'failed':>6} {'KB up/req':>9} {'KB down/req':>11} "
+          f"{'KB/frame':>8} {'latency avg ms':>14} {'p95 ms <=':>9}")
+    results = {}
+    try:
+        for name, options in MODES:
+            r = results[name] = run_mode(name, options, base_url, frames, seconds)
+            avg = f"{r['latency_avg_ms']:.0f}" if r["latency_avg_ms"] is not None else "-"
+            p95 = f"{r['latency_p95_ms']:.0f}" if r["latency_p95_ms"] is not None else "-"
+            print(f"{name:15} {r['requests']:8} {r['failed']:6} {r['sent_per_request'] / 1024:9.1f} "
+                  f"{r['received_per_request'] / 1024:11.1f} "
+                  f"{(r['sent_per_frame'] + r['received_per_frame']) / 1024:8.1f} {avg:>14} {p95:>9}")
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="run time per mode")
+    parser.add_argument("--delay", type=float, default=0.05, help="stub server delay per request")
+    args = parser.parse_args()
+    run(args.seconds, args.delay)
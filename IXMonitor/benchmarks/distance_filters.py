@@ -0,0 +1,119 @@
+# benchmarks/distance_filters.py
+"""
+Replay distance traces through every filter and report stop lag and
+false stops.
+
+Traces are synthetic VL53L0X-like readings at DISTANCE_SAMPLE_HZ:
+Gaussian noise plus occasional short glitch readings. A recorded
+trace (CSV of "timestamp,mm" lines) can be replayed with --trace.
+
+- lag: how much later than the true distance the filtered distance
+  crosses the stop threshold while approaching a wall
+- false stops: readings where the filtered distance is under the
+  threshold while the robot stands still well outside it
+
+Usage: python -m benchmarks.distance_filters [--trace FILE] [--runs N]
+"""
+import argparse
+import numpy as np
+from config import DISTANCE_SAMPLE_HZ, DISTANCE_FILTER_WINDOW
+from robot.distance_filter import FILTERS, make_filter, replay
+
+STOP_THRESHOLD_MM = 250   # the 25 cm forward stop of the autonomous loop
+NOISE_MM = 15.0
+GLITCH_RATE = 0.03
+GLITCH_RANGE_MM = (40, 200)
+
+
+def _readings(true_mm, rng, glitch_rate=GLITCH_RATE):
+    readings = true_mm + rng.normal(0.0, NOISE_MM, len(true_mm))
+    glitches = rng.random(len(true_mm)) < glitch_rate
+    readings[glitches] = rng.uniform(*GLITCH_RANGE_MM, glitches.sum())
+    return np.clip(readings, 5, 3000)
+
+
+def approach_trace(rng, speed_mm_s=300.0, start_mm=1500.0, glitch_rate=GLITCH_RATE):
+    """Drive at a wall at constant speed. Returns (trace, true crossing time)."""
+    period = 1.0 / DISTANCE_SAMPLE_HZ
+    times = np.arange(0.0, (start_mm - 50) / speed_mm_s, period)
+    true_mm = start_mm - speed_mm_s * times
+    crossing = (start_mm - STOP_THRESHOLD_MM) / speed_mm_s
+    return list(zip(times, _readings(true_mm, rng, glitch_rate))), crossing
+
+
+def static_trace(rng, distance_mm=400.0, seconds=60.0):
+    """Stand still in front of an obstacle outside the stop threshold."""
+    times = np.arange(0.0, seconds, 1.0 / DISTANCE_SAMPLE_HZ)
+    return list(zip(times, _readings(np.full(len(times), distance_mm), rng)))
+
+
+def stop_lag(trace, crossing, distance_filter):
+    """Seconds between the true and the filtered threshold crossing."""
+    filtered, _ = replay(trace, distance_filter)
+    below = np.nonzero(filtered < STOP_THRESHOLD_MM)[0]
+    if not len(below):
+        return None
+    return trace[below[0]][0] - crossing
+
+
+def false_stops(trace, distance_filter):
+    """Fraction of readings the filter puts inside the stop threshold."""
+    filtered, _ = replay(trace, distance_filter)
+    return float(np.mean(filtered < STOP_THRESHOLD_MM))
+
+
+def load_trace(path):
+    """Read a "timestamp,mm" CSV; returns the trace starting at t=0."""
+    data = np.loadtxt(path, delimiter=",", ndmin=2)
+    return list(zip(data[:, 0] - data[0, 0], data[:, 1]))
+
+
+def run(runs=20, seed=1):
+    rng = np.random.default_rng(seed)
+    approaches = [approach_trace(rng) for _ in range(runs)]
+    clean = [approach_trace(rng, glitch_rate=0.0) for _ in range(runs)]
+    statics = [static_trace(rng) for _ in range(runs)]
+
+    print(f"{DISTANCE_SAMPLE_HZ} Hz, threshold {STOP_THRESHOLD_MM} mm, noise {NOISE_MM:.0f} mm, "
+          f"glitches {GLITCH_RATE:.0%}, {runs} runs per trace")
+    print(f"{'filter':8} {'lag ms':>8} {'lag ms (no glitch)':>19} {'false stops':>12} {'per min':>8}")
+    results = {}
+    for name in FILTERS:
+        distance_filter = make_filter(name, window=DISTANCE_FILTER_WINDOW)
+        lags = [stop_lag(trace, crossing, distance_filter) for trace, crossing in approaches]
+        clean_lags = [stop_lag(trace, crossing, distance_filter) for trace, crossing in clean]
+        # A glitch can trip a filter before the true crossing, giving a negative lag
+        lags = [lag for lag in lags if lag is not None]
+        clean_lags = [lag for lag in clean_lags if lag is not None]
+        rates = [false_stops(trace, distance_filter) for trace in statics]
+        per_min = np.mean(rates) * DISTANCE_SAMPLE_HZ * 60
+        results[name] = {
+            "lag_ms": float(np.median(lags)) * 1000,
+            "clean_lag_ms": float(np.median(clean_lags)) * 1000,
+            "false_stop_rate": float(np.mean(rates)),
+        }
+        print(f"{name:8} {results[name]['lag_ms']:8.0f} {results[name]['clean_lag_ms']:19.0f} "
+              f"{results[name]['false_stop_rate']:12.2%} {per_min:8.1f}")
+    return results
+
+
+def run_recorded(path):
+    trace = load_trace(path)
+    print(f"{path}: {len(trace)} readings over {trace[-1][0]:.1f} s")
+    print(f"{'filter':8} {'first stop s':>12} {'readings inside':>16}")
+    for name in FILTERS:
+        filtered, _ = replay(trace, make_filter(name, window=DISTANCE_FILTER_WINDOW))
+        below = np.nonzero(filtered < STOP_THRESHOLD_MM)[0]
+        first = f"{trace[below[0]][0]:.2f}" if len(below) else "-"
+        print(f"{name:8} {first:>12} {np.mean(filtered < STOP_THRESHOLD_MM):16.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trace", help="recorded timestamp,mm CSV to replay instead of synthetic traces")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    if args.trace:
+        run_recorded(args.trace)
+    else:
+        run(args.runs)
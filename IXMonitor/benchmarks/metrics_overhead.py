@@ -0,0 +1,112 @@
+# benchmarks/metrics_overhead.py
+"""
+CPU cost of the metrics hot paths at the real per-frame observation
+count.
+
+Per camera frame the app records:
+- one frame interval per recording stream
+- one send time per MJPEG viewer
+- a detection round trip, a server request and a capture-to-stream
+  latency for every DETECTION_FRAME_SKIP-th frame
+- DISTANCE_SAMPLE_HZ / CAMERA_FPS distance reads
+
+The script replays that mix against real Histogram and Counter objects
+and reports the share of one core it takes at CAMERA_FPS; the budget is
+1%. It also times a /metrics scrape. Run it on the robot itself, the
+numbers from a desktop CPU do not carry over to the Pi.
+
+Usage: python -m benchmarks.metrics_overhead [--viewers 5] [--frames 20000]
+"""
+import argparse
+import functools
+import time
+from config import CAMERA_FPS, DETECTION_FRAME_SKIP, DISTANCE_SAMPLE_HZ
+from robot import metrics
+
+ITERATIONS = 200000
+
+
+def _time_per_call(func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def frame_mix(viewers, streams=2):
+    """
+    Observations per camera frame as (metric name, labels, count, bound).
+    Counts are fractional; bound calls go through a labels() series like
+    the app's per-frame paths, the rest look their labels up per call.
+    """
+    detection_share = 1.0 / DETECTION_FRAME_SKIP
+    return [
+        ("frame_interval", {"stream": "raw"}, streams, True),
+        ("send", {"stream": "raw"}, viewers, True),
+        ("detection", {"mode": "boxes"}, detection_share, True),
+        ("detection_result", {"mode": "boxes"}, detection_share, True),
+        ("server_request", {"endpoint": "/detect/boxes"}, detection_share, False),
+        ("distance_read", {}, DISTANCE_SAMPLE_HZ / CAMERA_FPS, False),
+    ]
+
+
+def run(viewers=5, frames=20000):
+    # Separate names so the app's own series are untouched
+    histograms = {
+        "frame_interval": metrics.histogram("bench_frame_interval_seconds", "bench", labelnames=("stream",)),
+        "send": metrics.histogram("bench_send_seconds", "bench", labelnames=("stream",)),
+        "detection": metrics.histogram("bench_detection_seconds", "bench", labelnames=("mode",)),
+        "detection_result": metrics.histogram("bench_detection_result_seconds", "bench", labelnames=("mode",)),
+        "server_request": metrics.histogram("bench_server_request_seconds", "bench", labelnames=("endpoint",)),
+        "distance_read": metrics.histogram("bench_distance_read_seconds", "bench"),
+    }
+    counter = metrics.counter("bench_total", "bench", labelnames=("result",))
+    labelled = histograms["send"]
+    bound = labelled.labels(stream="raw")
+    bound_counter = counter.labels(result="memory")
+
+    observe_s = _time_per_call(lambda: labelled.observe(0.004, stream="raw"))
+    bound_s = _time_per_call(lambda: bound.observe(0.004))
+    unlabelled_s = _time_per_call(lambda: histograms["distance_read"].observe(0.004))
+    inc_s = _time_per_call(lambda: counter.inc(result="memory"))
+    bound_inc_s = _time_per_call(lambda: bound_counter.inc())
+    print(f"Histogram.observe with a label  {observe_s * 1e6:6.2f} us")
+    print(f"Histogram.observe, bound series {bound_s * 1e6:6.2f} us")
+    print(f"Histogram.observe without label {unlabelled_s * 1e6:6.2f} us")
+    print(f"Counter.inc with a label        {inc_s * 1e6:6.2f} us")
+    print(f"Counter.inc, bound series       {bound_inc_s * 1e6:6.2f} us")
+
+    # Replay the per-frame mix; fractional counts accumulate across frames
+    mix = [(name, histograms[name].labels(**labels).observe if is_bound
+            else functools.partial(histograms[name].observe, **labels), count)
+           for name, labels, count, is_bound in frame_mix(viewers)]
+    per_frame = sum(count for _, _, count in mix)
+    credit = {name: 0.0 for name, _, _ in mix}
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        for name, observe, count in mix:
+            credit[name] += count
+            while credit[name] >= 1.0:
+                credit[name] -= 1.0
+                observe(0.004)
+                calls += 1
+    elapsed = time.perf_counter() - start
+    frame_cost = elapsed / frames
+    core_share = frame_cost * CAMERA_FPS
+    print(f"{viewers} viewers: {per_frame:.1f} observations per frame ({calls} timed), "
+          f"{frame_cost * 1e6:.1f} us per frame, {core_share:.3%} of a core at {CAMERA_FPS} fps")
+
+    scrape_s = _time_per_call(metrics.render, iterations=200)
+    print(f"/metrics render ({len(metrics._registry)} metrics) {scrape_s * 1e3:.2f} ms per scrape")
+    return {"observe_us": observe_s * 1e6, "bound_observe_us": bound_s * 1e6,
+            "inc_us": inc_s * 1e6, "bound_inc_us": bound_inc_s * 1e6, "frame_us": frame_cost * 1e6,
+            "core_share": core_share, "scrape_ms": scrape_s * 1e3}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.viewers, args.frames)
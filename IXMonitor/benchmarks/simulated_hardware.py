@@ -0,0 +1,100 @@
+# benchmarks/simulated_hardware.py
+"""
+Stand-ins for the robot's hardware driver modules (easygopigo3,
+di_sensors, picamera) so the app can run off the robot. install()
+only fills in modules that cannot be imported, so on the robot the
+real drivers are used.
+"""
+import io
+import sys
+import time
+import types
+from threading import Event, Thread
+
+
+class SimulatedGoPiGo3:
+    """Accepts every GoPiGo3 call and reports an idle robot."""
+    WHEEL_CIRCUMFERENCE = 66.5 * 3.14159
+    WHEEL_BASE_CIRCUMFERENCE = 117 * 3.14159
+    MOTOR_LEFT = 1
+    MOTOR_RIGHT = 2
+
+    def get_voltage_battery(self):
+        return 11.5
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: 0
+
+
+class SimulatedDistanceSensor:
+    """Nothing in range."""
+    def __init__(self, bus=None):
+        pass
+
+    def read_range_single(self):
+        return 8190
+
+
+def make_jpeg(size=(320, 240), seed=0):
+    """A camera-like JPEG: smooth texture with a little noise."""
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    width, height = size
+    texture = Image.fromarray(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8))
+    pixels = np.asarray(texture.resize(size, Image.BICUBIC), dtype=np.int16)
+    pixels = np.clip(pixels + rng.normal(0, 4, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class SimulatedPiCamera:
+    """Records canned JPEG frames into each output at the camera frame rate."""
+    def __init__(self, resolution=(320, 240), framerate=10, **kwargs):
+        self.resolution = tuple(resolution)
+        self.framerate = framerate
+        self.recordings = {}  # splitter port -> stop Event
+
+    def start_recording(self, output, format="mjpeg", splitter_port=1, resize=None, **kwargs):
+        frames = [make_jpeg(tuple(resize or self.resolution), seed) for seed in range(4)]
+        stop = self.recordings[splitter_port] = Event()
+        Thread(target=self._record, args=(output, frames, stop), daemon=True).start()
+
+    def _record(self, output, frames, stop):
+        period = 1.0 / self.framerate
+        next_tick = time.monotonic()
+        i = 0
+        while not stop.is_set():
+            output.write(frames[i % len(frames)])
+            i += 1
+            next_tick += period
+            stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def stop_recording(self, splitter_port=1):
+        self.recordings.pop(splitter_port).set()
+
+    def capture(self, output, format="jpeg", resize=None, **kwargs):
+        output.write(make_jpeg(tuple(resize or self.resolution)))
+
+
+def _install(name, **attributes):
+    try:
+        __import__(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent in sys.modules:
+            setattr(sys.modules[parent], child, module)
+
+
+def install():
+    """Register simulated driver modules for the ones that are missing."""
+    _install("easygopigo3", EasyGoPiGo3=SimulatedGoPiGo3)
+    _install("di_sensors")
+    _install("di_sensors.easy_mutex", ifMutexAcquire=lambda use_mutex: None,
+             ifMutexRelease=lambda use_mutex: None)
+    _install("di_sensors.distance_sensor", DistanceSensor=SimulatedDistanceSensor)
+    _install("picamera", PiCamera=SimulatedPiCamera)
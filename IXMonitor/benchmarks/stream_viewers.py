@@ -0,0 +1,144 @@
+# benchmarks/stream_viewers.py
+"""
+Load test: how many concurrent /video_feed viewers each serving mode
+sustains at the camera frame rate.
+
+Starts the app in a child process, in Flask threaded mode and in ASGI
+mode. Off the robot it uses simulated hardware, with the camera
+recording canned frames at CAMERA_FPS. The test then opens N MJPEG
+viewers from this process and counts the frames each receives. A
+count is sustained when every viewer gets at least 90% of CAMERA_FPS.
+The server's thread count and resident memory are read from /proc
+(Linux only).
+
+Usage: python -m benchmarks.stream_viewers [--modes threaded,asgi]
+                                           [--viewers 1,10,25,50,100] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+from config import CAMERA_FPS
+from . import simulated_hardware
+
+BOUNDARY = b"--FRAME"
+DRAIN_SECONDS = 1.0
+
+
+def serve(mode, port):
+    """Child process: run the app in the given mode."""
+    simulated_hardware.install()
+    if mode == "asgi":
+        import uvicorn
+        uvicorn.run("asgi:app", host="127.0.0.1", port=port, log_level="warning")
+    else:
+        import logging
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        from main import app
+        app.run(host="127.0.0.1", port=port, debug=False, threaded=True)
+
+
+def _process_status(pid):
+    status = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                status[key] = value.strip()
+    except OSError:
+        return None, None
+    threads = int(status["Threads"]) if "Threads" in status else None
+    rss_mb = int(status["VmRSS"].split()[0]) / 1024 if "VmRSS" in status else None
+    return threads, rss_mb
+
+
+async def _viewer(client, url, seconds, started):
+    frames = 0
+    tail = b""
+    async with client.stream("GET", url) as response:
+        await started.wait()
+        # Frames buffered while waiting arrive in a burst first; do not count them
+        begin = time.monotonic() + DRAIN_SECONDS
+        end = begin + seconds
+        async for chunk in response.aiter_raw():
+            now = time.monotonic()
+            data = tail + chunk
+            if now >= begin:
+                frames += data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+            if now >= end:
+                break
+    return frames / seconds
+
+
+async def _round(base_url, viewers, seconds, pid):
+    limits = httpx.Limits(max_connections=viewers + 5)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        started = asyncio.Event()
+        tasks = [asyncio.create_task(_viewer(client, f"{base_url}/video_feed", seconds, started))
+                 for _ in range(viewers)]
+        await asyncio.sleep(1.0)  # let every viewer connect and the recording start
+        started.set()
+        await asyncio.sleep(DRAIN_SECONDS + seconds / 2)
+        threads, rss_mb = _process_status(pid)
+        rates = await asyncio.gather(*tasks)
+    return rates, threads, rss_mb
+
+
+def _wait_ready(base_url, process, timeout=30):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/streams", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run(modes, viewer_counts, seconds, port=5099):
+    print(f"target {CAMERA_FPS} fps per viewer, sustained = every viewer >= {0.9 * CAMERA_FPS:.0f} fps, "
+          f"{seconds:.0f} s per round")
+    print(f"{'mode':9} {'viewers':>7} {'min fps':>7} {'avg fps':>7} {'sustained':>9} {'threads':>7} {'RSS MB':>6}")
+    results = {}
+    for mode in modes:
+        base_url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen([sys.executable, "-m", "benchmarks.stream_viewers", "--serve", mode,
+                                    "--port", str(port)], cwd=os.getcwd(),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_ready(base_url, process)
+            for viewers in viewer_counts:
+                rates, threads, rss_mb = asyncio.run(_round(base_url, viewers, seconds, process.pid))
+                sustained = min(rates) >= 0.9 * CAMERA_FPS
+                results[(mode, viewers)] = {"min_fps": min(rates), "avg_fps": sum(rates) / len(rates),
+                                            "sustained": sustained, "threads": threads, "rss_mb": rss_mb}
+                print(f"{mode:9} {viewers:7} {min(rates):7.1f} {sum(rates) / len(rates):7.1f} "
+                      f"{'yes' if sustained else 'NO':>9} {threads if threads else '-':>7} "
+                      f"{f'{rss_mb:.0f}' if rss_mb else '-':>6}")
+                time.sleep(1.0)  # let the server notice the disconnects
+        finally:
+            process.terminate()
+            process.wait(10)
+        port += 1
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default="threaded,asgi")
+    parser.add_argument("--viewers", default="1,10,25,50,100", help="comma-separated viewer counts")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measurement window per round")
+    parser.add_argument("--serve", choices=["threaded", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port)
+    else:
+        run(args.modes.split(","), [int(n) for n in args.viewers.split(",")], args.seconds, args.port)
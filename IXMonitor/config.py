@@ -1,9 +1,122 @@
 # Config variables
+import os
+
 WINDOWS_SERVER_BASE = "http://172.20.84.160:8000"
 WINDOWS_SERVER = f"{WINDOWS_SERVER_BASE}/detect"
+WINDOWS_SERVER_BOXES = f"{WINDOWS_SERVER_BASE}/detect/boxes"
 ROBOT_STEP = 0.1          # meters per step
 TURN_ANGLE = 10           # degrees per step
-CAMERA_RES = (320, 240)
+CAMERA_RES = (320, 240)         # size of the MJPEG streams
+CAMERA_SENSOR_RES = (1024, 768)  # camera resolution; streams are downscaled, stills use it directly
+STILL_CAPTURE_TIMEOUT = 2.0      # seconds a still capture may take before giving up
+STILL_JPEG_QUALITY = 90
 CAMERA_FPS = 10           # frames per second for camera
 DETECTION_FRAME_SKIP = 2  # send every Nth frame to face detection (10fps / 2 = 5fps)
 DETECTION_TIMEOUT = 0.5   # timeout for face detection server (seconds)
+DETECTION_ADAPTIVE = True         # adapt frame skip and upload size to server latency
+DETECTION_TARGET_LATENCY = 0.3    # round-trip latency the controller aims for (seconds)
+DETECTION_MAX_FRAME_SKIP = 10
+DETECTION_MAX_ERROR_RATE = 0.1    # smoothed fraction of failed requests tolerated
+DETECTION_UPLOAD_LEVELS = [       # (scale, JPEG quality) from best to cheapest; None = as captured
+    (1.0, None),                  # image mode streams the server's JPEG, so it stays at full scale
+    (1.0, 70),
+    (1.0, 55),
+    (1.0, 40),
+]
+DETECTION_MODE = "image"          # "image": server returns an annotated JPEG; "boxes": JSON boxes drawn on the robot
+DETECTION_BOX_TTL = 1.0           # seconds the last boxes stay drawn without a fresh detection
+DETECTION_BOX_UPLOAD_LEVELS = [   # upload levels in boxes mode, reduced from the start
+    (0.75, 80),
+    (0.5, 70),
+    (0.5, 50),
+]
+DETECTION_TRACKING = True         # boxes mode: track boxes between detections and only detect when needed
+TRACK_IOU_THRESHOLD = 0.3         # min overlap to match a detection to a track
+TRACK_MAX_COAST = 1.0             # seconds a track survives without a detection
+TRACK_REFRESH_INTERVAL = 1.0      # seconds after which tracks want a fresh detection anyway
+TRACK_MAX_SHIFT = 0.25            # predicted motion (fraction of box size) that asks for a detection
+STREAM_GRACE_PERIOD = 5   # seconds a stream keeps recording after its last viewer leaves
+SNAPSHOT_MAX_AGE = 0.5    # seconds a live stream frame may be old to serve as a snapshot
+DISTANCE_SAMPLE_HZ = 20   # background distance sensor sampling rate
+DISTANCE_HISTORY = 100    # recent distance readings kept in the ring buffer
+DISTANCE_FILTER = "kalman" # reading filter: mean, median, ema or kalman
+DISTANCE_FILTER_WINDOW = 5
+OBSTACLE_TTC = 1.0        # seconds to collision that count as an obstacle while moving
+DRIVE_MONITOR_HZ = 50     # sensor/encoder polling rate during monitored drives
+DRIVE_SENSOR_MAX_AGE_MS = 150  # stop a monitored drive when the newest distance reading is older
+TELEOP_LEASE = 0.3        # seconds a teleop intent keeps the robot moving without a refresh
+AUTONOMOUS_PIPELINED = False  # request the next decision while the current action runs
+AUTONOMOUS_PREFETCH_MAX_DISTANCE = 10  # max perceptual-hash bit difference to act on a prefetched decision
+TELEMETRY_INTERVALS = {   # seconds between samples of each dashboard telemetry field
+    "battery": 10,
+    "distance": 0.5,
+    "autonomous": 1,
+    "auto_greet": 1,
+}
+
+# Windows server HTTP client
+SERVER_POOL_SIZE = 8          # keep-alive connections kept open to the server
+SERVER_DEFAULT_TIMEOUT = 10   # seconds, for endpoints without a profile
+SERVER_TIMEOUTS = {           # per-endpoint timeout profiles (seconds)
+    "/detect": DETECTION_TIMEOUT,
+    "/detect/boxes": DETECTION_TIMEOUT,
+    "/detect/check_person": 5,
+    "/chat/text": 10,
+    "/chat/audio": 30,
+    "/chat/reset": 5,
+    "/autonomous/decide": 15,
+    "/autonomous/start": 5,
+    "/autonomous/stop": 5,
+    "/vision/analyze": 15,
+}
+
+# Battery estimator
+BATTERY_SAMPLE_INTERVAL = 5   # seconds between voltage samples
+BATTERY_TTL = 15              # seconds after which the cached estimate is stale
+BATTERY_MIN_VOLTAGE = 7.0     # empty
+BATTERY_MAX_VOLTAGE = 12.0    # full
+BATTERY_SAG_PER_100DPS = 0.1  # volts of sag per 100 deg/s of wheel speed
+BATTERY_RUNTIME_WINDOW = 900  # seconds of history used for the discharge rate
+
+# Autonomous decision cache
+DECISION_CACHE_SIZE = 64          # cached decisions kept (LRU)
+DECISION_CACHE_TTL = 30           # seconds a cached decision stays valid
+DECISION_CACHE_MAX_DISTANCE = 6   # max perceptual-hash bit difference for a hit
+DECISION_CACHE_HISTORY = 3        # trailing actions that must match
+
+# Auto-greet change detection
+AUTO_GREET_SAMPLE_HZ = 5              # frames checked locally per second
+AUTO_GREET_KEEPALIVE = 10             # seconds between server checks without motion
+AUTO_GREET_MIN_CHECK_INTERVAL = 0.5   # seconds between server checks during motion
+AUTO_GREET_POLL_INTERVAL = 2.0        # server check interval of the old fixed polling, baseline for calls saved
+CHANGE_DETECTOR_SIZE = (64, 48)       # resolution of the background model
+CHANGE_PIXEL_THRESHOLD = 25           # gray-level difference of a changed pixel
+CHANGE_MIN_FRACTION = 0.02            # fraction of changed pixels that counts as motion
+CHANGE_BACKGROUND_ALPHA = 0.05        # background learning rate per frame
+
+# Streamed voice recording
+VOICE_SAMPLE_RATE = 16000   # Hz, mono, sent to transcription
+VOICE_VAD_MIN_RMS = 300     # int16 RMS below which a frame is always silence
+VOICE_VAD_PREROLL = 0.2     # seconds kept before speech onset
+VOICE_VAD_HANGOVER = 0.3    # seconds kept after the last speech
+
+# Text-to-speech
+TTS_SAMPLE_RATE = 22050                 # espeak output rate, also used by the speaker process
+TTS_DEVICE = "plughw:1,0"               # ALSA device of the robot speaker
+TTS_CACHE_DIR = os.path.expanduser("~/.cache/ixmonitor/tts")
+TTS_MEMORY_CACHE_BYTES = 8 * 1024 * 1024
+TTS_DISK_CACHE_BYTES = 50 * 1024 * 1024
+TTS_PREWARM = [                         # (text, voice) rendered at startup
+    ("Hello Stranger, Welcome to IX Lab", "en-us+f3"),
+    ("Picture taken", "en"),
+]
+
+# ASGI mode (python run.py --asgi)
+ASGI_HARDWARE_WORKERS = 4    # threads for blocking camera/sensor calls
+ASGI_WEBSOCKET_WORKERS = 8   # concurrent WebSocket sessions (teleop, voice)
+ASGI_WSGI_WORKERS = 8        # threads serving the remaining Flask routes
+
+# Picture gallery
+PICTURE_DIR = os.path.expanduser("~/.local/share/ixmonitor/pictures")
+PICTURE_MAX_COUNT = 200         # oldest pictures are deleted beyond this
+PICTURE_THUMB_SIZE = (160, 120)
@@ -1,13 +1,25 @@
 # main.py
-from flask import Flask, request, jsonify, render_template, Response
-from threading import Thread, Lock
+from flask import Flask, request, jsonify, render_template, Response, send_file
+from flask_sock import Sock
+from threading import Thread, Lock, Event
 from robot import movement
-from robot.camera import StreamingOutput
+from robot import motion
+from robot.camera import StreamingOutput, StreamManager, DETECTION_SPLITTER_PORT, RAW_SPLITTER_PORT
+from robot.frame_broker import MJPEG_MIMETYPE
+from robot.telemetry import TelemetryHub
+from robot.decision_cache import get_decision_cache
+from robot.change_detector import ChangeDetector
+from robot.tts import get_tts
+from robot.audio_worker import get_audio_worker, AUDIO_PRIORITY_ALERT
 from robot import autonomous
-from config import WINDOWS_SERVER, CAMERA_RES, CAMERA_FPS, DETECTION_FRAME_SKIP, DETECTION_TIMEOUT
+from config import WINDOWS_SERVER, WINDOWS_SERVER_BOXES, DETECTION_MODE, DETECTION_TRACKING, CAMERA_RES, CAMERA_SENSOR_RES, CAMERA_FPS, DETECTION_FRAME_SKIP, DETECTION_TIMEOUT, DETECTION_ADAPTIVE, STREAM_GRACE_PERIOD, SNAPSHOT_MAX_AGE, TELEMETRY_INTERVALS, AUTONOMOUS_PIPELINED, AUTO_GREET_SAMPLE_HZ, VOICE_SAMPLE_RATE
 import picamera
 
 app = Flask(__name__)
+sock = Sock(app)
+
+# Render canned phrases and open the speaker in the background
+Thread(target=get_tts().prewarm, daemon=True).start()
 
 # -----------------
 # Single Camera Instance (Singleton Pattern)
@@ -16,24 +28,32 @@ camera_lock = Lock()
 camera = None
 output = None
 raw_output = None
+streams = None
 auto_greet_active = False  # Global flag for auto-greet mode
+auto_greet_stats = {"detector": None, "greets": 0, "last_greet_latency_s": None, "max_greet_latency_s": 0.0}
 
 def get_camera():
     """Get or initialize the single camera instance."""
-    global camera, output, raw_output
+    global camera, output, raw_output, streams
     with camera_lock:
         if camera is None:
-            camera = picamera.PiCamera(resolution=CAMERA_RES, framerate=CAMERA_FPS)
+            # Run at the still resolution so pictures need no sensor mode switch
+            camera = picamera.PiCamera(resolution=CAMERA_SENSOR_RES, framerate=CAMERA_FPS)
             # Output with face detection (only when requested)
             output = StreamingOutput(
-                face_server_url=WINDOWS_SERVER,
+                face_server_url=WINDOWS_SERVER_BOXES if DETECTION_MODE == "boxes" else WINDOWS_SERVER,
                 frame_skip=DETECTION_FRAME_SKIP,
-                timeout=DETECTION_TIMEOUT
+                timeout=DETECTION_TIMEOUT,
+                adaptive=DETECTION_ADAPTIVE,
+                mode=DETECTION_MODE,
+                tracking=DETECTION_TRACKING
             )
             # Raw output without face detection for main page
             raw_output = StreamingOutput(face_server_url=None)
-            # Start ONLY raw output by default (no detection)
-            camera.start_recording(raw_output, format='mjpeg', splitter_port=2)
+            # Ports only record while someone is watching
+            streams = StreamManager(camera, grace_period=STREAM_GRACE_PERIOD, resize=CAMERA_RES)
+            streams.register(DETECTION_SPLITTER_PORT, output, "detection")
+            streams.register(RAW_SPLITTER_PORT, raw_output, "raw")
         return camera, output, raw_output
 
 # -----------------
@@ -44,19 +64,57 @@ def move():
     data = request.get_json()
     direction = data.get("direction")
     
-    if direction == "forward":
-        movement.move_forward()
-    elif direction == "backward":
-        movement.move_backward()
-    elif direction == "left":
-        movement.turn_left()
-    elif direction == "right":
-        movement.turn_right()
-    elif direction == "stop":
-        movement.stop_robot()
+    if direction == "stop":
+        motion.get_motion_executor().stop()
+    elif direction in ("forward", "backward", "left", "right"):
+        # Repeated commands from a held button are merged by the executor
+        motion.get_motion_executor().submit(direction, priority=motion.PRIORITY_TELEOP)
     
     return jsonify({"status": f"{direction} command executed"})
 
+@sock.route("/teleop/ws")
+def teleop_ws(ws):
+    """
+    Long-lived teleop channel. The client sends JSON intents
+    {"seq": n, "direction": "forward"|"backward"|"left"|"right"|"stop"}
+    while a button is held; each one extends a single continuous motion.
+    Stale (out of order) intents are ignored and the robot stops when
+    the channel closes.
+    """
+    import json
+    executor = motion.get_motion_executor()
+    last_seq = -1
+    moving = False
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            try:
+                intent = json.loads(message)
+            except ValueError:
+                continue
+            seq = intent.get("seq", last_seq + 1)
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+            
+            direction = intent.get("direction")
+            if direction == "stop":
+                executor.stop()
+                moving = False
+            elif direction in ("forward", "backward", "left", "right"):
+                executor.hold(direction)
+                moving = True
+    finally:
+        if moving:
+            executor.stop(priority=motion.PRIORITY_TELEOP)
+
+@app.route("/motion/status", methods=["GET"])
+def motion_status():
+    """Get motion executor queue depth and command-to-motor latency"""
+    return jsonify(motion.get_motion_executor().get_status())
+
 @app.route("/go_to_door", methods=["POST"])
 def go_door():
     Thread(target=movement.go_to_door).start()
@@ -69,46 +127,72 @@ def return_start():
 
 @app.route("/take_picture", methods=["POST"])
 def take_picture():
-    """Capture a high-res photo and return it as base64."""
+    """Capture a high-res photo into the gallery and return its ID and URLs."""
     from robot.camera import take_picture as capture_photo
     try:
         # Get the existing camera instance
         cam, _, _ = get_camera()
-        filename = capture_photo(cam)
+        entry = capture_photo(cam)
         
-        if filename is None:
+        if entry is None:
             return jsonify({"status": "Error", "error": "Failed to capture image"}), 500
         
-        # Read the image and encode as base64
-        import base64
-        with open(filename, 'rb') as f:
-            img_data = base64.b64encode(f.read()).decode('utf-8')
-        return jsonify({
-            "status": "Picture taken",
-            "image": f"data:image/jpeg;base64,{img_data}",
-            "filename": filename
-        })
+        return jsonify({"status": "Picture taken", **_picture_urls(entry)})
     except Exception as e:
         return jsonify({"status": "Error", "error": str(e)}), 500
 
+def _picture_urls(entry):
+    return {
+        "id": entry["id"],
+        "url": f"/pictures/{entry['id']}",
+        "thumb_url": f"/pictures/{entry['id']}/thumb"
+    }
+
+@app.route("/pictures", methods=["GET"])
+def list_pictures():
+    """List stored pictures, newest first."""
+    from robot.gallery import get_picture_store
+    return jsonify([{**entry, **_picture_urls(entry)} for entry in get_picture_store().list()])
+
+@app.route("/pictures/<picture_id>", methods=["GET"])
+def get_picture(picture_id):
+    """Serve a stored picture as JPEG, with ETag and Range support."""
+    return _send_picture(picture_id, thumb=False)
+
+@app.route("/pictures/<picture_id>/thumb", methods=["GET"])
+def get_picture_thumb(picture_id):
+    """Serve the thumbnail of a stored picture."""
+    return _send_picture(picture_id, thumb=True)
+
+def _send_picture(picture_id, thumb):
+    from robot.gallery import get_picture_store
+    path = get_picture_store().get_path(picture_id, thumb=thumb)
+    if path is None:
+        return jsonify({"error": "Unknown picture"}), 404
+    try:
+        # Pictures never change once stored, so clients may cache them for good
+        return send_file(path, mimetype="image/jpeg", conditional=True, etag=True, max_age=31536000,
+                         download_name=f"{picture_id}{'_thumb' if thumb else ''}.jpg")
+    except FileNotFoundError:
+        # Evicted between the index lookup and opening the file
+        return jsonify({"error": "Unknown picture"}), 404
+
 @app.route("/battery", methods=["GET"])
 def get_battery():
-    """Get the current battery voltage and percentage."""
+    """Get the cached, load-compensated battery estimate."""
     try:
-        voltage = movement.gpg.get_voltage_battery()
-        # GoPiGo3 battery range: ~7V (empty) to ~12V (full)
-        # Calculate percentage based on typical Li-ion range
-        min_voltage = 7.0
-        max_voltage = 12.0
-        percentage = max(0, min(100, ((voltage - min_voltage) / (max_voltage - min_voltage)) * 100))
-        
-        return jsonify({
-            "voltage": round(voltage, 2),
-            "percentage": round(percentage, 1)
-        })
+        estimate = read_battery()
+        if estimate is None:
+            return jsonify({"voltage": 0, "percentage": 0, "error": "No battery reading yet"}), 503
+        return jsonify(estimate)
     except Exception as e:
         return jsonify({"voltage": 0, "percentage": 0, "error": str(e)}), 500
 
+def read_battery(with_age=True):
+    """Latest battery estimate from the background sampler (no SPI access)."""
+    from robot.battery import get_battery_monitor
+    return get_battery_monitor().get_estimate(with_age=with_age)
+
 # -----------------
 # Chat/Audio API
 # -----------------
@@ -131,7 +215,7 @@ def chat_text():
         if result["success"] and speak:
             # Play the response
             ai_response = result.get("ai_response", "")
-            Thread(target=play_audio_message, args=(ai_response,)).start()
+            play_audio_message(ai_response, wait=False)
         
         return jsonify(result)
     except Exception as e:
@@ -141,8 +225,8 @@ def chat_text():
 def chat_record():
     """Receive audio from client browser, send to server, and play response."""
     from robot.audio import send_audio_to_server, play_audio_message
-    import os
-    import tempfile
+    from robot.voice import record_upload
+    import time
     
     # Check if audio file is in the request
     if 'audio' not in request.files:
@@ -153,33 +237,107 @@ def chat_record():
     if audio_file.filename == '':
         return jsonify({"success": False, "error": "Empty audio file"}), 400
     
-    # Save audio to temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-    temp_path = temp_file.name
-    temp_file.close()
-    
     try:
-        audio_file.save(temp_path)
-        
-        # Send to Windows server
-        result = send_audio_to_server(temp_path)
-        
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        # Forward straight from memory, no temp file
+        audio = audio_file.read()
+        started = time.monotonic()
+        result = send_audio_to_server(audio, audio_file.filename)
+        if result["success"]:
+            record_upload("file", len(audio), started)
         
         # Play the AI response on robot speaker
         if result["success"]:
             ai_response = result.get("ai_response", "")
-            Thread(target=play_audio_message, args=(ai_response,)).start()
+            play_audio_message(ai_response, wait=False)
         
         return jsonify(result)
     except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         return jsonify({"success": False, "error": str(e)}), 500
 
+@sock.route("/chat/record/ws")
+def chat_record_ws(ws):
+    """
+    Streamed voice recording. The client sends {"sample_rate": N}, then
+    binary chunks of 16-bit mono PCM, then {"type": "end"}. Audio is
+    resampled, trimmed of silence and streamed to the server while the
+    user is still speaking; the result is sent back as JSON.
+    """
+    from robot.audio import stream_audio_to_server, play_audio_message
+    from robot.voice import StreamResampler, VoiceActivityTrimmer, record_upload
+    import json
+    import queue
+    import time
+    import numpy as np
+    
+    try:
+        start = json.loads(ws.receive(timeout=10) or "{}")
+    except (ValueError, TypeError):
+        ws.send(json.dumps({"success": False, "error": "Expected a start message"}))
+        return
+    resampler = StreamResampler(int(start.get("sample_rate", VOICE_SAMPLE_RATE)))
+    trimmer = VoiceActivityTrimmer()
+    chunks = queue.Queue()
+    aborted = Event()
+    outcome = {}
+    
+    def upload():
+        outcome["result"] = stream_audio_to_server(iter(chunks.get, None), abort=aborted)
+    
+    uploader = Thread(target=upload, daemon=True)
+    uploader.start()
+    
+    try:
+        while True:
+            message = ws.receive(timeout=60)
+            if message is None:
+                # No audio for 60 s: abort, the partial recording is not answered
+                aborted.set()
+                break
+            if isinstance(message, str):
+                # Text frame ends the recording
+                break
+            samples = np.frombuffer(message, dtype="<i2")
+            chunks.put(trimmer.process(resampler.process(samples)).tobytes())
+        if not aborted.is_set():
+            ended = time.monotonic()
+            chunks.put(trimmer.flush().tobytes())
+    except Exception:
+        # Client gone mid-recording: same as a timeout
+        aborted.set()
+        raise
+    finally:
+        chunks.put(None)
+    
+    uploader.join()
+    if aborted.is_set():
+        ws.send(json.dumps({"success": False, "error": "Recording timed out"}))
+        return
+    result = outcome.get("result", {"success": False, "error": "Upload failed"})
+    if result["success"]:
+        record_upload("stream", result["bytes_uploaded"], ended)
+        ai_response = result.get("ai_response", "")
+        play_audio_message(ai_response, wait=False)
+    ws.send(json.dumps(result))
+
+@app.route("/chat/record/stats", methods=["GET"])
+def chat_record_stats():
+    """Compare bytes uploaded and time to first transcript of both recording paths."""
+    from robot.voice import get_voice_stats
+    return jsonify(get_voice_stats())
+
+@app.route("/audio/stop", methods=["POST"])
+def audio_stop():
+    """Cut off current speech and drop queued messages."""
+    get_audio_worker().stop()
+    return jsonify({"status": "Audio stopped"})
+
+@app.route("/audio/status", methods=["GET"])
+def audio_status():
+    """Get audio queue depth, time to first audio and speech cache stats."""
+    status = get_audio_worker().get_status()
+    status["tts"] = get_tts().get_stats()
+    return jsonify(status)
+
 @app.route("/chat/reset", methods=["POST"])
 def chat_reset():
     """Reset conversation history."""
@@ -196,12 +354,14 @@ def start_autonomous():
     data = request.get_json()
     goal = data.get("goal", "Explore the environment")
     max_actions = data.get("max_actions", 20)
+    pipelined = data.get("pipelined", AUTONOMOUS_PIPELINED)
     
     # Get camera instance
-    cam, _, _ = get_camera()
+    cam, _, raw_stream = get_camera()
     
     # Start autonomous mode
-    result = autonomous.start_autonomous_mode(cam, goal, max_actions)
+    result = autonomous.start_autonomous_mode(cam, goal, max_actions, stream_output=raw_stream,
+                                              pipelined=pipelined)
     return jsonify(result)
 
 @app.route("/autonomous/stop", methods=["POST"])
@@ -216,7 +376,9 @@ def autonomous_status():
     is_active = autonomous.is_autonomous_active()
     return jsonify({
         "active": is_active,
-        "message": "Autonomous mode is active" if is_active else "Autonomous mode is inactive"
+        "message": "Autonomous mode is active" if is_active else "Autonomous mode is inactive",
+        "progress": autonomous.get_autonomous_progress(),
+        "decision_cache": get_decision_cache().get_stats()
     })
 
 @app.route("/distance", methods=["GET"])
@@ -229,6 +391,11 @@ def get_distance():
         "obstacle_detected": False
     })
 
+@app.route("/drive/stats", methods=["GET"])
+def drive_stats():
+    """Get detection-to-stop latencies of monitored drives"""
+    return jsonify(movement.drive_stats)
+
 @app.route("/greet_person", methods=["POST"])
 def greet_person():
     """
@@ -243,30 +410,31 @@ def greet_person():
             # Move forward 5 steps
             print("Person detected! Moving forward...")
             for step in range(5):
-                movement.move_forward(distance_m=0.1, blocking=True, check_obstacles=False)
+                motion.get_motion_executor().submit("forward", 0.1, priority=motion.PRIORITY_AUTONOMOUS, check_obstacles=False).wait()
                 time.sleep(0.2)
             
             # Stop and greet
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
             time.sleep(0.5)
             
             print("Playing greeting message...")
-            play_audio_message("Hello Stranger, Welcome to IX Lab", voice="en-us+f3")
+            play_audio_message("Hello Stranger, Welcome to IX Lab", voice="en-us+f3",
+                               priority=AUDIO_PRIORITY_ALERT, interrupt=True)
             
             time.sleep(1)
             
             # Move backward 5 steps
             print("Moving back to original position...")
             for step in range(5):
-                movement.move_backward(distance_m=0.1, blocking=True)
+                motion.get_motion_executor().submit("backward", 0.1, priority=motion.PRIORITY_AUTONOMOUS).wait()
                 time.sleep(0.2)
             
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
             print("Greeting sequence completed!")
             
         except Exception as e:
             print(f"Error in greeting sequence: {e}")
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
     
     # Run in background thread
     Thread(target=greeting_sequence).start()
@@ -283,9 +451,7 @@ def start_auto_greet():
     Start automatic greeting mode: continuously monitor for people
     and trigger greeting sequence when detected.
     """
-    from robot.autonomous import capture_frame_from_camera
-    import requests
-    from config import WINDOWS_SERVER_BASE
+    from robot import server_client
     import time
     
     global auto_greet_active
@@ -296,21 +462,40 @@ def start_auto_greet():
         print("Starting auto-greet monitoring...")
         last_greet_time = 0
         cooldown_period = 30  # 30 seconds between greetings
+        detector = ChangeDetector()
+        auto_greet_stats["detector"] = detector
+        interval = 1.0 / AUTO_GREET_SAMPLE_HZ
+        acquired = False
+        subscriber = None
         
         try:
-            cam, _, _ = get_camera()
+            _, _, raw_stream = get_camera()
+            # Keep the raw port recording and read its frames, rather than
+            # a still capture per sample when nobody is watching
+            streams.acquire(RAW_SPLITTER_PORT)
+            acquired = True
+            subscriber = raw_stream.broker.subscribe()
             
             while auto_greet_active:
                 try:
-                    # Capture frame
-                    frame_bytes = capture_frame_from_camera(cam)
+                    # Newest frame of the raw stream
+                    frame = subscriber.next_frame(timeout=1.0)
+                    if frame is None:
+                        print("No frame from the raw stream")
+                        continue
+                    frame_bytes = bytes(frame[1])
+                    
+                    # Only ask the server when something moved (or for a keep-alive check)
+                    reason = detector.should_check(frame_bytes)
+                    if reason is None:
+                        time.sleep(interval)
+                        continue
                     
                     # Check for person via Windows server
                     files = {'image': ('frame.jpg', frame_bytes, 'image/jpeg')}
-                    response = requests.post(
-                        f"{WINDOWS_SERVER_BASE}/detect/check_person",
-                        files=files,
-                        timeout=5
+                    response = server_client.post(
+                        "/detect/check_person",
+                        files=files
                     )
                     
                     if response.status_code == 200:
@@ -320,14 +505,22 @@ def start_auto_greet():
                         if person_detected:
                             current_time = time.time()
                             if current_time - last_greet_time >= cooldown_period:
-                                print(f"Person detected! Triggering greeting...")
+                                print(f"Person detected ({reason})! Triggering greeting...")
+                                # Time from the first frame that changed to the greeting
+                                latency = current_time - (detector.motion_since or current_time)
+                                auto_greet_stats["greets"] += 1
+                                auto_greet_stats["last_greet_latency_s"] = round(latency, 2)
+                                auto_greet_stats["max_greet_latency_s"] = round(
+                                    max(auto_greet_stats["max_greet_latency_s"], latency), 2)
                                 # Trigger greeting sequence
                                 greeting_sequence()
                                 last_greet_time = current_time
+                                # The robot moved; relearn the scene
+                                detector.reset()
                             else:
                                 print("Person detected but in cooldown period")
                     
-                    time.sleep(2)  # Check every 2 seconds
+                    time.sleep(interval)
                     
                 except Exception as e:
                     print(f"Error in auto-greet loop: {e}")
@@ -336,6 +529,10 @@ def start_auto_greet():
         except Exception as e:
             print(f"Fatal error in auto-greet: {e}")
         finally:
+            if subscriber is not None:
+                subscriber.close()
+            if acquired:
+                streams.release(RAW_SPLITTER_PORT)
             auto_greet_active = False
             print("Auto-greet monitoring stopped")
     
@@ -348,29 +545,30 @@ def start_auto_greet():
             # Move forward 5 steps
             print("Moving forward...")
             for step in range(5):
-                movement.move_forward(distance_m=0.1, blocking=True, check_obstacles=False)
+                motion.get_motion_executor().submit("forward", 0.1, priority=motion.PRIORITY_AUTONOMOUS, check_obstacles=False).wait()
                 time.sleep(0.2)
             
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
             time.sleep(0.5)
             
             # Greet
             print("Playing greeting...")
-            play_audio_message("Hello Stranger, Welcome to IX Lab", voice="en-us+f3")
+            play_audio_message("Hello Stranger, Welcome to IX Lab", voice="en-us+f3",
+                               priority=AUDIO_PRIORITY_ALERT, interrupt=True)
             time.sleep(1)
             
             # Move backward 5 steps
             print("Moving back...")
             for step in range(5):
-                movement.move_backward(distance_m=0.1, blocking=True)
+                motion.get_motion_executor().submit("backward", 0.1, priority=motion.PRIORITY_AUTONOMOUS).wait()
                 time.sleep(0.2)
             
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
             print("Greeting completed!")
             
         except Exception as e:
             print(f"Error in greeting sequence: {e}")
-            movement.stop_robot()
+            motion.get_motion_executor().stop()
     
     # Start monitoring in background
     Thread(target=auto_greet_loop, daemon=True).start()
@@ -397,9 +595,14 @@ def auto_greet_status():
     """Get auto-greet mode status."""
     global auto_greet_active
     
+    detector = auto_greet_stats["detector"]
     return jsonify({
         "active": auto_greet_active,
-        "message": "Auto-greet is active" if auto_greet_active else "Auto-greet is inactive"
+        "message": "Auto-greet is active" if auto_greet_active else "Auto-greet is inactive",
+        "change_detector": detector.get_stats() if detector else None,
+        "greets": auto_greet_stats["greets"],
+        "last_greet_latency_s": auto_greet_stats["last_greet_latency_s"],
+        "max_greet_latency_s": auto_greet_stats["max_greet_latency_s"]
     })
 
 # -----------------
@@ -409,26 +612,24 @@ def auto_greet_status():
 def vision_analyze():
     """Analyze current camera view"""
     from robot.autonomous import capture_frame_from_camera
-    import requests
-    from config import WINDOWS_SERVER_BASE
+    from robot import server_client
     
     data = request.get_json() or {}
     prompt = data.get("prompt", "Describe what you see in detail")
     
     try:
         # Get camera and capture frame
-        cam, _, _ = get_camera()
-        frame_bytes = capture_frame_from_camera(cam)
+        cam, _, raw_stream = get_camera()
+        frame_bytes = capture_frame_from_camera(cam, raw_stream)
         
         # Send to Windows server for analysis
         files = {'image': ('frame.jpg', frame_bytes, 'image/jpeg')}
         form_data = {'prompt': prompt}
         
-        response = requests.post(
-            f"{WINDOWS_SERVER_BASE}/vision/analyze",
+        response = server_client.post(
+            "/vision/analyze",
             files=files,
-            data=form_data,
-            timeout=15
+            data=form_data
         )
         response.raise_for_status()
         
@@ -437,6 +638,43 @@ def vision_analyze():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/server/latency", methods=["GET"])
+def server_latency():
+    """Get per-endpoint latency histograms of Windows server requests."""
+    from robot.server_client import get_latency_stats
+    return jsonify(get_latency_stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-stage counters and latency histograms in the Prometheus text format."""
+    from robot.metrics import render
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+# -----------------
+# Telemetry (Server-Sent Events)
+# -----------------
+telemetry = TelemetryHub()
+telemetry.add_field("battery", lambda: read_battery(with_age=False), TELEMETRY_INTERVALS["battery"])
+telemetry.add_field("distance_cm", movement.get_obstacle_distance, TELEMETRY_INTERVALS["distance"])
+telemetry.add_field("autonomous", lambda: {
+    "active": autonomous.is_autonomous_active(),
+    **autonomous.get_autonomous_progress()
+}, TELEMETRY_INTERVALS["autonomous"])
+telemetry.add_field("auto_greet", lambda: {"active": auto_greet_active}, TELEMETRY_INTERVALS["auto_greet"])
+
+@app.route("/telemetry/stream")
+def telemetry_stream():
+    """Push battery, distance and mode state to the dashboard; only changed fields are sent."""
+    response = Response(telemetry.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/telemetry/stats", methods=["GET"])
+def telemetry_stats():
+    """Get telemetry client count and sampling rates."""
+    return jsonify(telemetry.get_stats())
+
 # -----------------
 # Pages
 # -----------------
@@ -448,49 +686,69 @@ def index():
 def camera_page():
     return render_template("camera.html")
 
+@app.route("/snapshot", methods=["GET"])
+def snapshot():
+    """
+    Get the current view as a JPEG. Query params: max_age (seconds a
+    stream frame may be old), width and height (forces a capture).
+    """
+    from robot.camera import capture_snapshot
+    
+    max_age = request.args.get("max_age", SNAPSHOT_MAX_AGE, type=float)
+    width = request.args.get("width", type=int)
+    height = request.args.get("height", type=int)
+    resolution = (width, height) if width and height else None
+    
+    try:
+        cam, _, raw_stream = get_camera()
+        frame_bytes, source = capture_snapshot(cam, raw_stream, max_age=max_age, resolution=resolution)
+        response = Response(frame_bytes, mimetype="image/jpeg")
+        response.headers["X-Snapshot-Source"] = source
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/snapshot/stats", methods=["GET"])
+def snapshot_stats():
+    """Compare latency of stream-frame snapshots against camera captures."""
+    from robot.camera import get_snapshot_stats
+    return jsonify(get_snapshot_stats())
+
 # -----------------
 # MJPEG streaming
 # -----------------
 @app.route("/video_feed")
 def video_feed():
     """Raw video streaming route (no face detection) for main page."""
-    _, _, raw_stream = get_camera()
-    
-    def generate():
-        while True:
-            with raw_stream.condition:
-                raw_stream.condition.wait()
-                frame = raw_stream.frame
-            yield (b"--FRAME\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=FRAME')
+    get_camera()
+    return Response(streams.generate(RAW_SPLITTER_PORT), mimetype=MJPEG_MIMETYPE)
 
 @app.route("/video_feed_detection")
 def video_feed_detection():
     """Video streaming route with face detection."""
-    cam, stream_output, _ = get_camera()
-    
-    # Start face detection recording if not already started on port 1
-    with camera_lock:
-        # Check if detection recording is already running
-        # We can't directly check the port, so use a flag or try-except
-        try:
-            # Try to start detection recording on splitter port 1
-            cam.start_recording(stream_output, format='mjpeg', splitter_port=1)
-        except picamera.exc.PiCameraAlreadyRecording:
-            # Already recording on port 1, which is fine
-            pass
-        except Exception as e:
-            # Log other errors but continue
-            print(f"Detection recording start error: {e}")
-    
-    def generate():
-        while True:
-            with stream_output.condition:
-                stream_output.condition.wait()
-                frame = stream_output.frame
-            yield (b"--FRAME\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=FRAME')
\ No newline at end of file
+    get_camera()
+    # Detection recording on port 1 starts with the first viewer and
+    # stops after the grace period once the last one leaves
+    return Response(streams.generate(DETECTION_SPLITTER_PORT), mimetype=MJPEG_MIMETYPE)
+
+@app.route("/detection/stats", methods=["GET"])
+def detection_stats():
+    """Get frame, byte and latency counters of the asynchronous face detection stage."""
+    _, stream_output, _ = get_camera()
+    return jsonify(stream_output.get_detection_stats())
+
+@app.route("/video_feed/stats", methods=["GET"])
+def video_feed_stats():
+    """Get frame broker counters and per-client skipped frames for both streams."""
+    _, stream_output, raw_stream = get_camera()
+    return jsonify({
+        "raw": {**raw_stream.broker.get_stats(), "gaps": raw_stream.get_gap_stats()},
+        "detection": {**stream_output.broker.get_stats(), "gaps": stream_output.get_gap_stats()}
+    })
+
+@app.route("/streams", methods=["GET"])
+def stream_status():
+    """Get active splitter ports and their subscriber counts."""
+    get_camera()
+    return jsonify(streams.get_status())
@@ -1,14 +1,21 @@
 # robot/audio.py
-import subprocess
-import os
-import tempfile
+import uuid
 import requests
-from config import WINDOWS_SERVER_BASE
+from config import VOICE_SAMPLE_RATE
+from . import server_client
+from .voice import streaming_wav_header
+from .audio_worker import get_audio_worker, AUDIO_PRIORITY_CHAT
 
-def play_audio_message(text, voice="en-us+f3"):
+
+class UploadAborted(Exception):
+    """The recording was abandoned; its streamed upload is cut off unfinished."""
+
+def play_audio_message(text, voice="en-us+f3", priority=AUDIO_PRIORITY_CHAT, interrupt=False, wait=True):
     """
     Convert text to speech and play it using espeak with ALSA output.
     This plays on the robot's speaker using ALSA configuration.
+    Messages go through the shared audio worker, so they never overlap;
+    with wait=True this returns once the message has played.
     
     Voice options:
     - "en-us+f3" - American female (default, clear)
@@ -19,17 +26,10 @@ def play_audio_message(text, voice="en-us+f3"):
     - "en+f3" - British female
     - "en+m1" - British male
     """
-    try:
-        # Using espeak with specified voice and ALSA output device
-        espeak_cmd = f'espeak -v {voice} "{text}" --stdout | aplay -D plughw:1,0 2>/dev/null'
-        subprocess.run(espeak_cmd, shell=True, check=True)
+    message = get_audio_worker().say(text, voice, priority=priority, interrupt=interrupt)
+    if not wait:
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error playing audio: {e}")
-        return False
-    except FileNotFoundError as e:
-        print(f"Audio tool not found: {e}. Install with: sudo apt-get install espeak alsa-utils")
-        return False
+    return message.wait()
 
 def send_text_to_server(text, reset_history=False):
     """
@@ -37,49 +37,59 @@ def send_text_to_server(text, reset_history=False):
     Returns the AI response.
     """
     try:
-        url = f"{WINDOWS_SERVER_BASE}/chat/text"
         payload = {
             "message": text,
             "reset_history": reset_history
         }
         
-        response = requests.post(url, json=payload, timeout=10)
+        response = server_client.post("/chat/text", json=payload)
         response.raise_for_status()
-        
-        data = response.json()
+        return _chat_text_result(response)
+    except requests.exceptions.RequestException as e:
+        print(f"Error sending text to server: {e}")
         return {
-            "success": True,
-            "user_message": data.get("user_message"),
-            "ai_response": data.get("ai_response"),
-            "conversation_length": data.get("conversation_length")
+            "success": False,
+            "error": str(e)
         }
-    except requests.exceptions.RequestException as e:
+
+async def send_text_to_server_async(text, reset_history=False):
+    """Coroutine version of send_text_to_server() for the asyncio server."""
+    import httpx
+    try:
+        payload = {
+            "message": text,
+            "reset_history": reset_history
+        }
+        response = await server_client.async_post("/chat/text", json=payload)
+        response.raise_for_status()
+        return _chat_text_result(response)
+    except httpx.HTTPError as e:
         print(f"Error sending text to server: {e}")
         return {
             "success": False,
             "error": str(e)
         }
 
-def send_audio_to_server(audio_file_path):
+def _chat_text_result(response):
+    data = response.json()
+    return {
+        "success": True,
+        "user_message": data.get("user_message"),
+        "ai_response": data.get("ai_response"),
+        "conversation_length": data.get("conversation_length")
+    }
+
+def send_audio_to_server(audio, filename="recording.wav"):
     """
-    Send audio file to Windows server for transcription and AI processing.
+    Send a recorded audio file to Windows server for transcription and AI processing.
+    `audio` is the file content (bytes) or a file-like object.
     Returns the transcribed text and AI response.
     """
     try:
-        url = f"{WINDOWS_SERVER_BASE}/chat/audio"
-        
-        with open(audio_file_path, 'rb') as audio_file:
-            files = {'audio': ('recording.wav', audio_file, 'audio/wav')}
-            response = requests.post(url, files=files, timeout=30)
-            response.raise_for_status()
-        
-        data = response.json()
-        return {
-            "success": True,
-            "transcribed_text": data.get("transcribed_text"),
-            "ai_response": data.get("ai_response"),
-            "conversation_length": data.get("conversation_length")
-        }
+        files = {'audio': (filename, audio, 'audio/wav')}
+        response = server_client.post("/chat/audio", files=files)
+        response.raise_for_status()
+        return _chat_audio_result(response)
     except requests.exceptions.RequestException as e:
         print(f"Error sending audio to server: {e}")
         return {
@@ -87,11 +97,75 @@ def send_audio_to_server(audio_file_path):
             "error": str(e)
         }
 
+def stream_audio_to_server(pcm_chunks, rate=VOICE_SAMPLE_RATE, abort=None):
+    """
+    Stream 16-bit mono PCM chunks to the Windows server as they arrive.
+    The body is a chunked multipart upload of a streaming WAV, so the
+    server can start reading before the recording has ended.
+    If the `abort` event is set when the chunks run out, the body is
+    dropped before its closing boundary so the server never gets a
+    complete request.
+    Returns the transcribed text and AI response plus bytes_uploaded.
+    """
+    boundary = uuid.uuid4().hex
+    sent = {"bytes": 0}
+
+    def body():
+        parts = [
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="audio"; filename="recording.wav"\r\n',
+            b"Content-Type: audio/wav\r\n\r\n",
+            streaming_wav_header(rate)
+        ]
+        for part in parts:
+            sent["bytes"] += len(part)
+            yield part
+        for chunk in pcm_chunks:
+            if chunk:
+                sent["bytes"] += len(chunk)
+                yield chunk
+        if abort is not None and abort.is_set():
+            raise UploadAborted()
+        closing = f"\r\n--{boundary}--\r\n".encode()
+        sent["bytes"] += len(closing)
+        yield closing
+
+    try:
+        response = server_client.post(
+            "/chat/audio",
+            data=body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+        response.raise_for_status()
+        result = _chat_audio_result(response)
+    except UploadAborted:
+        print("Audio stream aborted")
+        result = {
+            "success": False,
+            "error": "Recording aborted"
+        }
+    except requests.exceptions.RequestException as e:
+        print(f"Error streaming audio to server: {e}")
+        result = {
+            "success": False,
+            "error": str(e)
+        }
+    result["bytes_uploaded"] = sent["bytes"]
+    return result
+
+def _chat_audio_result(response):
+    data = response.json()
+    return {
+        "success": True,
+        "transcribed_text": data.get("transcribed_text"),
+        "ai_response": data.get("ai_response"),
+        "conversation_length": data.get("conversation_length")
+    }
+
 def reset_conversation():
     """Reset the conversation history on the server."""
     try:
-        url = f"{WINDOWS_SERVER_BASE}/chat/reset"
-        response = requests.post(url, timeout=5)
+        response = server_client.post("/chat/reset")
         response.raise_for_status()
         return {"success": True, "message": "Conversation reset"}
     except requests.exceptions.RequestException as e:
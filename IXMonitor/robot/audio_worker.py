@@ -0,0 +1,185 @@
+# robot/audio_worker.py
+"""
+Single audio worker that owns the speaker.
+Messages are queued by priority; a higher-priority message (a greeting)
+or a stop cuts off lower-priority chatter. Long responses are split
+into sentences and sentence N+1 is synthesized while sentence N plays.
+"""
+import heapq
+import itertools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Condition, Event, Lock
+from . import metrics
+from .tts import get_tts, DEFAULT_VOICE
+
+# Lower value wins
+AUDIO_PRIORITY_ALERT = 0
+AUDIO_PRIORITY_CHAT = 1
+
+first_audio_seconds = metrics.histogram("ixmonitor_audio_first_audio_seconds",
+                                        "Queueing of a message to its first audio reaching the sink")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def split_sentences(text):
+    """Split text into sentences, dropping empty pieces."""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+class AudioMessage:
+    """A queued message. wait() returns True if it played completely."""
+    def __init__(self, text, voice, priority):
+        self.text = text
+        self.voice = voice
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.first_audio_at = None
+        self.cancel_event = Event()
+        self.done = Event()
+        self.completed = False
+
+    def finish(self, completed):
+        self.completed = completed
+        self.done.set()
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.completed
+
+
+class AudioWorker:
+    """
+    Plays AudioMessages one at a time through the TTS speaker.
+    """
+    def __init__(self, tts=None):
+        self.tts = tts or get_tts()
+        self.queue = []
+        self.condition = Condition()
+        self.current = None
+        self._seq = itertools.count()
+        self.renderer = ThreadPoolExecutor(max_workers=1)
+        self.played = 0
+        self.interrupted = 0
+        self.first_audio_total = 0.0
+        self.first_audio_count = 0
+        self.last_first_audio_ms = None
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def say(self, text, voice=DEFAULT_VOICE, priority=AUDIO_PRIORITY_CHAT, interrupt=False):
+        """
+        Queue text and return its AudioMessage without waiting. A message
+        with higher priority than the one playing cuts it off and drops
+        queued messages of lower priority; interrupt=True also cuts off
+        messages of the same priority.
+        """
+        message = AudioMessage(text, voice, priority)
+        with self.condition:
+            if interrupt or (self.current is not None and priority < self.current.priority):
+                self._cancel_below(priority, include_equal=interrupt)
+            heapq.heappush(self.queue, (priority, next(self._seq), message))
+            self.condition.notify()
+        return message
+
+    def stop(self):
+        """Cut off the current message and drop everything queued."""
+        with self.condition:
+            self._cancel_below(AUDIO_PRIORITY_ALERT, include_equal=True)
+
+    def _cancel_below(self, priority, include_equal):
+        # Caller holds self.condition
+        def loses(message):
+            return message.priority > priority or (include_equal and message.priority == priority)
+        kept = []
+        for entry in self.queue:
+            if loses(entry[2]):
+                entry[2].cancel_event.set()
+                entry[2].finish(False)
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        self.queue = kept
+        if self.current is not None and loses(self.current):
+            self.current.cancel_event.set()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                _, _, message = heapq.heappop(self.queue)
+                self.current = message
+            try:
+                completed = self._play(message)
+            except FileNotFoundError as e:
+                print(f"Audio tool not found: {e}. Install with: sudo apt-get install espeak alsa-utils")
+                completed = False
+            except Exception as e:
+                print(f"Audio playback failed: {e}")
+                completed = False
+            with self.condition:
+                self.current = None
+                if completed:
+                    self.played += 1
+                elif message.cancel_event.is_set():
+                    self.interrupted += 1
+            message.finish(completed)
+
+    def _play(self, message):
+        sentences = split_sentences(message.text)
+        if not sentences:
+            return True
+        cache = self.tts.cache
+        next_pcm = self.renderer.submit(cache.get, sentences[0], message.voice)
+        for i in range(len(sentences)):
+            pcm = next_pcm.result()
+            if i + 1 < len(sentences):
+                # Synthesize the next sentence while this one plays
+                next_pcm = self.renderer.submit(cache.get, sentences[i + 1], message.voice)
+            if message.cancel_event.is_set():
+                return False
+            if message.first_audio_at is None:
+                message.first_audio_at = time.monotonic()
+                self._record_first_audio(message.first_audio_at - message.enqueued_at)
+            if not self.tts.sink.play(pcm, wait=True, cancel_event=message.cancel_event):
+                return False
+        return True
+
+    def _record_first_audio(self, delay):
+        first_audio_seconds.observe(delay)
+        self.first_audio_total += delay
+        self.first_audio_count += 1
+        self.last_first_audio_ms = round(delay * 1000, 1)
+
+    def get_status(self):
+        """Queue depth, current message and time to first audio."""
+        with self.condition:
+            current = self.current
+            return {
+                "queue_depth": len(self.queue),
+                "current": current.text[:60] if current else None,
+                "current_priority": current.priority if current else None,
+                "played": self.played,
+                "interrupted": self.interrupted,
+                "avg_first_audio_ms": round(self.first_audio_total / self.first_audio_count * 1000, 1)
+                                      if self.first_audio_count else None,
+                "last_first_audio_ms": self.last_first_audio_ms
+            }
+
+
+# Singleton instance for easy access
+_audio_worker_instance = None
+_audio_worker_lock = Lock()
+
+def get_audio_worker():
+    """Get or start the audio worker singleton."""
+    global _audio_worker_instance
+    with _audio_worker_lock:
+        if _audio_worker_instance is None:
+            _audio_worker_instance = AudioWorker().start()
+        return _audio_worker_instance
@@ -3,23 +3,34 @@
 Autonomous navigation module using vision-guided decision making
 """
 import requests
-import io
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread, Event
-from config import WINDOWS_SERVER_BASE
-from .movement import move_forward, move_backward, turn_left, turn_right, stop_robot, get_obstacle_distance
+from config import SNAPSHOT_MAX_AGE, AUTONOMOUS_PIPELINED, AUTONOMOUS_PREFETCH_MAX_DISTANCE
+from . import metrics, server_client
+from .camera import capture_snapshot
+from .decision_cache import get_decision_cache
+from .imaging import phash, hamming
+from .movement import get_obstacle_distance
+from .motion import get_motion_executor, PRIORITY_SAFETY, PRIORITY_AUTONOMOUS
 
 # Autonomous control state
 autonomous_thread = None
 autonomous_stop_event = Event()
+autonomous_progress = {}  # goal, action count and latest decision of the current run
 
-def capture_frame_from_camera(camera_instance):
-    """Capture a single frame from the camera as bytes"""
-    stream = io.BytesIO()
-    camera_instance.capture(stream, format='jpeg', use_video_port=True)
-    stream.seek(0)
-    return stream.read()
+# Actions after which a decision prefetched during the action is useless
+SCENE_CHANGING_ACTIONS = {"left", "right", "backward"}
+
+decision_wait_seconds = metrics.histogram("ixmonitor_autonomous_decision_wait_seconds",
+                                          "Time the navigation loop waited for a decision", labelnames=("source",))
+loop_seconds = metrics.histogram("ixmonitor_autonomous_loop_seconds", "Duration of one navigation loop iteration")
+
+def capture_frame_from_camera(camera_instance, stream_output=None, max_age=SNAPSHOT_MAX_AGE):
+    """Get a single frame as bytes, from the live stream when it is fresh"""
+    frame_bytes, _ = capture_snapshot(camera_instance, stream_output, max_age=max_age)
+    return frame_bytes
 
 def execute_action(action: str, speed_mode: str = "normal"):
     """
@@ -27,6 +38,8 @@ def execute_action(action: str, speed_mode: str = "normal"):
     
     :param action: Movement action (forward, backward, left, right, stop, complete)
     :param speed_mode: Speed setting - "slow", "normal", or "fast"
+    :returns: "complete" when the goal is reached, "blocked" when a forward
+              move was stopped by an obstacle, otherwise "done"
     """
     action = action.lower().strip()
     
@@ -39,57 +52,76 @@ def execute_action(action: str, speed_mode: str = "normal"):
     }
     speed = speed_map.get(speed_mode, NORMAL_SPEED)
     
+    motion = get_motion_executor()
+    
     if action == "forward":
         print(f"Moving forward ({speed_mode} speed)")
         # Check for obstacles before moving forward
         distance = get_obstacle_distance()
         if distance is not None and distance < 25:
             print(f"Obstacle detected at {distance}cm - stopping")
-            stop_robot()
-            return False
+            motion.stop(priority=PRIORITY_SAFETY).wait()
+            return "blocked"
         
         # Use longer distance for continuous forward movement
-        result = move_forward(distance_m=0.5, blocking=True, check_obstacles=True, speed=speed)
-        if not result:
-            print("Obstacle encountered during movement")
-        return False
+        result = motion.submit("forward", 0.5, priority=PRIORITY_AUTONOMOUS, speed=speed).wait()
+        if result != "done":
+            print(f"Forward movement {result}")
+            return "blocked"
+        return "done"
     elif action == "backward":
         print(f"Moving backward ({speed_mode} speed)")
-        move_backward(distance_m=0.3, blocking=True, speed=speed)
+        motion.submit("backward", 0.3, priority=PRIORITY_AUTONOMOUS, speed=speed).wait()
     elif action == "left":
         print(f"Turning left ({speed_mode} speed)")
-        turn_left(angle_deg=30, blocking=True, speed=speed)
+        motion.submit("left", 30, priority=PRIORITY_AUTONOMOUS, speed=speed).wait()
     elif action == "right":
         print(f"Turning right ({speed_mode} speed)")
-        turn_right(angle_deg=30, blocking=True, speed=speed)
+        motion.submit("right", 30, priority=PRIORITY_AUTONOMOUS, speed=speed).wait()
     elif action == "stop":
         print("Stopping")
-        stop_robot()
+        motion.stop(priority=PRIORITY_AUTONOMOUS).wait()
     elif action == "complete":
         print("Goal completed!")
-        stop_robot()
-        return True  # Signal completion
+        motion.stop(priority=PRIORITY_AUTONOMOUS).wait()
+        return "complete"
     else:
         print(f"Unknown action: {action}")
-        stop_robot()
+        motion.stop(priority=PRIORITY_AUTONOMOUS).wait()
     
-    return False  # Not completed
+    return "done"
 
-def get_autonomous_decision(image_bytes: bytes, goal: str, previous_actions: list) -> dict:
-    """Request decision from Windows server"""
+def get_autonomous_decision(image_bytes: bytes, goal: str, previous_actions: list, store: bool = True) -> dict:
+    """
+    Request decision from Windows server, unless the cache already has one.
+    With store=False the answer is not cached, for frames that may not
+    show the scene the decision will be acted on in.
+    """
+    cache = get_decision_cache()
+    try:
+        cached, cache_key = cache.lookup(image_bytes, goal, previous_actions)
+    except Exception as e:
+        # Undecodable frame: just ask the server
+        print(f"Decision cache lookup failed: {e}")
+        cached, cache_key = None, None
+    if cached is not None:
+        print("Decision cache hit")
+        return cached
+    
     try:
-        url = f"{WINDOWS_SERVER_BASE}/autonomous/decide"
-        
         files = {'image': ('frame.jpg', image_bytes, 'image/jpeg')}
         data = {
             'goal': goal,
             'previous_actions': json.dumps(previous_actions)
         }
         
-        response = requests.post(url, files=files, data=data, timeout=15)
+        response = server_client.post("/autonomous/decide", files=files, data=data)
         response.raise_for_status()
         
-        return response.json()
+        result = response.json()
+        if result.get("success") and cache_key is not None and store:
+            cache.store(cache_key, result)
+        return result
         
     except requests.exceptions.RequestException as e:
         print(f"Error getting decision: {e}")
@@ -104,22 +136,73 @@ def get_autonomous_decision(image_bytes: bytes, goal: str, previous_actions: lis
             }
         }
 
-def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20):
-    """Main autonomous navigation loop with speed optimization"""
-    print(f"\nStarting autonomous navigation (FAST mode)")
+def _capture_and_decide(camera_instance, stream_output, goal, previous_actions):
+    """Capture a frame and ask the server what to do next"""
+    frame_bytes = capture_frame_from_camera(camera_instance, stream_output)
+    return get_autonomous_decision(frame_bytes, goal, previous_actions)
+
+def _prefetch_decision(camera_instance, stream_output, goal, previous_actions):
+    """
+    Prefetch worker: capture a frame while the action runs and request the
+    decision for after it. Returns (frame bytes, result).
+    """
+    frame_bytes = capture_frame_from_camera(camera_instance, stream_output)
+    # Not cached: the frame predates the action the decision follows
+    return frame_bytes, get_autonomous_decision(frame_bytes, goal, previous_actions, store=False)
+
+def _same_scene(frame_a, frame_b, max_distance=AUTONOMOUS_PREFETCH_MAX_DISTANCE):
+    """True if two frames are perceptually close enough to share a decision"""
+    try:
+        return hamming(phash(frame_a), phash(frame_b)) <= max_distance
+    except Exception as e:
+        print(f"Frame comparison failed: {e}")
+        return False
+
+def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20, stream_output=None,
+                               pipelined: bool = AUTONOMOUS_PIPELINED):
+    """
+    Main autonomous navigation loop with speed optimization.
+    
+    In pipelined mode the next frame is captured and its decision
+    requested while the current action runs, so the server round trip
+    overlaps the motion. Turns and reversing change the scene too much,
+    so they get no prefetch. Before a prefetched decision is used, its
+    frame is compared with one taken after the action; if the scene
+    moved too far the decision is discarded and asked for again. A
+    forward move blocked by an obstacle also drops the prefetch, since
+    its action history no longer matches what happened.
+    """
+    print(f"\nStarting autonomous navigation (FAST mode{', pipelined' if pipelined else ''})")
     print(f"Goal: {goal}")
     print(f"Max actions: {max_actions}\n")
     
     action_history = []
     action_count = 0
     consecutive_forward = 0  # Track consecutive forward moves for speed boost
+    run_start = time.time()
+    decision_wait_total = 0.0
+    prefetch_used = 0
+    prefetch_skipped = 0
+    prefetch_cancelled = 0
+    prefetch_discarded = 0
+    pending = None  # (frame, decision) requested during the previous action
+    # Two workers so a discarded request never delays the next one
+    decision_pool = ThreadPoolExecutor(max_workers=2) if pipelined else None
+    autonomous_progress.clear()
+    autonomous_progress.update({
+        "goal": goal,
+        "max_actions": max_actions,
+        "action_count": 0,
+        "last_action": None,
+        "progress": "0%",
+        "pipelined": pipelined
+    })
     
     try:
         # Notify server to start autonomous mode
-        requests.post(
-            f"{WINDOWS_SERVER_BASE}/autonomous/start",
-            json={"goal": goal, "max_actions": max_actions},
-            timeout=5
+        server_client.post(
+            "/autonomous/start",
+            json={"goal": goal, "max_actions": max_actions}
         )
     except:
         pass
@@ -133,14 +216,31 @@ def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20
             if distance is not None and distance < 20:
                 print(f"WARNING: Close obstacle: {distance}cm")
             
-            # Capture frame
             print(f"\n[Action {action_count + 1}/{max_actions}]")
-            frame_bytes = capture_frame_from_camera(camera_instance)
-            
-            # Get decision from AI (optimized prompts for speed)
             decision_start = time.time()
-            result = get_autonomous_decision(frame_bytes, goal, action_history)
+            if pending is not None:
+                # Decision was requested while the last action ran; check it
+                # still matches what the robot sees now
+                frame_bytes = capture_frame_from_camera(camera_instance, stream_output)
+                prefetch_frame, result = pending.result()
+                pending = None
+                if autonomous_stop_event.is_set():
+                    break
+                if _same_scene(prefetch_frame, frame_bytes):
+                    prefetch_used += 1
+                    decision_source = "prefetch"
+                else:
+                    print("Scene changed during the action - discarding prefetched decision")
+                    prefetch_discarded += 1
+                    result = get_autonomous_decision(frame_bytes, goal, action_history)
+                    decision_source = "inline"
+            else:
+                # Capture frame and get decision from AI (optimized prompts for speed)
+                result = _capture_and_decide(camera_instance, stream_output, goal, action_history)
+                decision_source = "inline"
             decision_time = time.time() - decision_start
+            decision_wait_seconds.observe(decision_time, source=decision_source)
+            decision_wait_total += decision_time
             print(f"AI decision: {decision_time:.2f}s")
             
             if not result.get("success"):
@@ -167,15 +267,43 @@ def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20
                 consecutive_forward = 0
                 speed_mode = "normal"
             
+            # Overlap the next capture + decision with this action
+            if pipelined and action_count < max_actions and action != "complete":
+                if action in SCENE_CHANGING_ACTIONS:
+                    prefetch_skipped += 1
+                else:
+                    pending = decision_pool.submit(_prefetch_decision, camera_instance, stream_output,
+                                                   goal, list(action_history))
+            
             print(f"Action: {action.upper()} ({speed_mode})")
-            completed = execute_action(action, speed_mode)
+            action_start = time.time()
+            outcome = execute_action(action, speed_mode)
+            action_time = time.time() - action_start
+            if outcome == "blocked" and pending is not None:
+                # The queued history assumed the move happened
+                pending = None
+                prefetch_cancelled += 1
             
-            if completed or action == "complete":
+            if outcome == "complete" or action == "complete":
                 print("\nGoal achieved!")
                 break
             
             loop_time = time.time() - loop_start
-            print(f"Loop time: {loop_time:.2f}s")
+            loop_seconds.observe(loop_time)
+            elapsed_min = (time.time() - run_start) / 60
+            print(f"Loop time: {loop_time:.2f}s (decision wait {decision_time:.2f}s, action {action_time:.2f}s)")
+            autonomous_progress.update({
+                "action_count": action_count,
+                "last_action": action,
+                "progress": decision.get('progress', 'N/A'),
+                "loop_time_s": round(loop_time, 2),
+                "avg_decision_wait_s": round(decision_wait_total / action_count, 2),
+                "actions_per_min": round(action_count / elapsed_min, 1) if elapsed_min > 0 else None,
+                "prefetch_used": prefetch_used,
+                "prefetch_skipped": prefetch_skipped,
+                "prefetch_cancelled": prefetch_cancelled,
+                "prefetch_discarded": prefetch_discarded
+            })
             
             # Minimal delay for fast navigation
             time.sleep(0.2)
@@ -187,13 +315,17 @@ def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20
             print(f"\nError: {e}")
             break
     
+    # Drop any decision still in flight
+    if decision_pool is not None:
+        decision_pool.shutdown(wait=False)
+    
     # Final stop
-    stop_robot()
+    get_motion_executor().stop()
     autonomous_stop_event.clear()
     
     # Notify server to stop
     try:
-        requests.post(f"{WINDOWS_SERVER_BASE}/autonomous/stop", timeout=5)
+        server_client.post("/autonomous/stop")
     except:
         pass
     
@@ -208,7 +340,8 @@ def autonomous_navigation_loop(camera_instance, goal: str, max_actions: int = 20
         "completed": action_count < max_actions
     }
 
-def start_autonomous_mode(camera_instance, goal: str, max_actions: int = 20):
+def start_autonomous_mode(camera_instance, goal: str, max_actions: int = 20, stream_output=None,
+                          pipelined: bool = AUTONOMOUS_PIPELINED):
     """Start autonomous navigation in a separate thread"""
     global autonomous_thread, autonomous_stop_event
     
@@ -224,7 +357,7 @@ def start_autonomous_mode(camera_instance, goal: str, max_actions: int = 20):
     # Start new thread
     autonomous_thread = Thread(
         target=autonomous_navigation_loop,
-        args=(camera_instance, goal, max_actions)
+        args=(camera_instance, goal, max_actions, stream_output, pipelined)
     )
     autonomous_thread.start()
     
@@ -239,7 +372,7 @@ def stop_autonomous_mode():
     
     print("Stopping autonomous mode...")
     autonomous_stop_event.set()
-    stop_robot()
+    get_motion_executor().stop()
     
     # Wait for thread to finish
     if autonomous_thread and autonomous_thread.is_alive():
@@ -253,3 +386,7 @@ def stop_autonomous_mode():
 def is_autonomous_active():
     """Check if autonomous mode is active"""
     return autonomous_thread is not None and autonomous_thread.is_alive()
+
+def get_autonomous_progress():
+    """Get goal, action count and latest decision of the current (or last) run"""
+    return dict(autonomous_progress)
@@ -0,0 +1,128 @@
+# robot/battery.py
+"""
+Battery state-of-charge estimator.
+Samples the battery voltage on a schedule, smooths it, compensates the
+sag caused by the motors and estimates the remaining runtime from the
+discharge rate. Readers get the cached estimate and never touch SPI.
+"""
+import time
+from collections import deque
+from threading import Thread, Condition, Lock
+import numpy as np
+from config import (BATTERY_SAMPLE_INTERVAL, BATTERY_TTL, BATTERY_MIN_VOLTAGE, BATTERY_MAX_VOLTAGE,
+                    BATTERY_SAG_PER_100DPS, BATTERY_RUNTIME_WINDOW)
+
+
+class BatteryMonitor:
+    """
+    Background battery sampler with a TTL-cached estimate.
+
+    :param read_voltage: callable returning the raw battery voltage
+    :param motor_speed: callable returning the current wheel speed in
+                        degrees per second (0 when the robot is idle)
+    """
+    def __init__(self, read_voltage, motor_speed=lambda: 0, interval=BATTERY_SAMPLE_INTERVAL,
+                 ttl=BATTERY_TTL, alpha=0.3):
+        self.read_voltage = read_voltage
+        self.motor_speed = motor_speed
+        self.interval = interval
+        self.ttl = ttl
+        self.alpha = alpha
+        self.filtered_voltage = None
+        self.estimate = None
+        self.history = deque()  # (timestamp, percentage) within the runtime window
+        self.condition = Condition()
+        self.reads = 0
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self._sample()
+            except Exception as e:
+                print(f"Battery sampler error: {e}")
+            time.sleep(self.interval)
+
+    def _sample(self):
+        voltage = self.read_voltage()
+        speed = self.motor_speed()
+        # Motors pull the voltage down roughly in proportion to speed
+        compensated = voltage + BATTERY_SAG_PER_100DPS * speed / 100.0
+        now = time.time()
+
+        with self.condition:
+            self.reads += 1
+            if self.filtered_voltage is None:
+                self.filtered_voltage = compensated
+            else:
+                self.filtered_voltage += self.alpha * (compensated - self.filtered_voltage)
+
+            span = BATTERY_MAX_VOLTAGE - BATTERY_MIN_VOLTAGE
+            percentage = max(0, min(100, (self.filtered_voltage - BATTERY_MIN_VOLTAGE) / span * 100))
+
+            self.history.append((now, percentage))
+            while self.history and now - self.history[0][0] > BATTERY_RUNTIME_WINDOW:
+                self.history.popleft()
+
+            self.estimate = {
+                "voltage": round(self.filtered_voltage, 2),
+                "raw_voltage": round(voltage, 2),
+                "percentage": round(percentage, 1),
+                "under_load": speed > 0,
+                "runtime_min": self._estimate_runtime(percentage),
+                "timestamp": now
+            }
+            self.condition.notify_all()
+
+    def _estimate_runtime(self, percentage):
+        # Caller holds self.condition
+        if len(self.history) < 5:
+            return None
+        times = np.array([t for t, _ in self.history])
+        values = np.array([p for _, p in self.history])
+        if times[-1] - times[0] < 60:
+            return None
+        rate = np.polyfit(times - times[0], values, 1)[0]  # percent per second
+        if rate >= 0:
+            return None
+        return round(percentage / -rate / 60, 1)
+
+    def get_estimate(self, timeout=2.0, with_age=True):
+        """
+        Return the cached estimate (with its age unless with_age=False),
+        waiting briefly only for the very first sample. Returns None if
+        nothing was sampled yet.
+        """
+        with self.condition:
+            if self.estimate is None:
+                self.condition.wait_for(lambda: self.estimate is not None, timeout)
+            if self.estimate is None:
+                return None
+            estimate = dict(self.estimate)
+        age = time.time() - estimate.pop("timestamp")
+        if with_age:
+            estimate["age_s"] = round(age, 1)
+        estimate["stale"] = age > self.ttl
+        return estimate
+
+
+# Singleton instance for easy access
+_battery_monitor_instance = None
+_battery_monitor_lock = Lock()
+
+def get_battery_monitor():
+    """Get or start the battery monitor singleton."""
+    global _battery_monitor_instance
+    with _battery_monitor_lock:
+        if _battery_monitor_instance is None:
+            from . import movement
+            from .motion import get_motion_executor
+            _battery_monitor_instance = BatteryMonitor(
+                movement.gpg.get_voltage_battery,
+                lambda: get_motion_executor().current_speed()
+            ).start()
+        return _battery_monitor_instance
@@ -1,78 +1,495 @@
 # robot/camera.py
 import io
 import os
+import queue
+import time
 import requests
-from threading import Condition
+from threading import Thread, Lock, Timer, current_thread
+from config import (CAMERA_RES, CAMERA_FPS, SNAPSHOT_MAX_AGE, STILL_CAPTURE_TIMEOUT, STILL_JPEG_QUALITY, DETECTION_BOX_TTL, DETECTION_UPLOAD_LEVELS,
+                    DETECTION_BOX_UPLOAD_LEVELS)
+from . import metrics, server_client
+from .frame_broker import FrameBroker, generate_mjpeg
+from .detection_control import AdaptiveDetectionController
+from .imaging import reencode, draw_boxes
+from .tracker import BoxTracker
+
+# Splitter ports used by the MJPEG streams; port 0 serves captures
+STILL_SPLITTER_PORT = 0
+DETECTION_SPLITTER_PORT = 1
+RAW_SPLITTER_PORT = 2
+
+frame_interval_seconds = metrics.histogram("ixmonitor_camera_frame_interval_seconds",
+                                           "Time between encoded frames from the camera", labelnames=("stream",))
+detection_seconds = metrics.histogram("ixmonitor_detection_seconds",
+                                      "Upload and round trip of one detection request", labelnames=("mode",))
+detection_result_seconds = metrics.histogram("ixmonitor_detection_result_seconds",
+                                             "Capture of a frame to its detections on the stream",
+                                             labelnames=("mode",))
+snapshot_seconds = metrics.histogram("ixmonitor_snapshot_seconds",
+                                     "Time to get a JPEG of the current view", labelnames=("source",))
 
 class StreamingOutput:
     """
     Handles MJPEG stream and sends frames to Windows face detection server.
-    Optimized for performance with frame skipping.
+    Detection runs on a background worker so the encoder callback never
+    waits on the network; only the newest pending frame is kept.
+
+    In "image" mode the server returns an annotated JPEG that replaces
+    the frame. In "boxes" mode it returns JSON boxes for a reduced
+    upload and the robot draws the last boxes on every live frame
+    until they expire. With tracking, boxes are predicted between
+    detections and frames are only sent when the tracks need a refresh.
     """
-    def __init__(self, face_server_url=None, frame_skip=3, timeout=0.5):
-        self.frame = None
+    def __init__(self, face_server_url=None, frame_skip=3, timeout=0.5, adaptive=False, mode="image",
+                 box_ttl=DETECTION_BOX_TTL, tracking=False):
         self.buffer = io.BytesIO()
-        self.condition = Condition()
+        self.broker = FrameBroker()
         self.face_server_url = face_server_url
         self.frame_skip = frame_skip
         self.timeout = timeout
+        self.mode = mode
+        # Per-frame metrics, bound once to skip the label lookup
+        self.detection_series = detection_seconds.labels(mode=mode)
+        self.result_series = detection_result_seconds.labels(mode=mode)
+        self.set_name("stream")  # renamed by StreamManager.register
         self.frame_count = 0
+        # Inter-frame gaps, to see stalls of the camera pipeline
+        self.last_frame_at = None
+        self.frame_gaps = 0
+        self.gap_total = 0.0
+        self.gap_max = 0.0
+        self.stalls = 0
+        self.stall_threshold = 2.0 / CAMERA_FPS
+        if mode == "boxes":
+            levels = DETECTION_BOX_UPLOAD_LEVELS
+        else:
+            # The annotated reply replaces the live frame, so a downscaled
+            # upload would make the stream switch sizes
+            levels = [level for level in DETECTION_UPLOAD_LEVELS if level[0] >= 1.0] or [(1.0, None)]
+        self.upload_levels = levels
+        # Adapts frame_skip and upload size to the measured server latency
+        self.controller = AdaptiveDetectionController(frame_skip, levels=levels) \
+            if adaptive and face_server_url else None
+
+        # Detection stage: size-1 queue, stale frames are replaced by newer ones
+        self.detection_queue = queue.Queue(maxsize=1)
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+        self.frames_annotated = 0
+        self.frames_failed = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_total = 0.0  # capture to annotated frame on the stream
+        self.latency_count = 0
+        self.detection_thread = None
+        if self.face_server_url:
+            self.detection_thread = Thread(target=self._detection_worker, daemon=True)
+            self.detection_thread.start()
+
+        # Overlay stage (boxes mode): latest boxes and a size-1 render queue
+        self.box_ttl = box_ttl
+        self.boxes = []
+        self.boxes_at = 0.0
+        self.boxes_captured_at = None  # capture time of a frame whose boxes are not drawn yet
+        self.boxes_lock = Lock()
+        self.render_queue = queue.Queue(maxsize=1)
+        self.frames_rendered = 0
+        self.tracker = BoxTracker() if mode == "boxes" and tracking else None
+        self.detections_skipped = 0  # frames the tracker covered without a server call
+        if self.face_server_url and self.mode == "boxes":
+            Thread(target=self._render_worker, daemon=True).start()
 
     def write(self, buf):
         if buf.startswith(b'\xff\xd8'):
             self.buffer.truncate()
-            with self.condition:
-                raw_frame = self.buffer.getvalue()
-                
-                # Send to face detection server and get annotated frame back
-                if self.face_server_url:
-                    self.frame_count += 1
-                    if self.frame_count >= self.frame_skip:
-                        self.frame_count = 0
-                        try:
-                            response = requests.post(
-                                self.face_server_url, 
-                                files={'image': ('frame.jpg', raw_frame, 'image/jpeg')}, 
-                                timeout=self.timeout
-                            )
-                            if response.status_code == 200:
-                                # Use annotated frame from server
-                                self.frame = response.content
-                            else:
-                                # Fallback to raw frame if server error
-                                self.frame = raw_frame
-                        except:
-                            # Fallback to raw frame on network error
-                            self.frame = raw_frame
+            if self.buffer.tell():
+                self._record_gap()
+                with self.buffer.getbuffer() as raw_frame:
+                    if self.mode == "boxes" and self._boxes_live():
+                        # Overlay drawing happens off the encoder thread
+                        self._put_latest(self.render_queue, bytes(raw_frame))
                     else:
-                        # Use raw frame for skipped frames
-                        self.frame = raw_frame
-                else:
-                    # No face detection server, use raw frame
-                    self.frame = raw_frame
-                
-                self.condition.notify_all()
+                        # Publish the raw frame at full camera rate
+                        self._publish(raw_frame)
+
+                    # Hand every Nth frame to the detection worker
+                    if self.face_server_url:
+                        self.frame_count += 1
+                        if self.frame_count >= self._current_frame_skip():
+                            if self.tracker and not self.tracker.needs_detection():
+                                self.detections_skipped += 1
+                            else:
+                                self.frame_count = 0
+                                self._submit_for_detection(bytes(raw_frame))
             self.buffer.seek(0)
         return self.buffer.write(buf)
 
+    def set_name(self, name):
+        self.name = name
+        self.interval_series = frame_interval_seconds.labels(stream=name)
+
+    def _record_gap(self):
+        now = time.monotonic()
+        if self.last_frame_at is not None:
+            gap = now - self.last_frame_at
+            # Recording restarts are not stalls
+            if gap < 5.0:
+                self.interval_series.observe(gap)
+                self.frame_gaps += 1
+                self.gap_total += gap
+                self.gap_max = max(self.gap_max, gap)
+                if gap > self.stall_threshold:
+                    self.stalls += 1
+        self.last_frame_at = now
+
+    def get_gap_stats(self):
+        """Inter-frame gap statistics of the encoder output."""
+        return {
+            "avg_gap_ms": round(self.gap_total / self.frame_gaps * 1000, 1) if self.frame_gaps else None,
+            "max_gap_ms": round(self.gap_max * 1000, 1),
+            "stalls": self.stalls,
+            "stall_threshold_ms": round(self.stall_threshold * 1000, 1)
+        }
+
+    def _current_frame_skip(self):
+        return self.controller.frame_skip if self.controller else self.frame_skip
+
+    def _publish(self, frame):
+        """Make a frame the current one and wake up stream readers."""
+        self.broker.publish(frame)
+
+    def _put_latest(self, target_queue, item):
+        """Put an item in a size-1 queue, replacing one still waiting. Returns True if one was dropped."""
+        try:
+            target_queue.put_nowait(item)
+            return False
+        except queue.Full:
+            dropped = True
+            try:
+                target_queue.get_nowait()
+            except queue.Empty:
+                dropped = False
+            # Only the encoder thread puts, so there is room now
+            target_queue.put_nowait(item)
+            return dropped
+
+    def _submit_for_detection(self, raw_frame):
+        """Queue a frame for detection, replacing a frame still waiting."""
+        self.frames_submitted += 1
+        if self._put_latest(self.detection_queue, (time.monotonic(), raw_frame)):
+            self.frames_dropped += 1
+
+    def _prepare_upload(self, raw_frame):
+        if self.controller:
+            return self.controller.prepare(raw_frame)
+        scale, quality = self.upload_levels[0]
+        return raw_frame if quality is None else reencode(raw_frame, scale, quality)
+
+    def _record_latency(self, captured_at):
+        latency = time.monotonic() - captured_at
+        self.result_series.observe(latency)
+        self.latency_total += latency
+        self.latency_count += 1
+
+    def _detection_worker(self):
+        """Send queued frames to the face detection server and publish results."""
+        while True:
+            captured_at, raw_frame = self.detection_queue.get()
+            ok = False
+            start = time.monotonic()
+            try:
+                upload = self._prepare_upload(raw_frame)
+                self.bytes_sent += len(upload)
+                response = server_client.post(
+                    self.face_server_url,
+                    files={'image': ('frame.jpg', upload, 'image/jpeg')},
+                    timeout=self.timeout
+                )
+                self.bytes_received += len(response.content)
+                if response.status_code == 200:
+                    self.frames_annotated += 1
+                    if self.mode == "boxes":
+                        # Overlays are drawn by the render worker
+                        self._set_boxes(response.json().get("boxes", []), captured_at)
+                    else:
+                        # Switch the stream to the annotated frame
+                        self._publish(response.content)
+                        self._record_latency(captured_at)
+                    ok = True
+                else:
+                    # Keep showing raw frames if server error
+                    self.frames_failed += 1
+            except (requests.exceptions.RequestException, OSError, ValueError):
+                # Keep showing raw frames on network, re-encode or bad JSON error
+                self.frames_failed += 1
+            elapsed = time.monotonic() - start
+            self.detection_series.observe(elapsed)
+            if self.controller:
+                self.controller.record(elapsed, ok)
+
+    def _set_boxes(self, boxes, captured_at):
+        if self.tracker:
+            # Boxes describe the scene at capture time
+            self.tracker.update(boxes, now=captured_at)
+        with self.boxes_lock:
+            self.boxes = boxes
+            self.boxes_at = time.monotonic()
+            self.boxes_captured_at = captured_at
+
+    def _boxes_live(self):
+        if self.tracker:
+            return self.tracker.has_tracks()
+        return bool(self.boxes) and time.monotonic() - self.boxes_at <= self.box_ttl
+
+    def _render_worker(self):
+        """Draw the latest boxes on live frames and publish them."""
+        while True:
+            raw_frame = self.render_queue.get()
+            with self.boxes_lock:
+                if self.tracker:
+                    boxes = self.tracker.predict()
+                else:
+                    boxes = self.boxes if self._boxes_live() else []
+                captured_at, self.boxes_captured_at = self.boxes_captured_at, None
+            if not boxes:
+                self._publish(raw_frame)
+                continue
+            try:
+                self._publish(draw_boxes(raw_frame, boxes))
+                self.frames_rendered += 1
+                if captured_at is not None:
+                    self._record_latency(captured_at)
+            except (OSError, KeyError, TypeError, ValueError) as e:
+                print(f"Overlay rendering failed: {e}")
+                self._publish(raw_frame)
+
+    def get_detection_stats(self):
+        """Return counters for the detection stage."""
+        return {
+            "enabled": self.face_server_url is not None,
+            "mode": self.mode,
+            "frame_skip": self._current_frame_skip(),
+            "submitted": self.frames_submitted,
+            "dropped": self.frames_dropped,
+            "annotated": self.frames_annotated,
+            "failed": self.frames_failed,
+            "rendered": self.frames_rendered,
+            "detections_skipped": self.detections_skipped,
+            "pending": self.detection_queue.qsize(),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "avg_latency_ms": round(self.latency_total / self.latency_count * 1000, 1)
+                              if self.latency_count else None,
+            "boxes": list(self.boxes) if self.mode == "boxes" else None,
+            "controller": self.controller.get_stats() if self.controller else None,
+            "tracker": self.tracker.get_stats() if self.tracker else None
+        }
+
+
+class StreamManager:
+    """
+    Reference-counted recordings on camera splitter ports.
+    A port starts recording when its first subscriber connects and stops
+    after a grace period once the last one has disconnected.
+    """
+    def __init__(self, camera, grace_period=5.0, resize=None):
+        self.camera = camera
+        self.grace_period = grace_period
+        self.resize = resize  # stream size when the camera runs at a higher resolution
+        self.lock = Lock()
+        self.outputs = {}
+        self.names = {}
+        self.subscribers = {}
+        self.recording = {}
+        self.stop_timers = {}
+
+    def register(self, port, output, name):
+        """Attach a StreamingOutput to a splitter port without recording."""
+        with self.lock:
+            self.outputs[port] = output
+            self.names[port] = name
+            output.set_name(name)
+            self.subscribers[port] = 0
+            self.recording[port] = False
 
-def take_picture(camera_instance, filename="door_picture.jpg"):
-    """Takes a photo using the existing camera instance."""
-    import os
+    def acquire(self, port):
+        """Add a subscriber, starting the recording if the port is idle."""
+        with self.lock:
+            timer = self.stop_timers.pop(port, None)
+            if timer is not None:
+                timer.cancel()
+            if not self.recording[port]:
+                print(f"Starting recording on splitter port {port} ({self.names[port]})")
+                self.camera.start_recording(self.outputs[port], format='mjpeg', splitter_port=port,
+                                            resize=self.resize)
+                self.recording[port] = True
+            # Only counted once recording is up, so a failed start does not leak
+            self.subscribers[port] += 1
+
+    def release(self, port):
+        """Remove a subscriber, scheduling a stop if it was the last one."""
+        with self.lock:
+            self.subscribers[port] = max(0, self.subscribers[port] - 1)
+            if self.subscribers[port] == 0 and self.recording[port] and port not in self.stop_timers:
+                timer = Timer(self.grace_period, self._stop_if_idle, args=(port,))
+                timer.daemon = True
+                self.stop_timers[port] = timer
+                timer.start()
+
+    def _stop_if_idle(self, port):
+        with self.lock:
+            # A timer cancelled or replaced while it was firing must not stop the port
+            if self.stop_timers.get(port) is not current_thread():
+                return
+            del self.stop_timers[port]
+            if self.subscribers[port] == 0 and self.recording[port]:
+                print(f"Stopping recording on splitter port {port} ({self.names[port]})")
+                try:
+                    self.camera.stop_recording(splitter_port=port)
+                except Exception as e:
+                    print(f"Error stopping recording on port {port}: {e}")
+                self.recording[port] = False
+
+    def generate(self, port):
+        """MJPEG generator that holds a subscription for its lifetime."""
+        acquired = False
+        try:
+            self.acquire(port)
+            acquired = True
+            yield from generate_mjpeg(self.outputs[port].broker, self.names[port])
+        finally:
+            if acquired:
+                self.release(port)
+
+    def get_status(self):
+        """Return recording state and subscriber count of each port."""
+        with self.lock:
+            return {
+                str(port): {
+                    "name": self.names[port],
+                    "recording": self.recording[port],
+                    "subscribers": self.subscribers[port],
+                    "stop_pending": port in self.stop_timers
+                }
+                for port in self.outputs
+            }
+
+
+# Snapshot counters per path, to compare stream frames against captures
+_capture_lock = Lock()
+snapshot_stats = {
+    "stream": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "capture": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "still": {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0}
+}
+
+def _record_snapshot(source, start):
+    elapsed = time.monotonic() - start
+    snapshot_seconds.observe(elapsed, source=source)
+    elapsed_ms = elapsed * 1000
+    stats = snapshot_stats[source]
+    stats["count"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def capture_snapshot(camera_instance, stream_output=None, max_age=SNAPSHOT_MAX_AGE, resolution=None):
+    """
+    Return a JPEG of the current view as (bytes, source).
+
+    Serves the newest frame of a live stream when it is at most max_age
+    seconds old and no other resolution was asked for; otherwise falls
+    back to a capture on the video port.
+    """
+    start = time.monotonic()
+    stream_res = tuple(resolution or CAMERA_RES) == tuple(CAMERA_RES)
+    if stream_output is not None and stream_res:
+        latest = stream_output.broker.latest()
+        if latest is not None and time.time() - latest[2] <= max_age:
+            _record_snapshot("stream", start)
+            return latest[1], "stream"
+
+    stream = io.BytesIO()
+    with _capture_lock:
+        camera_instance.capture(stream, format='jpeg', use_video_port=True, splitter_port=STILL_SPLITTER_PORT,
+                                resize=tuple(resolution or CAMERA_RES))
+    _record_snapshot("capture", start)
+    return stream.getvalue(), "capture"
+
+
+def get_snapshot_stats():
+    """Return per-path snapshot counts and latencies."""
+    result = {
+        source: {
+            "count": stats["count"],
+            "avg_ms": round(stats["total_ms"] / stats["count"], 2) if stats["count"] else None,
+            "max_ms": round(stats["max_ms"], 2)
+        }
+        for source, stats in snapshot_stats.items()
+    }
+    result["still"]["timeouts"] = snapshot_stats["still"]["timeouts"]
+    return result
+
+
+def capture_still(camera_instance, timeout=STILL_CAPTURE_TIMEOUT):
+    """
+    Capture a full-resolution JPEG on the video port. The camera already
+    runs at the still resolution, so live streams keep going; returns
+    None if the still does not arrive within `timeout` seconds.
+    """
+    start = time.monotonic()
+    if not _capture_lock.acquire(timeout=timeout):
+        snapshot_stats["still"]["timeouts"] += 1
+        return None
+    result = {}
+
+    def capture():
+        try:
+            stream = io.BytesIO()
+            camera_instance.capture(stream, format='jpeg', use_video_port=True, splitter_port=STILL_SPLITTER_PORT,
+                                    quality=STILL_JPEG_QUALITY)
+            result["jpeg"] = stream.getvalue()
+        except Exception as e:
+            result["error"] = e
+        finally:
+            _capture_lock.release()
+
+    worker = Thread(target=capture, daemon=True)
+    worker.start()
+    worker.join(max(0.0, timeout - (time.monotonic() - start)))
+    if worker.is_alive():
+        # The capture keeps the lock until it finishes; give up waiting
+        snapshot_stats["still"]["timeouts"] += 1
+        return None
+    if "error" in result:
+        raise result["error"]
+    _record_snapshot("still", start)
+    return result["jpeg"]
+
+
+def take_picture(camera_instance):
+    """
+    Takes a photo using the existing camera instance and stores it in
+    the picture gallery. Returns the gallery entry, or None on failure.
+    """
+    from .audio import play_audio_message
+    from .gallery import get_picture_store
     
     print("Taking picture...")
     try:
-        # Use the existing camera's capture method with still port
-        camera_instance.capture(filename, use_video_port=False, resize=(1024, 768))
-        print(f"Saved {filename}")
+        # Video-port capture at the sensor resolution; streams keep running
+        jpeg = capture_still(camera_instance)
+        if jpeg is None:
+            print("Still capture timed out")
+            return None
+        entry = get_picture_store().add(jpeg)
+        print(f"Saved picture {entry['id']}")
         
-        # Play audio confirmation
-        try:
-            os.system('espeak "Picture taken" --stdout | aplay -D plughw:1,0 2>/dev/null')
-        except:
-            pass
+        # Play audio confirmation (pre-rendered at startup); queued behind any
+        # chat reply, so don't hold the request open until it has played
+        play_audio_message("Picture taken", voice="en", wait=False)
         
-        return filename
+        return entry
     except Exception as e:
         print(f"Error taking picture: {e}")
         return None
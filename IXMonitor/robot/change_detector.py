@@ -0,0 +1,108 @@
+# robot/change_detector.py
+"""
+On-robot change detector.
+Compares downscaled grayscale frames with a running-average background
+so the auto-greet loop only asks the server about frames where
+something moved, plus an occasional keep-alive check.
+"""
+import time
+import numpy as np
+from config import (CHANGE_DETECTOR_SIZE, CHANGE_PIXEL_THRESHOLD, CHANGE_MIN_FRACTION,
+                    CHANGE_BACKGROUND_ALPHA, AUTO_GREET_KEEPALIVE, AUTO_GREET_MIN_CHECK_INTERVAL,
+                    AUTO_GREET_POLL_INTERVAL)
+from .imaging import decode_gray
+
+
+class ChangeDetector:
+    """
+    Background model of a static scene.
+
+    :param pixel_threshold: gray-level difference for a pixel to count as changed
+    :param min_fraction: fraction of changed pixels that counts as motion
+    :param alpha: background learning rate per frame
+    :param poll_interval: check interval of fixed polling, to report calls saved against
+    """
+    def __init__(self, size=CHANGE_DETECTOR_SIZE, pixel_threshold=CHANGE_PIXEL_THRESHOLD,
+                 min_fraction=CHANGE_MIN_FRACTION, alpha=CHANGE_BACKGROUND_ALPHA,
+                 keepalive=AUTO_GREET_KEEPALIVE, min_interval=AUTO_GREET_MIN_CHECK_INTERVAL,
+                 poll_interval=AUTO_GREET_POLL_INTERVAL):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.alpha = alpha
+        self.keepalive = keepalive
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.background = None
+        self.last_check = 0.0
+        self.frames = 0
+        self.motion_frames = 0
+        self.server_checks = 0
+        self.keepalive_checks = 0
+        self.last_fraction = 0.0
+        self.motion_since = None  # start time of the current motion episode
+        self.first_frame_at = None
+
+    def update(self, jpeg_bytes):
+        """Feed a frame; returns True if it differs from the background."""
+        gray = decode_gray(jpeg_bytes, self.size)
+        self.frames += 1
+        if self.first_frame_at is None:
+            self.first_frame_at = time.time()
+        if self.background is None:
+            self.background = gray
+            return True
+
+        changed = np.abs(gray - self.background) > self.pixel_threshold
+        self.last_fraction = float(changed.mean())
+        motion = self.last_fraction >= self.min_fraction
+        # Learn slowly where pixels changed so a person standing in view is
+        # not absorbed into the background within a few frames; still areas
+        # follow lighting drift at the full rate
+        rate = np.where(changed, self.alpha * 0.1, self.alpha)
+        self.background += rate * (gray - self.background)
+        if motion:
+            self.motion_frames += 1
+            if self.motion_since is None:
+                self.motion_since = time.time()
+        else:
+            self.motion_since = None
+        return motion
+
+    def should_check(self, jpeg_bytes):
+        """
+        Decide whether this frame goes to the server. Returns "motion",
+        "keepalive" or None.
+        """
+        motion = self.update(jpeg_bytes)
+        now = time.time()
+        since_check = now - self.last_check
+        if motion and since_check >= self.min_interval:
+            reason = "motion"
+        elif since_check >= self.keepalive:
+            reason = "keepalive"
+            self.keepalive_checks += 1
+        else:
+            return None
+        self.last_check = now
+        self.server_checks += 1
+        return reason
+
+    def reset(self):
+        self.background = None
+        self.last_check = 0.0
+        self.motion_since = None
+
+    def get_stats(self):
+        # What fixed polling would have sent over the same time
+        elapsed = time.time() - self.first_frame_at if self.first_frame_at else 0.0
+        polling_checks = int(elapsed / self.poll_interval) + (1 if self.first_frame_at else 0)
+        return {
+            "frames": self.frames,
+            "motion_frames": self.motion_frames,
+            "server_checks": self.server_checks,
+            "keepalive_checks": self.keepalive_checks,
+            "polling_checks": polling_checks,
+            "calls_saved": polling_checks - self.server_checks,
+            "last_changed_fraction": round(self.last_fraction, 4)
+        }
@@ -0,0 +1,94 @@
+# robot/decision_cache.py
+"""
+Local cache of autonomous navigation decisions.
+Decisions are keyed on the goal, the last few actions and a perceptual
+hash of the frame, so a blocked robot or a static scene gets its answer
+without another server round trip.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from config import DECISION_CACHE_SIZE, DECISION_CACHE_TTL, DECISION_CACHE_MAX_DISTANCE, DECISION_CACHE_HISTORY
+from .imaging import phash, hamming
+
+
+class DecisionCache:
+    """
+    Bounded LRU of decisions with TTL expiry. A lookup hits when an
+    entry has the same goal and action suffix and its frame hash is
+    within `max_distance` bits of the new frame.
+    """
+    def __init__(self, max_entries=DECISION_CACHE_SIZE, ttl=DECISION_CACHE_TTL,
+                 max_distance=DECISION_CACHE_MAX_DISTANCE, history=DECISION_CACHE_HISTORY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.history = history
+        self.entries = OrderedDict()  # (goal, suffix, hash) -> (stored_at, result)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, image_bytes, goal, previous_actions):
+        suffix = tuple(previous_actions[-self.history:]) if self.history else ()
+        return goal, suffix, phash(image_bytes)
+
+    def lookup(self, image_bytes, goal, previous_actions):
+        """Return (cached result or None, key to store the fresh result under)."""
+        key = self._key(image_bytes, goal, previous_actions)
+        goal, suffix, frame_hash = key
+        now = time.time()
+        with self.lock:
+            best = None
+            for entry_key, (stored_at, result) in list(self.entries.items()):
+                if now - stored_at > self.ttl:
+                    del self.entries[entry_key]
+                    continue
+                if entry_key[:2] != (goal, suffix):
+                    continue
+                distance = hamming(entry_key[2], frame_hash)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, entry_key, result)
+            if best is None:
+                self.misses += 1
+                return None, key
+            self.hits += 1
+            self.entries.move_to_end(best[1])
+            return best[2], key
+
+    def store(self, key, result):
+        with self.lock:
+            self.entries[key] = (time.time(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions
+            }
+
+
+# Singleton instance for easy access
+_decision_cache_instance = None
+_decision_cache_lock = Lock()
+
+def get_decision_cache():
+    """Get the decision cache singleton."""
+    global _decision_cache_instance
+    with _decision_cache_lock:
+        if _decision_cache_instance is None:
+            _decision_cache_instance = DecisionCache()
+        return _decision_cache_instance
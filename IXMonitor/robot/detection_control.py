@@ -0,0 +1,102 @@
+# robot/detection_control.py
+"""
+Feedback controller for the face detection stage.
+Tracks the round-trip latency and error rate of detection requests and
+trades frame rate and upload size against them: additive increase of
+the detection rate while there is headroom, multiplicative decrease as
+soon as the server falls behind.
+"""
+import time
+from collections import deque
+from threading import Lock
+from config import (DETECTION_TARGET_LATENCY, DETECTION_MAX_FRAME_SKIP, DETECTION_MAX_ERROR_RATE,
+                    DETECTION_UPLOAD_LEVELS)
+from .imaging import reencode
+
+
+class AdaptiveDetectionController:
+    """
+    Chooses the frame-skip ratio and upload level for detection.
+
+    Upload levels are (scale, jpeg_quality) pairs ordered from best to
+    cheapest; a quality of None sends the camera frame untouched.
+    """
+    def __init__(self, frame_skip, target_latency=DETECTION_TARGET_LATENCY, min_skip=1,
+                 max_skip=DETECTION_MAX_FRAME_SKIP, max_error_rate=DETECTION_MAX_ERROR_RATE,
+                 levels=DETECTION_UPLOAD_LEVELS, alpha=0.2, settle=5):
+        self.frame_skip = frame_skip
+        self.target_latency = target_latency
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+        self.max_error_rate = max_error_rate
+        self.levels = levels
+        self.level = 0
+        self.alpha = alpha
+        self.settle = settle  # samples to wait after a change before judging it
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples_since_change = 0
+        self.decisions = deque(maxlen=20)
+        self.lock = Lock()
+
+    def prepare(self, frame):
+        """Return the frame to upload at the current level."""
+        scale, quality = self.levels[self.level]
+        if quality is None:
+            return frame
+        return reencode(frame, scale, quality)
+
+    def record(self, latency, ok):
+        """Feed one request outcome (latency in seconds) and adapt."""
+        with self.lock:
+            if ok:
+                self.latency = latency if self.latency is None else \
+                    self.latency + self.alpha * (latency - self.latency)
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+            self.samples_since_change += 1
+            if self.samples_since_change < self.settle:
+                return
+
+            overloaded = self.error_rate > self.max_error_rate or \
+                (self.latency is not None and self.latency > self.target_latency)
+            if overloaded:
+                if self.frame_skip < self.max_skip or self.level < len(self.levels) - 1:
+                    self.frame_skip = min(self.max_skip, self.frame_skip * 2)
+                    self.level = min(len(self.levels) - 1, self.level + 1)
+                    self._decide("overloaded")
+            elif self.latency is not None and self.latency < self.target_latency * 0.6 and \
+                    self.error_rate < self.max_error_rate / 2:
+                # Spend headroom on frame rate first, then on image quality
+                if self.frame_skip > self.min_skip:
+                    self.frame_skip -= 1
+                    self._decide("headroom")
+                elif self.level > 0:
+                    self.level -= 1
+                    self._decide("headroom")
+
+    def _decide(self, reason):
+        # Caller holds self.lock
+        self.samples_since_change = 0
+        scale, quality = self.levels[self.level]
+        self.decisions.append({
+            "time": round(time.time(), 1),
+            "reason": reason,
+            "frame_skip": self.frame_skip,
+            "scale": scale,
+            "quality": quality,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3)
+        })
+
+    def get_stats(self):
+        with self.lock:
+            scale, quality = self.levels[self.level]
+            return {
+                "frame_skip": self.frame_skip,
+                "scale": scale,
+                "quality": quality,
+                "target_latency_ms": round(self.target_latency * 1000),
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "error_rate": round(self.error_rate, 3),
+                "decisions": list(self.decisions)
+            }
@@ -0,0 +1,187 @@
+# robot/distance_filter.py
+"""
+Filter stage for distance sensor readings.
+All filters keep their history in a fixed-size NumPy ring and also
+estimate the closing speed, so stop logic can use time-to-collision.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size ring of (timestamp, value) pairs backed by NumPy arrays."""
+    def __init__(self, size):
+        self.size = size
+        self.times = np.zeros(size)
+        self.values = np.zeros(size)
+        self.index = 0
+        self.count = 0
+
+    def append(self, timestamp, value):
+        self.times[self.index] = timestamp
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def arrays(self):
+        """Return (times, values) in chronological order."""
+        if self.count < self.size:
+            return self.times[:self.count], self.values[:self.count]
+        order = np.roll(np.arange(self.size), -self.index)
+        return self.times[order], self.values[order]
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+
+class DistanceFilter:
+    """
+    Base class. update() takes a raw reading in mm and returns the
+    filtered distance; closing_speed() returns mm/s, positive when an
+    obstacle is getting closer.
+    """
+    def __init__(self, window=5):
+        self.ring = RingBuffer(window)
+        self.value = None
+
+    def update(self, timestamp, mm):
+        self.ring.append(timestamp, mm)
+        self.value = self._filter(timestamp, mm)
+        return self.value
+
+    def _filter(self, timestamp, mm):
+        raise NotImplementedError
+
+    def closing_speed(self):
+        """Least-squares slope over the ring, in mm/s towards the robot."""
+        times, values = self.ring.arrays()
+        if len(times) < 3 or times[-1] - times[0] <= 0:
+            return 0.0
+        slope = np.polyfit(times - times[0], values, 1)[0]
+        return float(-slope)
+
+    def reset(self):
+        self.ring.clear()
+        self.value = None
+
+
+class MeanFilter(DistanceFilter):
+    """Moving average, the sensor's original behaviour."""
+    def _filter(self, timestamp, mm):
+        _, values = self.ring.arrays()
+        return float(values.mean())
+
+
+class MedianFilter(DistanceFilter):
+    """Moving median, robust to single outliers."""
+    def _filter(self, timestamp, mm):
+        _, values = self.ring.arrays()
+        return float(np.median(values))
+
+
+class EMAFilter(DistanceFilter):
+    """Exponential moving average with little lag at high alpha."""
+    def __init__(self, window=5, alpha=0.5):
+        DistanceFilter.__init__(self, window)
+        self.alpha = alpha
+
+    def _filter(self, timestamp, mm):
+        if self.value is None:
+            return float(mm)
+        return self.alpha * mm + (1 - self.alpha) * self.value
+
+
+class KalmanFilter(DistanceFilter):
+    """
+    Constant-velocity 1-D Kalman filter over (distance, rate).
+    Readings whose innovation is beyond `gate` standard deviations are
+    rejected as outliers; after `max_rejects` in a row the filter
+    re-initializes on the new reading.
+    """
+    def __init__(self, window=5, process_noise=2.5e5, measurement_noise=225.0, gate=4.0, max_rejects=3):
+        DistanceFilter.__init__(self, window)
+        self.q = process_noise          # acceleration variance, (mm/s^2)^2
+        self.r = measurement_noise      # reading variance, mm^2
+        self.gate = gate
+        self.max_rejects = max_rejects
+        self.state = None               # [distance mm, rate mm/s]
+        self.covariance = None
+        self.last_time = None
+        self.rejects = 0
+        self.outliers = 0
+
+    def _initialize(self, timestamp, mm):
+        self.state = np.array([float(mm), 0.0])
+        self.covariance = np.diag([self.r, 1.0e6])
+        self.last_time = timestamp
+        self.rejects = 0
+
+    def _filter(self, timestamp, mm):
+        if self.state is None:
+            self._initialize(timestamp, mm)
+            return float(mm)
+
+        # Predict
+        dt = max(timestamp - self.last_time, 1e-3)
+        self.last_time = timestamp
+        transition = np.array([[1.0, dt], [0.0, 1.0]])
+        noise = self.q * np.array([[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]])
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + noise
+
+        # Gate outliers
+        innovation = mm - self.state[0]
+        variance = self.covariance[0, 0] + self.r
+        if innovation * innovation > self.gate * self.gate * variance:
+            self.outliers += 1
+            self.rejects += 1
+            if self.rejects >= self.max_rejects:
+                self._initialize(timestamp, mm)
+                return float(mm)
+            return float(self.state[0])
+        self.rejects = 0
+
+        # Update
+        gain = self.covariance[:, 0] / variance
+        self.state = self.state + gain * innovation
+        self.covariance = self.covariance - np.outer(gain, self.covariance[0, :])
+        return float(self.state[0])
+
+    def closing_speed(self):
+        if self.state is None:
+            return 0.0
+        return float(-self.state[1])
+
+    def reset(self):
+        DistanceFilter.reset(self)
+        self.state = None
+
+
+FILTERS = {
+    "mean": MeanFilter,
+    "median": MedianFilter,
+    "ema": EMAFilter,
+    "kalman": KalmanFilter,
+}
+
+
+def make_filter(name="kalman", **kwargs):
+    """Create a distance filter by name: mean, median, ema or kalman."""
+    try:
+        return FILTERS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown distance filter: {name}. Options: {', '.join(FILTERS)}")
+
+
+def replay(trace, distance_filter):
+    """
+    Run a recorded trace of (timestamp, mm) readings through a filter.
+    Returns arrays of filtered distance and closing speed per reading.
+    """
+    distance_filter.reset()
+    filtered = np.empty(len(trace))
+    speeds = np.empty(len(trace))
+    for i, (timestamp, mm) in enumerate(trace):
+        filtered[i] = distance_filter.update(timestamp, mm)
+        speeds[i] = distance_filter.closing_speed()
+    return filtered, speeds
@@ -1,7 +1,14 @@
 # robot/distance_sensor.py
 from di_sensors.easy_mutex import ifMutexAcquire, ifMutexRelease
 import time
+from collections import deque
+from threading import Thread, Condition, Lock
 from di_sensors import distance_sensor
+from config import DISTANCE_SAMPLE_HZ, DISTANCE_HISTORY, DISTANCE_FILTER, DISTANCE_FILTER_WINDOW
+from .distance_filter import make_filter
+from . import metrics
+
+read_seconds = metrics.histogram("ixmonitor_distance_read_seconds", "Time spent in one distance sensor read")
 
 
 class EasyDistanceSensor(distance_sensor.DistanceSensor):
@@ -9,16 +16,17 @@ class EasyDistanceSensor(distance_sensor.DistanceSensor):
     Class for the Distance Sensor device.
     Uses mutexes for thread-safe access.
     """
-    def __init__(self, port="I2C", use_mutex=False):
+    def __init__(self, port="I2C", use_mutex=False, filter_name=DISTANCE_FILTER):
         """
         Creates an EasyDistanceSensor object.
 
         :param string port: the bus for the sensor. Options: "I2C", "AD1", "AD2"
         :param bool use_mutex: Enable for multi-threaded access
+        :param string filter_name: reading filter. Options: "mean", "median", "ema", "kalman"
         """
         self.descriptor = "Distance Sensor"
         self.use_mutex = use_mutex
-        self.readings = []  # Store last 3 readings for averaging
+        self.filter = make_filter(filter_name, window=DISTANCE_FILTER_WINDOW)
 
         # Port mapping
         possible_ports = {
@@ -64,15 +72,12 @@ class EasyDistanceSensor(distance_sensor.DistanceSensor):
             attempt += 1
             time.sleep(0.001)
 
-        # Add valid reading to history for averaging
+        # Feed valid readings through the filter
         if mm < 8000 and mm > 5:
-            self.readings.append(mm)
-            if len(self.readings) > 3:
-                self.readings.pop(0)
-        
-        # If we have readings, use average; otherwise use current reading
-        if len(self.readings) > 0:
-            mm = round(sum(self.readings) / float(len(self.readings)))
+            mm = round(self.filter.update(time.time(), mm))
+        elif self.filter.value is not None:
+            # Invalid reading, keep the last filtered value
+            mm = round(self.filter.value)
         
         # Cap at 3000mm (300cm)
         if mm > 3000:
@@ -88,6 +93,14 @@ class EasyDistanceSensor(distance_sensor.DistanceSensor):
         cm = self.read_mm() // 10
         return cm
 
+    def closing_speed(self):
+        """
+        Estimated closing speed in cm/s, positive when an obstacle gets closer.
+        Reads the filter state, so only call it from the thread that reads
+        the sensor; other threads use DistanceSampler.get_closing_speed().
+        """
+        return self.filter.closing_speed() / 10.0
+
     def read_inches(self):
         """
         Reads distance in inches.
@@ -97,60 +110,192 @@ class EasyDistanceSensor(distance_sensor.DistanceSensor):
         return round(cm / 2.54, 1)
 
 
+class DistanceSampler:
+    """
+    Reads the sensor at a fixed rate on a daemon thread.
+    Keeps a timestamped latest-value slot plus a ring buffer of recent
+    readings so consumers never wait on I2C. The closing speed is taken
+    from the sensor's filter on the same thread and published with the
+    reading, since the filter itself is not thread-safe.
+    """
+    def __init__(self, sensor, rate_hz=DISTANCE_SAMPLE_HZ, history=DISTANCE_HISTORY):
+        self.sensor = sensor
+        self.period = 1.0 / rate_hz
+        self.latest = None  # (timestamp, cm)
+        self.latest_speed = 0.0  # closing speed in cm/s as of the latest reading
+        self.history = deque(maxlen=history)
+        self.condition = Condition()
+        self.reads = 0
+        self.read_time_total = 0.0
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            start = time.monotonic()
+            try:
+                cm = self.sensor.read()
+                speed = self.sensor.closing_speed()
+            except Exception as e:
+                print(f"Distance sampler read error: {e}")
+                cm = 0
+                speed = 0.0
+            reading = (time.time(), cm)
+            read_time = time.monotonic() - start
+            read_seconds.observe(read_time)
+            with self.condition:
+                self.latest = reading
+                self.latest_speed = speed
+                self.history.append(reading)
+                self.reads += 1
+                self.read_time_total += read_time
+                self.condition.notify_all()
+
+            # Fixed rate; if a read overran, start again right away
+            next_tick = max(next_tick + self.period, time.monotonic())
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def get_reading(self, max_age_ms=None, timeout=None):
+        """
+        Return the latest (timestamp, cm) reading, or None.
+
+        :param max_age_ms: if given, wait for a reading no older than this
+        :param timeout: longest wait in seconds (default: two sample periods)
+        """
+        with self.condition:
+            if max_age_ms is None:
+                # Only the very first call waits, for the first sample
+                if self.latest is None:
+                    self.condition.wait_for(lambda: self.latest is not None, 2 * self.period)
+                return self.latest
+            max_age = max_age_ms / 1000.0
+            if timeout is None:
+                timeout = max(2 * self.period, max_age)
+            fresh = lambda: self.latest is not None and time.time() - self.latest[0] <= max_age
+            if self.condition.wait_for(fresh, timeout):
+                return self.latest
+            return None
+
+    def get_closing_speed(self):
+        """Closing speed in cm/s as of the latest reading, positive when an obstacle gets closer."""
+        with self.condition:
+            return self.latest_speed
+
+    def get_history(self, seconds=None):
+        """Return recent (timestamp, cm) readings, oldest first."""
+        with self.condition:
+            readings = list(self.history)
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            readings = [r for r in readings if r[0] >= cutoff]
+        return readings
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                "rate_hz": round(1.0 / self.period, 1),
+                "reads": self.reads,
+                "avg_read_ms": round(self.read_time_total / self.reads * 1000, 2) if self.reads else None,
+                "latest_age_ms": round((time.time() - self.latest[0]) * 1000, 1) if self.latest else None
+            }
+
+
 # Singleton instance for easy access
 _distance_sensor_instance = None
+_distance_sensor_lock = Lock()
+_distance_sampler_instance = None
+_distance_sampler_lock = Lock()
 
 def get_distance_sensor():
     """Get or create the distance sensor singleton."""
     global _distance_sensor_instance
-    if _distance_sensor_instance is None:
-        try:
-            print("Initializing distance sensor on I2C...")
-            _distance_sensor_instance = EasyDistanceSensor(port="I2C", use_mutex=True)
-            # Test read to verify it's working
-            test_reading = _distance_sensor_instance.read()
-            print(f"Distance sensor initialized successfully - test reading: {test_reading}cm")
-        except Exception as e:
-            print(f"Warning: Could not initialize distance sensor: {e}")
-            print("Sensor will be disabled. Check connections and try again.")
-            _distance_sensor_instance = None
-    return _distance_sensor_instance
+    with _distance_sensor_lock:
+        if _distance_sensor_instance is None:
+            try:
+                print("Initializing distance sensor on I2C...")
+                _distance_sensor_instance = EasyDistanceSensor(port="I2C", use_mutex=True)
+                # Test read to verify it's working
+                test_reading = _distance_sensor_instance.read()
+                print(f"Distance sensor initialized successfully - test reading: {test_reading}cm")
+            except Exception as e:
+                print(f"Warning: Could not initialize distance sensor: {e}")
+                print("Sensor will be disabled. Check connections and try again.")
+                _distance_sensor_instance = None
+        return _distance_sensor_instance
+
+
+def get_distance_sampler():
+    """Get or start the background distance sampler singleton."""
+    global _distance_sampler_instance
+    # Concurrent first callers must not start two threads on the same sensor
+    with _distance_sampler_lock:
+        if _distance_sampler_instance is None:
+            sensor = get_distance_sensor()
+            if sensor is None:
+                return None
+            _distance_sampler_instance = DistanceSampler(sensor).start()
+        return _distance_sampler_instance
 
 
-def is_obstacle_detected(threshold_cm=30):
+def is_obstacle_detected(threshold_cm=30, max_age_ms=None, ttc_s=None):
     """
     Check if an obstacle is detected within threshold distance.
     
     :param threshold_cm: Distance threshold in centimeters (default 30cm)
+    :param max_age_ms: Only trust a reading at most this old
+    :param ttc_s: Also report an obstacle reached within this many seconds
     :returns: True if obstacle detected, False otherwise
     """
-    sensor = get_distance_sensor()
-    if sensor is None:
-        return False
-    
-    try:
-        distance = sensor.read()
-        return distance < threshold_cm and distance > 0
-    except Exception as e:
-        print(f"Error reading distance sensor: {e}")
+    distance = get_distance(max_age_ms=max_age_ms)
+    if distance is None:
         return False
+    if distance < threshold_cm:
+        return True
+    if ttc_s is not None:
+        ttc = get_time_to_collision(distance)
+        return ttc is not None and ttc < ttc_s
+    return False
 
 
-def get_distance():
+def get_time_to_collision(distance_cm=None):
     """
-    Get current distance reading in centimeters.
+    Seconds until the obstacle ahead is reached at the current closing
+    speed. Returns None if the sensor is unavailable or nothing is closing in.
+    """
+    sampler = get_distance_sampler()
+    if sampler is None:
+        return None
+    if distance_cm is None:
+        distance_cm = get_distance()
+        if distance_cm is None:
+            return None
+    speed = sampler.get_closing_speed()
+    # Ignore sensor noise around standstill
+    if speed < 1.0:
+        return None
+    return distance_cm / speed
+
+
+def get_distance(max_age_ms=None):
+    """
+    Get current distance reading in centimeters from the sampler cache.
     Returns None if sensor not available or reading failed.
+    
+    :param max_age_ms: Wait for a reading no older than this (optional)
     """
-    sensor = get_distance_sensor()
-    if sensor is None:
+    sampler = get_distance_sampler()
+    if sampler is None:
         return None
     
-    try:
-        distance = sensor.read()
-        # If distance is 0, it usually means sensor error - return None
-        if distance == 0:
-            return None
-        return distance
-    except Exception as e:
-        print(f"Error reading distance: {e}")
+    reading = sampler.get_reading(max_age_ms=max_age_ms)
+    if reading is None:
+        return None
+    distance = reading[1]
+    # If distance is 0, it usually means sensor error - return None
+    if distance == 0:
         return None
+    return distance
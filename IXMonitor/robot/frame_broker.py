@@ -0,0 +1,196 @@
+# robot/frame_broker.py
+"""
+Frame broker for MJPEG fan-out.
+Keeps the last N encoded frames in a preallocated ring with increasing
+sequence numbers. Each frame is copied into the ring once and clients
+read it through a memoryview, so the encoder's per-frame work does not
+grow with the number of viewers.
+"""
+import itertools
+import time
+from threading import Condition
+from . import metrics
+
+MJPEG_BOUNDARY = "FRAME"
+MJPEG_MIMETYPE = f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+MJPEG_PART_HEADER = (
+    b"--" + MJPEG_BOUNDARY.encode() + b"\r\n"
+    b"Content-Type: image/jpeg\r\n"
+    b"Content-Length: %d\r\n"
+    b"X-Frame-Seq: %d\r\n"
+    b"X-Frames-Skipped: %d\r\n\r\n"
+)
+MJPEG_PART_TRAILER = b"\r\n"
+
+# Header to trailer written; a slow client shows up here, not in the camera stages
+frame_send_seconds = metrics.histogram("ixmonitor_stream_send_seconds",
+                                       "Time to write one MJPEG frame to a client", labelnames=("stream",))
+
+
+class FrameBroker:
+    """
+    Ring buffer of encoded frames shared by all stream clients.
+    """
+    def __init__(self, size=8, slot_bytes=64 * 1024):
+        self.size = size
+        self.slots = [bytearray(slot_bytes) for _ in range(size)]
+        self.lengths = [0] * size
+        self.seqs = [0] * size
+        self.timestamps = [0.0] * size
+        self.pins = [0] * size      # readers currently holding a view of a slot
+        self.latest_seq = 0
+        self.condition = Condition()
+        self.frames_published = 0
+        self.slots_reallocated = 0
+        self.subscribers = {}
+        self._subscriber_ids = itertools.count(1)
+        self.wakers = []  # callables run after each publish, one per event loop
+
+    def publish(self, frame):
+        """Copy an encoded frame (bytes or memoryview) into the next ring slot."""
+        length = len(frame)
+        with self.condition:
+            seq = self.latest_seq + 1
+            index = seq % self.size
+            if self.pins[index] or length > len(self.slots[index]):
+                # A slow reader still holds this slot (or it is too small):
+                # give the slot a new buffer, the reader keeps the old one alive
+                self.slots[index] = bytearray(max(length, len(self.slots[index])))
+                self.pins[index] = 0
+                self.slots_reallocated += 1
+            self.slots[index][:length] = frame
+            self.lengths[index] = length
+            self.seqs[index] = seq
+            self.timestamps[index] = time.time()
+            self.latest_seq = seq
+            self.frames_published += 1
+            self.condition.notify_all()
+            wakers = self.wakers
+        # Outside the lock: a waker must not hold up readers or the next publish
+        for waker in wakers:
+            waker()
+        return seq
+
+    def latest(self):
+        """Return (seq, frame bytes, timestamp) of the newest frame, or None."""
+        with self.condition:
+            if self.latest_seq == 0:
+                return None
+            index = self.latest_seq % self.size
+            return (self.latest_seq,
+                    bytes(self.slots[index][:self.lengths[index]]),
+                    self.timestamps[index])
+
+    def add_waker(self, waker):
+        """
+        Call waker() after every publish. It must not block; readers on
+        an event loop share one waker per loop so a publish costs the
+        same however many of them there are.
+        """
+        with self.condition:
+            self.wakers = self.wakers + [waker]
+
+    def remove_waker(self, waker):
+        with self.condition:
+            self.wakers = [w for w in self.wakers if w is not waker]
+
+    def subscribe(self):
+        """Register a new stream client."""
+        subscriber = FrameSubscriber(self, next(self._subscriber_ids))
+        with self.condition:
+            self.subscribers[subscriber.id] = subscriber
+        return subscriber
+
+    def _unsubscribe(self, subscriber):
+        with self.condition:
+            self.subscribers.pop(subscriber.id, None)
+
+    def get_stats(self):
+        """Return broker counters and per-client delivery stats."""
+        with self.condition:
+            return {
+                "latest_seq": self.latest_seq,
+                "frames_published": self.frames_published,
+                "slots_reallocated": self.slots_reallocated,
+                "ring_size": self.size,
+                "clients": [s.get_stats() for s in self.subscribers.values()]
+            }
+
+
+class FrameSubscriber:
+    """
+    One stream client's read position in a FrameBroker.
+    """
+    def __init__(self, broker, subscriber_id):
+        self.broker = broker
+        self.id = subscriber_id
+        self.last_seq = broker.latest_seq
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.connected_at = time.time()
+        self._pinned = None
+
+    def next_frame(self, timeout=None):
+        """
+        Wait for a frame newer than the last one read.
+        Returns (seq, memoryview, skipped) or None on timeout. The view
+        stays valid until the next call or close().
+        """
+        broker = self.broker
+        with broker.condition:
+            self._release()
+            if not broker.condition.wait_for(lambda: broker.latest_seq > self.last_seq, timeout):
+                return None
+            seq = broker.latest_seq
+            index = seq % broker.size
+            broker.pins[index] += 1
+            self._pinned = (index, broker.slots[index])
+            view = memoryview(broker.slots[index])[:broker.lengths[index]]
+
+        skipped = seq - self.last_seq - 1 if self.frames_sent else 0
+        self.frames_skipped += skipped
+        self.frames_sent += 1
+        self.last_seq = seq
+        return seq, view, skipped
+
+    def _release(self):
+        # Caller holds broker.condition
+        if self._pinned is not None:
+            index, slot = self._pinned
+            if self.broker.slots[index] is slot and self.broker.pins[index] > 0:
+                self.broker.pins[index] -= 1
+            self._pinned = None
+
+    def close(self):
+        with self.broker.condition:
+            self._release()
+        self.broker._unsubscribe(self)
+
+    def get_stats(self):
+        return {
+            "id": self.id,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "connected_s": round(time.time() - self.connected_at, 1)
+        }
+
+
+def generate_mjpeg(broker, stream=""):
+    """
+    Yield a multipart MJPEG stream from a broker for a WSGI server.
+    WSGI servers only write bytes, so each frame is copied out of the
+    ring once per client; the ASGI server sends the views directly.
+    """
+    send_series = frame_send_seconds.labels(stream=stream)
+    subscriber = broker.subscribe()
+    try:
+        while True:
+            seq, frame, skipped = subscriber.next_frame()
+            start = time.monotonic()
+            yield MJPEG_PART_HEADER % (len(frame), seq, skipped)
+            yield bytes(frame)
+            yield MJPEG_PART_TRAILER
+            # Resumed once the server has written the trailer
+            send_series.observe(time.monotonic() - start)
+    finally:
+        subscriber.close()
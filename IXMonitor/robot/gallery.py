@@ -0,0 +1,107 @@
+# robot/gallery.py
+"""
+Bounded on-disk picture gallery.
+Captured JPEGs are stored under an ID together with a precomputed
+thumbnail and listed in index.json. The oldest pictures are removed
+once the gallery is full.
+"""
+import io
+import json
+import os
+import time
+import uuid
+from threading import Lock
+from PIL import Image
+from config import PICTURE_DIR, PICTURE_MAX_COUNT, PICTURE_THUMB_SIZE
+
+
+class PictureStore:
+    """
+    Pictures and thumbnails on disk with a JSON index, newest last.
+    """
+    def __init__(self, directory=PICTURE_DIR, max_pictures=PICTURE_MAX_COUNT, thumb_size=PICTURE_THUMB_SIZE):
+        self.directory = directory
+        self.max_pictures = max_pictures
+        self.thumb_size = thumb_size
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_index(self):
+        # Caller holds self.lock; replace atomically so a crash never truncates it
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _path(self, picture_id, thumb=False):
+        return os.path.join(self.directory, f"{picture_id}{'_thumb' if thumb else ''}.jpg")
+
+    def add(self, jpeg_bytes):
+        """Store a captured JPEG and its thumbnail; returns the index entry."""
+        picture_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        image = Image.open(io.BytesIO(jpeg_bytes))
+        width, height = image.size
+        image.draft("RGB", self.thumb_size)
+        image = image.convert("RGB")
+        image.thumbnail(self.thumb_size)
+        thumb = io.BytesIO()
+        image.save(thumb, format="JPEG", quality=80)
+
+        with open(self._path(picture_id), "wb") as f:
+            f.write(jpeg_bytes)
+        with open(self._path(picture_id, thumb=True), "wb") as f:
+            f.write(thumb.getvalue())
+
+        entry = {
+            "id": picture_id,
+            "created": time.time(),
+            "bytes": len(jpeg_bytes),
+            "width": width,
+            "height": height
+        }
+        with self.lock:
+            self.entries.append(entry)
+            removed = self.entries[:-self.max_pictures] if len(self.entries) > self.max_pictures else []
+            self.entries = self.entries[len(removed):]
+            self._save_index()
+        for old in removed:
+            for thumb_flag in (False, True):
+                try:
+                    os.remove(self._path(old["id"], thumb_flag))
+                except OSError:
+                    pass
+        return entry
+
+    def get_path(self, picture_id, thumb=False):
+        """File path of a stored picture, or None for unknown IDs."""
+        with self.lock:
+            if not any(entry["id"] == picture_id for entry in self.entries):
+                return None
+        return self._path(picture_id, thumb)
+
+    def list(self):
+        """Index entries, newest first."""
+        with self.lock:
+            return list(reversed(self.entries))
+
+
+# Singleton instance for easy access
+_picture_store_instance = None
+_picture_store_lock = Lock()
+
+def get_picture_store():
+    """Get the picture store singleton."""
+    global _picture_store_instance
+    with _picture_store_lock:
+        if _picture_store_instance is None:
+            _picture_store_instance = PictureStore()
+        return _picture_store_instance
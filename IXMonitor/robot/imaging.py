@@ -0,0 +1,82 @@
+# robot/imaging.py
+"""
+Small image helpers shared by the vision modules.
+Frames arrive as JPEG bytes; these decode them cheaply to small
+grayscale NumPy arrays for local analysis, re-encode them for upload
+and draw detection overlays.
+"""
+import io
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def decode_gray(jpeg_bytes, size):
+    """
+    Decode JPEG bytes to a grayscale float32 array of (width, height).
+    Uses the JPEG decoder's DCT scaling so large frames are never
+    decoded at full resolution.
+    """
+    image = Image.open(io.BytesIO(jpeg_bytes))
+    image.draft("L", size)
+    image = image.convert("L").resize(size, Image.BILINEAR)
+    return np.asarray(image, dtype=np.float32)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(jpeg_bytes, hash_size=8):
+    """
+    64-bit perceptual hash: low-frequency DCT coefficients of a 32x32
+    grayscale thumbnail, thresholded at their median.
+    """
+    pixels = decode_gray(jpeg_bytes, (32, 32))
+    dct = _DCT_32 @ pixels @ _DCT_32.T
+    low = dct[:hash_size, :hash_size].flatten()
+    bits = low > np.median(low[1:])  # skip the DC term
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def reencode(jpeg_bytes, scale=1.0, quality=75):
+    """Re-encode a JPEG frame at a smaller scale and/or lower quality."""
+    image = Image.open(io.BytesIO(jpeg_bytes))
+    if scale < 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image.draft("RGB", size)
+        image = image.convert("RGB").resize(size, Image.BILINEAR)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def draw_boxes(jpeg_bytes, boxes, quality=80):
+    """
+    Draw detection boxes on a JPEG frame. Each box is a dict with "box"
+    as normalized [x1, y1, x2, y2] plus optional "label" and "score".
+    """
+    image = Image.open(io.BytesIO(jpeg_bytes)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    for detection in boxes:
+        x1, y1, x2, y2 = detection["box"]
+        rect = (x1 * width, y1 * height, x2 * width, y2 * height)
+        draw.rectangle(rect, outline=(0, 255, 0), width=2)
+        label = detection.get("label", "")
+        if "score" in detection:
+            label = f"{label} {detection['score']:.2f}".strip()
+        if label:
+            draw.text((rect[0] + 2, max(0, rect[1] - 12)), label, fill=(0, 255, 0))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
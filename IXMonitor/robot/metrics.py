@@ -0,0 +1,185 @@
+# robot/metrics.py
+"""
+Low-overhead counters and histograms with Prometheus text output.
+Metrics are created once at import time of the module that uses them
+and updated from hot paths; an update is one lock and, for histograms,
+one bisect over the bucket bounds. Per-frame paths bind their label
+values once with labels() and skip the label lookup on every update.
+"""
+import bisect
+from threading import Lock
+
+# Default histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_registry_lock = Lock()
+
+
+def _label_key(labelnames, labels):
+    return tuple([str(labels.get(name, "")) for name in labelnames])
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterSeries:
+    """One label set of a Counter."""
+    __slots__ = ("lock", "value")
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = Lock()
+
+    def labels(self, **labels):
+        """The series for these label values, to update without a lookup."""
+        key = _label_key(self.labelnames, labels)
+        series = self.series.get(key)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(key, _CounterSeries(self.lock))
+        return series
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def get(self, **labels):
+        series = self.series.get(_label_key(self.labelnames, labels))
+        return series.value if series is not None else 0
+
+    def render(self):
+        with self.lock:
+            values = {key: series.value for key, series in self.series.items()}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class _HistogramSeries:
+    """One label set of a Histogram."""
+    __slots__ = ("buckets", "lock", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets, lock):
+        self.buckets = buckets
+        self.lock = lock
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by labels."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = Lock()
+
+    def labels(self, **labels):
+        """The series for these label values, to observe without a lookup."""
+        key = _label_key(self.labelnames, labels)
+        series = self.series.get(key)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(key, _HistogramSeries(self.buckets, self.lock))
+        return series
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def snapshot(self):
+        """
+        Per label set: {"count", "sum", "max", "buckets"} with
+        non-cumulative bucket counts, the last one being +Inf.
+        """
+        with self.lock:
+            return {
+                key: {"count": s.count, "sum": s.sum, "max": s.max, "buckets": list(s.counts)}
+                for key, s in self.series.items()
+            }
+
+    def render(self):
+        lines = []
+        for key, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["buckets"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+def _register(metric_class, name, help_text, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = metric_class(name, help_text, **kwargs)
+        return metric
+
+
+def counter(name, help_text, labelnames=()):
+    """Get or create a registered Counter."""
+    return _register(Counter, name, help_text, labelnames=labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Get or create a registered Histogram."""
+    return _register(Histogram, name, help_text, labelnames=labelnames, buckets=buckets)
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,242 @@
+# robot/motion.py
+"""
+Single-threaded motion executor.
+Every motor command goes through one worker thread that owns
+movement.gpg, so callers never interleave set_speed/drive calls.
+Commands carry a priority; a higher-priority command preempts the one
+running and duplicate teleop commands are merged.
+"""
+import heapq
+import itertools
+import time
+from threading import Thread, Condition, Event, Lock
+from config import TELEOP_LEASE
+from . import metrics, movement
+
+# Lower value wins
+PRIORITY_STOP = 0
+PRIORITY_SAFETY = 1
+PRIORITY_TELEOP = 2
+PRIORITY_AUTONOMOUS = 3
+
+# Default amount per action: meters for drives, degrees for turns
+DEFAULT_AMOUNTS = {
+    "forward": 0.1,
+    "backward": 0.1,
+    "left": 10,
+    "right": 10,
+    "stop": None
+}
+
+queue_seconds = metrics.histogram("ixmonitor_motion_queue_seconds",
+                                  "Time a motion command waited before the motors moved", labelnames=("action",))
+command_seconds = metrics.histogram("ixmonitor_motion_command_seconds",
+                                    "Time from motors moving to a motion command finishing", labelnames=("action",))
+
+
+class MotionCommand:
+    """A queued motion request. wait() returns its result."""
+    def __init__(self, action, amount=None, priority=PRIORITY_TELEOP, speed=movement.NORMAL_SPEED,
+                 check_obstacles=True):
+        self.action = action
+        self.amount = DEFAULT_AMOUNTS.get(action) if amount is None else amount
+        self.priority = priority
+        self.speed = speed
+        self.check_obstacles = check_obstacles
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.lease_until = None  # only for "hold" commands
+        self.cancel_event = Event()
+        self.done = Event()
+        self.result = None
+
+    def same_as(self, other):
+        return (self.action, self.amount, self.speed, self.check_obstacles) == \
+               (other.action, other.amount, other.speed, other.check_obstacles)
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the command has run. Returns "done", "blocked",
+        "cancelled", or None on timeout.
+        """
+        self.done.wait(timeout)
+        return self.result
+
+
+class MotionExecutor:
+    """
+    Runs MotionCommands one at a time from a priority queue.
+    """
+    def __init__(self):
+        self.queue = []
+        self.condition = Condition()
+        self.current = None
+        self._seq = itertools.count()
+        self.executed = 0
+        self.preempted = 0
+        self.coalesced = 0
+        self.max_queue_depth = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, action, amount=None, priority=PRIORITY_TELEOP, speed=movement.NORMAL_SPEED,
+               check_obstacles=True):
+        """
+        Queue a motion command and return it without waiting.
+
+        :param action: forward, backward, left, right or stop
+        :param amount: meters for drives, degrees for turns
+        :param priority: one of the PRIORITY_* constants
+        """
+        command = MotionCommand(action, amount, priority, speed, check_obstacles)
+        with self.condition:
+            if action == "stop":
+                # A stop flushes everything at its own priority or below
+                kept = []
+                for entry in self.queue:
+                    if entry[2].priority < priority:
+                        kept.append(entry)
+                    else:
+                        entry[2].finish("cancelled")
+                heapq.heapify(kept)
+                self.queue = kept
+                if self.current is not None and self.current.priority >= priority:
+                    self.current.cancel_event.set()
+            elif priority == PRIORITY_TELEOP:
+                # Held buttons resend the same command; keep only one queued
+                for _, _, queued in self.queue:
+                    if queued.priority == PRIORITY_TELEOP and queued.same_as(command):
+                        self.coalesced += 1
+                        return queued
+
+            if self.current is not None and priority < self.current.priority:
+                self.current.cancel_event.set()
+                self.preempted += 1
+
+            heapq.heappush(self.queue, (priority, next(self._seq), command))
+            self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+            self.condition.notify()
+        return command
+
+    def hold(self, direction, lease=TELEOP_LEASE, speed=movement.NORMAL_SPEED):
+        """
+        Teleop: keep moving in a direction for `lease` seconds. Repeating
+        the same direction extends the lease of the running (or queued)
+        hold instead of queueing another command; a new direction
+        replaces the current hold.
+        """
+        with self.condition:
+            lease_until = time.monotonic() + lease
+            candidates = [self.current] + [entry[2] for entry in self.queue]
+            for command in candidates:
+                if command is not None and command.action == "hold" and command.amount == direction \
+                        and not command.cancel_event.is_set() and not command.done.is_set():
+                    command.lease_until = lease_until
+                    self.coalesced += 1
+                    return command
+            if self.current is not None and self.current.action == "hold":
+                # Direction changed: end the current hold right away
+                self.current.cancel_event.set()
+            command = self.submit("hold", direction, priority=PRIORITY_TELEOP, speed=speed)
+            command.lease_until = lease_until
+            return command
+
+    def stop(self, priority=PRIORITY_STOP):
+        """Stop the motors and drop queued commands."""
+        return self.submit("stop", priority=priority)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                _, _, command = heapq.heappop(self.queue)
+                self.current = command
+            try:
+                command.finish(self._execute(command))
+            except Exception as e:
+                print(f"Motion command {command.action} failed: {e}")
+                movement.stop_robot()
+                command.finish("blocked")
+            finally:
+                with self.condition:
+                    self.current = None
+
+    def _execute(self, command):
+        # Command-to-motor latency: time spent queued before the motors move
+        command.started_at = time.monotonic()
+        latency = command.started_at - command.submitted_at
+        self.executed += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        queue_seconds.observe(latency, action=command.action)
+
+        cancel = command.cancel_event
+        if command.action == "forward":
+            ok = movement.move_forward(command.amount, blocking=True, check_obstacles=command.check_obstacles,
+                                       speed=command.speed, cancel_event=cancel)
+        elif command.action == "backward":
+            ok = movement.move_backward(command.amount, blocking=True, speed=command.speed, cancel_event=cancel)
+        elif command.action == "left":
+            ok = movement.turn_left(command.amount, blocking=True, speed=command.speed, cancel_event=cancel)
+        elif command.action == "right":
+            ok = movement.turn_right(command.amount, blocking=True, speed=command.speed, cancel_event=cancel)
+        elif command.action == "hold":
+            ok = movement.drive_continuous(command.amount, lambda: command.lease_until, speed=command.speed,
+                                           check_obstacles=command.check_obstacles, cancel_event=cancel) == "expired"
+        elif command.action == "stop":
+            movement.stop_robot()
+            ok = True
+        else:
+            print(f"Unknown motion action: {command.action}")
+            movement.stop_robot()
+            ok = False
+        command_seconds.observe(time.monotonic() - command.started_at, action=command.action)
+
+        if cancel.is_set():
+            return "cancelled"
+        return "done" if ok else "blocked"
+
+    def current_speed(self):
+        """Wheel speed (degrees/s) of the running motion, 0 when idle."""
+        command = self.current
+        if command is None or command.action == "stop":
+            return 0
+        return command.speed
+
+    def get_status(self):
+        """Queue depth, current command and command-to-motor latency."""
+        with self.condition:
+            current = self.current
+            return {
+                "queue_depth": len(self.queue),
+                "max_queue_depth": self.max_queue_depth,
+                "current": current.action if current else None,
+                "current_priority": current.priority if current else None,
+                "executed": self.executed,
+                "preempted": self.preempted,
+                "coalesced": self.coalesced,
+                "avg_latency_ms": round(self.latency_total / self.executed * 1000, 1) if self.executed else None,
+                "max_latency_ms": round(self.latency_max * 1000, 1)
+            }
+
+
+# Singleton instance for easy access
+_motion_executor_instance = None
+_motion_executor_lock = Lock()
+
+def get_motion_executor():
+    """Get or start the motion executor singleton."""
+    global _motion_executor_instance
+    with _motion_executor_lock:
+        if _motion_executor_instance is None:
+            _motion_executor_instance = MotionExecutor().start()
+        return _motion_executor_instance
@@ -1,5 +1,7 @@
+import time
 from easygopigo3 import EasyGoPiGo3
-from .distance_sensor import is_obstacle_detected, get_distance
+from config import OBSTACLE_TTC, DRIVE_MONITOR_HZ, DRIVE_SENSOR_MAX_AGE_MS
+from .distance_sensor import is_obstacle_detected, get_distance, get_distance_sampler, get_time_to_collision
 
 gpg = EasyGoPiGo3()
 
@@ -12,9 +14,161 @@ def set_speed(speed):
     """Set robot speed (100-500)"""
     gpg.set_speed(speed)
 
-def move_forward(distance_m=0.1, blocking=False, check_obstacles=True, speed=NORMAL_SPEED):
+# Detection-to-stop latencies of monitored drives
+drive_stats = {"drives": 0, "obstacle_stops": 0, "sensor_stops": 0, "last_stop_latency_ms": None,
+               "max_stop_latency_ms": None}
+
+def _fresh_reading(sampler, max_age_ms):
+    """Newest reading if it is at most max_age_ms old, without waiting; else None."""
+    return sampler.get_reading(max_age_ms=max_age_ms, timeout=0)
+
+def _monitor_motion(target_left, target_right, deadline, sampler=None, threshold_cm=25,
+                    poll_hz=DRIVE_MONITOR_HZ, cancel_event=None, max_age_ms=DRIVE_SENSOR_MAX_AGE_MS):
+    """
+    Poll encoders (and the distance sampler, if given) until the wheel
+    targets are reached, an obstacle shows up, the motion is cancelled or
+    the deadline passes. Stops the motors in every case but "reached".
+    A sampler that stops delivering readings younger than max_age_ms
+    stops the drive too ("sensor_stale"), so a frozen sensor cannot
+    hide an obstacle.
+    """
+    period = 1.0 / poll_hz
+    latency_bound_ms = 1000 * (period + (sampler.period if sampler else 0))
+    result = {"result": "timeout", "stop_latency_ms": None, "latency_bound_ms": round(latency_bound_ms, 1)}
+
+    while time.monotonic() < deadline:
+        if cancel_event is not None and cancel_event.is_set():
+            gpg.stop()
+            result["result"] = "cancelled"
+            return result
+
+        if sampler is not None:
+            reading = _fresh_reading(sampler, max_age_ms)
+            if reading is None:
+                gpg.stop()
+                drive_stats["sensor_stops"] += 1
+                print(f"No distance reading within {max_age_ms}ms during drive - stopped")
+                result["result"] = "sensor_stale"
+                return result
+            if reading[1] > 0:
+                ttc = get_time_to_collision(reading[1])
+                if reading[1] < threshold_cm or (ttc is not None and ttc < OBSTACLE_TTC):
+                    gpg.stop()
+                    latency_ms = (time.time() - reading[0]) * 1000
+                    drive_stats["obstacle_stops"] += 1
+                    drive_stats["last_stop_latency_ms"] = round(latency_ms, 1)
+                    drive_stats["max_stop_latency_ms"] = round(max(latency_ms, drive_stats["max_stop_latency_ms"] or 0), 1)
+                    print(f"Obstacle at {reading[1]}cm during drive - stopped in {latency_ms:.0f}ms")
+                    result.update(result="obstacle", stop_latency_ms=round(latency_ms, 1))
+                    return result
+
+        if gpg.target_reached(target_left, target_right):
+            result["result"] = "reached"
+            return result
+
+        time.sleep(period)
+
+    gpg.stop()
+    return result
+
+def drive_monitored(distance_cm, speed=NORMAL_SPEED, threshold_cm=25, poll_hz=DRIVE_MONITOR_HZ,
+                    check_obstacles=True, cancel_event=None):
+    """
+    Drive without blocking the motors and poll the distance sensor and
+    encoders until the target is reached or an obstacle shows up.
+
+    The stop latency is measured from the timestamp of the sensor reading
+    that crossed the threshold to the stop command returning. Its worst
+    case is bounded by one sensor period plus one poll period.
+
+    :returns: dict with "result" ("reached", "obstacle", "sensor_stale",
+              "cancelled" or "timeout"), "stop_latency_ms" and "latency_bound_ms"
+    """
+    sampler = get_distance_sampler() if check_obstacles and distance_cm > 0 else None
+
+    # Same targets drive_cm() computes internally
+    wheel_degrees = (distance_cm * 10 / gpg.WHEEL_CIRCUMFERENCE) * 360
+    target_left = gpg.get_motor_encoder(gpg.MOTOR_LEFT) + wheel_degrees
+    target_right = gpg.get_motor_encoder(gpg.MOTOR_RIGHT) + wheel_degrees
+    # Give up well after the drive should have finished
+    deadline = time.monotonic() + abs(wheel_degrees) / speed * 2 + 2
+
+    gpg.set_speed(speed)
+    gpg.drive_cm(distance_cm, blocking=False)
+    drive_stats["drives"] += 1
+    try:
+        return _monitor_motion(target_left, target_right, deadline, sampler, threshold_cm,
+                               poll_hz, cancel_event)
+    finally:
+        gpg.set_speed(NORMAL_SPEED)
+
+def turn_monitored(angle_deg, speed=NORMAL_SPEED, poll_hz=DRIVE_MONITOR_HZ, cancel_event=None):
+    """
+    Turn in place without blocking the motors, polling the encoders so
+    the turn can be cancelled. Positive angles turn right.
+    """
+    # Same targets turn_degrees() computes internally
+    wheel_travel = (gpg.WHEEL_BASE_CIRCUMFERENCE * angle_deg) / 360
+    wheel_degrees = (wheel_travel / gpg.WHEEL_CIRCUMFERENCE) * 360
+    target_left = gpg.get_motor_encoder(gpg.MOTOR_LEFT) + wheel_degrees
+    target_right = gpg.get_motor_encoder(gpg.MOTOR_RIGHT) - wheel_degrees
+    deadline = time.monotonic() + abs(wheel_degrees) / speed * 2 + 2
+
+    gpg.set_speed(speed)
+    gpg.turn_degrees(angle_deg, blocking=False)
+    try:
+        return _monitor_motion(target_left, target_right, deadline, poll_hz=poll_hz,
+                               cancel_event=cancel_event)
+    finally:
+        gpg.set_speed(NORMAL_SPEED)
+
+def drive_continuous(direction, lease_until, speed=NORMAL_SPEED, check_obstacles=True,
+                     poll_hz=DRIVE_MONITOR_HZ, cancel_event=None):
+    """
+    Keep moving in a direction while lease_until() lies in the future.
+    Used for held teleop buttons: every refresh extends the lease, so
+    consecutive intents become one continuous motion.
+
+    :param direction: forward, backward, left or right (turns spin in place)
+    :param lease_until: callable returning the monotonic time to stop at
+    :returns: "expired", "obstacle", "sensor_stale" or "cancelled"
+    """
+    sampler = get_distance_sampler() if check_obstacles and direction == "forward" else None
+    period = 1.0 / poll_hz
+    start_motion = {
+        "forward": gpg.forward,
+        "backward": gpg.backward,
+        "left": gpg.spin_left,
+        "right": gpg.spin_right
+    }[direction]
+
+    if sampler is not None and is_obstacle_detected(threshold_cm=25):
+        gpg.stop()
+        return "obstacle"
+
+    gpg.set_speed(speed)
+    start_motion()
+    try:
+        while time.monotonic() < lease_until():
+            if cancel_event is not None and cancel_event.is_set():
+                return "cancelled"
+            if sampler is not None:
+                reading = _fresh_reading(sampler, DRIVE_SENSOR_MAX_AGE_MS)
+                if reading is None:
+                    print(f"No distance reading within {DRIVE_SENSOR_MAX_AGE_MS}ms - stopping teleop drive")
+                    return "sensor_stale"
+                if 0 < reading[1] < 25:
+                    print(f"Obstacle at {reading[1]}cm - stopping teleop drive")
+                    return "obstacle"
+            time.sleep(period)
+        return "expired"
+    finally:
+        gpg.stop()
+        gpg.set_speed(NORMAL_SPEED)
+
+def move_forward(distance_m=0.1, blocking=False, check_obstacles=True, speed=NORMAL_SPEED, cancel_event=None):
     """Move forward with optional obstacle detection and speed control."""
-    if check_obstacles and is_obstacle_detected(threshold_cm=25):
+    if check_obstacles and is_obstacle_detected(threshold_cm=25, ttc_s=OBSTACLE_TTC):
         print("Obstacle detected! Stopping.")
         gpg.stop()
         return False
@@ -23,25 +177,42 @@ def move_forward(distance_m=0.1, blocking=False, check_obstacles=True, speed=NOR
     if distance_m > 0.5:
         speed = FAST_SPEED
     
+    if blocking:
+        # Keep watching the sensor (and cancel event) for the whole drive
+        result = drive_monitored(distance_m * 100, speed=speed, check_obstacles=check_obstacles,
+                                 cancel_event=cancel_event)
+        return result["result"] == "reached"
+    
     gpg.set_speed(speed)
-    gpg.drive_cm(distance_m * 100, blocking=blocking)
+    gpg.drive_cm(distance_m * 100, blocking=False)
     gpg.set_speed(NORMAL_SPEED)  # Reset to normal
     return True
 
-def move_backward(distance_m=0.1, blocking=False, speed=NORMAL_SPEED):
+def move_backward(distance_m=0.1, blocking=False, speed=NORMAL_SPEED, cancel_event=None):
+    if blocking:
+        result = drive_monitored(-distance_m * 100, speed=speed, check_obstacles=False,
+                                 cancel_event=cancel_event)
+        return result["result"] == "reached"
     gpg.set_speed(speed)
-    gpg.drive_cm(-distance_m * 100, blocking=blocking)
+    gpg.drive_cm(-distance_m * 100, blocking=False)
     gpg.set_speed(NORMAL_SPEED)
+    return True
 
-def turn_right(angle_deg=10, blocking=False, speed=NORMAL_SPEED):
+def turn_right(angle_deg=10, blocking=False, speed=NORMAL_SPEED, cancel_event=None):
+    if blocking:
+        return turn_monitored(angle_deg, speed=speed, cancel_event=cancel_event)["result"] == "reached"
     gpg.set_speed(speed)
-    gpg.turn_degrees(angle_deg, blocking=blocking)
+    gpg.turn_degrees(angle_deg, blocking=False)
     gpg.set_speed(NORMAL_SPEED)
+    return True
 
-def turn_left(angle_deg=10, blocking=False, speed=NORMAL_SPEED):
+def turn_left(angle_deg=10, blocking=False, speed=NORMAL_SPEED, cancel_event=None):
+    if blocking:
+        return turn_monitored(-angle_deg, speed=speed, cancel_event=cancel_event)["result"] == "reached"
     gpg.set_speed(speed)
-    gpg.turn_degrees(-angle_deg, blocking=blocking)
+    gpg.turn_degrees(-angle_deg, blocking=False)
     gpg.set_speed(NORMAL_SPEED)
+    return True
 
 def stop_robot():
     gpg.stop()
@@ -53,19 +224,26 @@ def get_obstacle_distance():
 def go_to_door():
     """Automated sequence to move to door and take a picture."""
     from .camera import take_picture
+    from .motion import get_motion_executor, PRIORITY_AUTONOMOUS
+    motion = get_motion_executor()
     print("Driving to door...")
-    move_forward(5.5)
-    turn_left(90)
-    move_forward(1)
-    stop_robot()
+    for action, amount in (("forward", 5.5), ("left", 90), ("forward", 1)):
+        if motion.submit(action, amount, priority=PRIORITY_AUTONOMOUS).wait() != "done":
+            print("Stopped on the way to the door.")
+            motion.stop()
+            return
+    motion.stop()
     take_picture()
     print("At door.")
 
 def return_to_start():
     """Return the robot to its starting point."""
+    from .motion import get_motion_executor, PRIORITY_AUTONOMOUS
+    motion = get_motion_executor()
     print("Returning to start...")
-    move_backward(1)
-    turn_right(90)
-    move_backward(5.5)
-    stop_robot()
+    for action, amount in (("backward", 1), ("right", 90), ("backward", 5.5)):
+        if motion.submit(action, amount, priority=PRIORITY_AUTONOMOUS).wait() != "done":
+            print("Stopped on the way back to start.")
+            break
+    motion.stop()
     print("Returned to start.")
@@ -0,0 +1,126 @@
+# robot/server_client.py
+"""
+Shared HTTP client for all traffic to the Windows AI server.
+Keeps connections alive in a pool, applies per-endpoint timeouts and
+records a latency histogram for every endpoint in the metrics registry.
+"""
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from . import metrics
+from config import WINDOWS_SERVER_BASE, SERVER_POOL_SIZE, SERVER_DEFAULT_TIMEOUT, SERVER_TIMEOUTS
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_session = None
+_session_lock = Lock()
+_async_client = None
+
+request_seconds = metrics.histogram(
+    "ixmonitor_server_request_seconds", "Round trip of requests to the Windows AI server",
+    labelnames=("endpoint",), buckets=tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS))
+request_errors = metrics.counter(
+    "ixmonitor_server_request_errors_total", "Failed or non-2xx/3xx requests to the Windows AI server",
+    labelnames=("endpoint",))
+
+
+def get_session():
+    """Get or create the shared keep-alive session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=SERVER_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def get_timeout(endpoint):
+    """Timeout profile for an endpoint path such as "/chat/text"."""
+    return SERVER_TIMEOUTS.get(endpoint, SERVER_DEFAULT_TIMEOUT)
+
+
+def _record(endpoint, elapsed, error):
+    request_seconds.observe(elapsed, endpoint=endpoint)
+    if error:
+        request_errors.inc(endpoint=endpoint)
+
+
+def request(method, path, timeout=None, **kwargs):
+    """
+    Send a request to the Windows server over the shared session.
+
+    :param path: endpoint path relative to WINDOWS_SERVER_BASE, or a full URL
+    :param timeout: overrides the endpoint's timeout profile
+    """
+    url = path if path.startswith("http") else f"{WINDOWS_SERVER_BASE}{path}"
+    endpoint = urlsplit(url).path or "/"
+    if timeout is None:
+        timeout = get_timeout(endpoint)
+
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException:
+        _record(endpoint, time.monotonic() - start, error=True)
+        raise
+    _record(endpoint, time.monotonic() - start, error=response.status_code >= 400)
+    return response
+
+
+def post(path, timeout=None, **kwargs):
+    """POST to the Windows server. See request()."""
+    return request("POST", path, timeout=timeout, **kwargs)
+
+
+def get_async_client():
+    """Get or create the shared httpx client used in ASGI mode."""
+    global _async_client
+    if _async_client is None:
+        import httpx
+        _async_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=SERVER_POOL_SIZE,
+                                                              max_keepalive_connections=SERVER_POOL_SIZE))
+    return _async_client
+
+
+async def async_request(method, path, timeout=None, **kwargs):
+    """Coroutine version of request() for the asyncio server. Raises httpx errors."""
+    url = path if path.startswith("http") else f"{WINDOWS_SERVER_BASE}{path}"
+    endpoint = urlsplit(url).path or "/"
+    if timeout is None:
+        timeout = get_timeout(endpoint)
+
+    start = time.monotonic()
+    try:
+        response = await get_async_client().request(method, url, timeout=timeout, **kwargs)
+    except Exception:
+        _record(endpoint, time.monotonic() - start, error=True)
+        raise
+    _record(endpoint, time.monotonic() - start, error=response.status_code >= 400)
+    return response
+
+
+async def async_post(path, timeout=None, **kwargs):
+    """POST to the Windows server from a coroutine. See async_request()."""
+    return await async_request("POST", path, timeout=timeout, **kwargs)
+
+
+def get_latency_stats():
+    """Return the latency histogram of every endpoint used so far, in milliseconds."""
+    stats = {}
+    for (endpoint,), series in request_seconds.snapshot().items():
+        buckets = {str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS, series["buckets"])}
+        buckets["+Inf"] = series["buckets"][-1]
+        count = series["count"]
+        stats[endpoint] = {
+            "count": count,
+            "errors": request_errors.get(endpoint=endpoint),
+            "avg_ms": round(series["sum"] * 1000 / count, 1) if count else None,
+            "max_ms": round(series["max"] * 1000, 1),
+            "buckets_ms": buckets
+        }
+    return stats
@@ -0,0 +1,134 @@
+# robot/telemetry.py
+"""
+Telemetry hub for the dashboard.
+One sampler thread reads every field at its own rate and pushes only the
+fields that changed to all connected Server-Sent Events clients, so the
+hardware is read at a constant rate no matter how many clients listen.
+"""
+import json
+import queue
+import time
+from threading import Thread, Lock
+
+
+def format_event(changes):
+    """One SSE message carrying a dict of changed fields."""
+    return f"data: {json.dumps(changes)}\n\n"
+
+
+class TelemetryHub:
+    """
+    Samples registered fields and fans changes out to subscribers.
+    """
+    def __init__(self, tick=0.1, heartbeat=15.0, client_queue_size=32):
+        self.tick = tick
+        self.heartbeat = heartbeat
+        self.client_queue_size = client_queue_size
+        self.fields = {}        # name -> {"provider", "interval", "next_due"}
+        self.values = {}
+        self.subscribers = set()
+        self.wakers = {}        # client -> callable run after each put
+        self.lock = Lock()
+        self.thread = None
+        self.samples = 0
+
+    def add_field(self, name, provider, interval):
+        """Register a field read by provider() every `interval` seconds."""
+        with self.lock:
+            self.fields[name] = {"provider": provider, "interval": interval, "next_due": 0.0}
+
+    def subscribe(self, waker=None):
+        """
+        Add a client. Its queue starts with the full current state.
+        waker, if given, is called (without blocking) whenever the queue
+        gets a message, for readers that cannot block on it.
+        """
+        client = queue.Queue(maxsize=self.client_queue_size)
+        with self.lock:
+            if self.values:
+                client.put_nowait(dict(self.values))
+            self.subscribers.add(client)
+            if waker is not None:
+                self.wakers[client] = waker
+            if self.thread is None or not self.thread.is_alive():
+                # Sample everything right away for the first client
+                for field in self.fields.values():
+                    field["next_due"] = 0.0
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.subscribers.discard(client)
+            self.wakers.pop(client, None)
+
+    def _run(self):
+        # Stops by itself once the last client has gone
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+                fields = list(self.fields.items())
+
+            now = time.monotonic()
+            changes = {}
+            for name, field in fields:
+                if now < field["next_due"]:
+                    continue
+                field["next_due"] = now + field["interval"]
+                try:
+                    value = field["provider"]()
+                except Exception as e:
+                    print(f"Telemetry field {name} failed: {e}")
+                    continue
+                self.samples += 1
+                if self.values.get(name, object()) != value:
+                    changes[name] = value
+
+            if changes:
+                self._broadcast(changes)
+            time.sleep(self.tick)
+
+    def _broadcast(self, changes):
+        with self.lock:
+            self.values.update(changes)
+            for client in self.subscribers:
+                try:
+                    client.put_nowait(changes)
+                except queue.Full:
+                    # Client fell behind: replace its backlog with a full resync
+                    while not client.empty():
+                        try:
+                            client.get_nowait()
+                        except queue.Empty:
+                            break
+                    client.put_nowait(dict(self.values))
+                waker = self.wakers.get(client)
+                if waker is not None:
+                    waker()
+
+    def stream(self):
+        """Generator of SSE messages for one client."""
+        client = self.subscribe()
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    changes = client.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Comment line; lets the server notice closed connections
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(changes)
+        finally:
+            self.unsubscribe(client)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "clients": len(self.subscribers),
+                "fields": {name: field["interval"] for name, field in self.fields.items()},
+                "samples": self.samples
+            }
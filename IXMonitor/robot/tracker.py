@@ -0,0 +1,148 @@
+# robot/tracker.py
+"""
+Lightweight multi-object tracker for the detection stream.
+Associates server detections with existing tracks by IoU and predicts
+boxes with a constant-velocity model, so overlays can be drawn on the
+frames between detections.
+"""
+import itertools
+import time
+from threading import Lock
+import numpy as np
+from config import TRACK_IOU_THRESHOLD, TRACK_MAX_COAST, TRACK_REFRESH_INTERVAL, TRACK_MAX_SHIFT
+
+
+def iou_matrix(a, b):
+    """IoU of every box in a (N, 4) against every box in b (M, 4), x1y1x2y2."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class BoxTracker:
+    """
+    Tracks normalized boxes between detections.
+
+    :param max_coast: seconds a track survives without a matching detection
+    :param refresh_interval: seconds after which tracked boxes want a fresh detection
+    :param max_shift: predicted motion, as a fraction of box size, that asks for a fresh detection
+    """
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_coast=TRACK_MAX_COAST,
+                 refresh_interval=TRACK_REFRESH_INTERVAL, max_shift=TRACK_MAX_SHIFT, velocity_alpha=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_coast = max_coast
+        self.refresh_interval = refresh_interval
+        self.max_shift = max_shift
+        self.velocity_alpha = velocity_alpha
+        self.boxes = np.zeros((0, 4))       # box at the last update of each track
+        self.velocities = np.zeros((0, 4))  # per second
+        self.updated_at = np.zeros(0)
+        self.ids = []
+        self.labels = []
+        self._ids = itertools.count(1)
+        self.last_detection = 0.0
+        self.lock = Lock()
+        self.detections = 0
+        self.matched = 0
+        self.predictions = 0
+
+    def update(self, detections, now=None):
+        """Feed server detections (dicts with a normalized "box")."""
+        now = time.monotonic() if now is None else now
+        new_boxes = np.array([d["box"] for d in detections], dtype=float).reshape(-1, 4)
+        with self.lock:
+            self.detections += 1
+            self.last_detection = now
+            predicted = self._predict(now)
+            matches = []
+            if len(predicted) and len(new_boxes):
+                iou = iou_matrix(predicted, new_boxes)
+                # Greedy association, best overlap first
+                for flat in np.argsort(iou, axis=None)[::-1]:
+                    t, d = np.unravel_index(flat, iou.shape)
+                    if iou[t, d] < self.iou_threshold:
+                        break
+                    if any(t == mt or d == md for mt, md in matches):
+                        continue
+                    matches.append((t, d))
+
+            keep = np.zeros(len(self.ids), dtype=bool)
+            for t, d in matches:
+                dt = now - self.updated_at[t]
+                if dt > 0:
+                    velocity = (new_boxes[d] - self.boxes[t]) / dt
+                    self.velocities[t] += self.velocity_alpha * (velocity - self.velocities[t])
+                self.boxes[t] = new_boxes[d]
+                self.updated_at[t] = now
+                self.labels[t] = detections[d].get("label", self.labels[t])
+                keep[t] = True
+            self.matched += len(matches)
+
+            # Unmatched tracks coast until they are too old
+            keep |= now - self.updated_at <= self.max_coast
+            self.boxes, self.velocities, self.updated_at = \
+                self.boxes[keep], self.velocities[keep], self.updated_at[keep]
+            self.ids = [i for i, k in zip(self.ids, keep) if k]
+            self.labels = [l for l, k in zip(self.labels, keep) if k]
+
+            matched_detections = {d for _, d in matches}
+            for d, detection in enumerate(detections):
+                if d in matched_detections:
+                    continue
+                self.boxes = np.vstack([self.boxes, new_boxes[d]])
+                self.velocities = np.vstack([self.velocities, np.zeros(4)])
+                self.updated_at = np.append(self.updated_at, now)
+                self.ids.append(next(self._ids))
+                self.labels.append(detection.get("label", ""))
+
+    def _predict(self, now):
+        # Caller holds self.lock
+        return np.clip(self.boxes + self.velocities * (now - self.updated_at)[:, None], 0.0, 1.0)
+
+    def predict(self, now=None):
+        """Boxes of the live tracks at time `now`, in the detection dict format."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            live = now - self.updated_at <= self.max_coast
+            if not live.any():
+                return []
+            self.predictions += 1
+            boxes = self._predict(now)[live]
+            ids = [i for i, k in zip(self.ids, live) if k]
+            labels = [l for l, k in zip(self.labels, live) if k]
+        return [{"box": box.tolist(), "label": label, "track_id": track_id}
+                for box, label, track_id in zip(boxes, labels, ids)]
+
+    def needs_detection(self, now=None):
+        """
+        True when the tracks can no longer be trusted: nothing is tracked
+        (look for new objects), the last detection is too old, or a
+        track is predicted to have moved far since it was last seen.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if not len(self.ids) or now - self.last_detection >= self.refresh_interval:
+                return True
+            size = np.maximum(self.boxes[:, 2:] - self.boxes[:, :2], 1e-3)
+            shift = np.abs(self.velocities[:, :2]) * (now - self.updated_at)[:, None] / size
+            return bool((shift > self.max_shift).any())
+
+    def has_tracks(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return bool((now - self.updated_at <= self.max_coast).any())
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "tracks": len(self.ids),
+                "detections": self.detections,
+                "matched": self.matched,
+                "predictions": self.predictions
+            }
@@ -0,0 +1,289 @@
+# robot/tts.py
+"""
+Text-to-speech with a rendered-audio cache and a persistent speaker.
+espeak renders (text, voice) to PCM once; the result is kept in a
+memory LRU and an on-disk LRU so canned phrases play without
+synthesis. Playback writes PCM into one long-running aplay process
+instead of starting a shell pipeline per message.
+"""
+import hashlib
+import os
+import struct
+import subprocess
+import time
+import wave
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+from config import (TTS_SAMPLE_RATE, TTS_DEVICE, TTS_CACHE_DIR, TTS_MEMORY_CACHE_BYTES, TTS_DISK_CACHE_BYTES,
+                    TTS_PREWARM)
+from . import metrics
+
+DEFAULT_VOICE = "en-us+f3"
+SINK_WRITE_BYTES = 4096  # about 0.1 s of audio per write
+
+cache_lookups = metrics.counter("ixmonitor_tts_cache_lookups_total", "Speech cache lookups by where the PCM came from",
+                                labelnames=("result",))
+render_seconds = metrics.histogram("ixmonitor_tts_render_seconds", "Time espeak took to render one cache miss")
+
+
+def _parse_wav(data):
+    """Return (pcm, rate) of a 16-bit mono WAV, tolerating unknown sizes."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("espeak did not return a WAV file")
+    pos = 12
+    rate = TTS_SAMPLE_RATE
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        if chunk_id == b"fmt ":
+            rate = struct.unpack("<I", data[pos + 12:pos + 16])[0]
+        elif chunk_id == b"data":
+            # Streamed WAVs carry a bogus size; the data runs to the end
+            return data[pos + 8:], rate
+        pos += 8 + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def render(text, voice=DEFAULT_VOICE):
+    """Synthesize text with espeak and return PCM at TTS_SAMPLE_RATE."""
+    result = subprocess.run(["espeak", "-v", voice, "--stdout", text],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    pcm, rate = _parse_wav(result.stdout)
+    if rate != TTS_SAMPLE_RATE:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        positions = np.arange(0, len(samples) - 1, rate / TTS_SAMPLE_RATE)
+        pcm = np.interp(positions, np.arange(len(samples)), samples).astype("<i2").tobytes()
+    return pcm
+
+
+class TTSCache:
+    """
+    Rendered PCM keyed by (text, voice), bounded in memory and on disk.
+    """
+    def __init__(self, cache_dir=TTS_CACHE_DIR, memory_bytes=TTS_MEMORY_CACHE_BYTES, disk_bytes=TTS_DISK_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()  # key -> pcm
+        self.memory_used = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.render_ms_total = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(f"{key[1]}\0{key[0]}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.wav")
+
+    def get(self, text, voice=DEFAULT_VOICE):
+        """Return PCM for (text, voice), rendering it on a miss."""
+        key = (text, voice)
+        with self.lock:
+            pcm = self.memory.get(key)
+            if pcm is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                cache_lookups.inc(result="memory")
+                return pcm
+
+        pcm = self._load(key)
+        if pcm is not None:
+            cache_lookups.inc(result="disk")
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            start = time.monotonic()
+            pcm = render(text, voice)
+            elapsed = time.monotonic() - start
+            cache_lookups.inc(result="miss")
+            render_seconds.observe(elapsed)
+            with self.lock:
+                self.misses += 1
+                self.render_ms_total += elapsed * 1000
+            self._save(key, pcm)
+        self._remember(key, pcm)
+        return pcm
+
+    def _remember(self, key, pcm):
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = pcm
+            self.memory_used += len(pcm)
+            while self.memory_used > self.memory_bytes and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_used -= len(evicted)
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with wave.open(path, "rb") as wav:
+                pcm = wav.readframes(wav.getnframes())
+            os.utime(path)  # mark as recently used
+            return pcm
+        except (OSError, EOFError, wave.Error):
+            return None
+
+    def _save(self, key, pcm):
+        path = self._path(key)
+        try:
+            with wave.open(path + ".tmp", "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(TTS_SAMPLE_RATE)
+                wav.writeframes(pcm)
+            os.replace(path + ".tmp", path)
+            self._trim_disk()
+        except OSError as e:
+            print(f"Could not cache speech on disk: {e}")
+
+    def _trim_disk(self):
+        # Oldest-used files go first
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".wav"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        used = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            used -= size
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_used,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "avg_render_ms": round(self.render_ms_total / self.misses, 1) if self.misses else None
+            }
+
+
+class AudioSink:
+    """
+    One long-running aplay process fed with raw PCM on stdin.
+    Restarted transparently if it exits.
+    """
+    def __init__(self, device=TTS_DEVICE, rate=TTS_SAMPLE_RATE):
+        self.device = device
+        self.rate = rate
+        self.process = None
+        self.lock = Lock()
+        self.restarts = 0
+
+    def _ensure_process(self):
+        # Caller holds self.lock
+        if self.process is None or self.process.poll() is not None:
+            if self.process is not None:
+                self.restarts += 1
+            self.process = subprocess.Popen(
+                ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-r", str(self.rate), "-c", "1", "-D", self.device],
+                stdin=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        return self.process
+
+    def start(self):
+        with self.lock:
+            self._ensure_process()
+        return self
+
+    def play(self, pcm, wait=True, cancel_event=None):
+        """
+        Write PCM to the speaker. With wait=True, returns once the audio
+        has had time to play out. If cancel_event is set meanwhile the
+        speaker is cut off and False is returned.
+        """
+        with self.lock:
+            process = self._ensure_process()
+            start = time.monotonic()
+            try:
+                written = self._write(process, pcm, cancel_event)
+            except (BrokenPipeError, OSError):
+                # aplay died; start a new one and retry once
+                self._interrupt()
+                self.restarts += 1
+                try:
+                    process = self._ensure_process()
+                    start = time.monotonic()
+                    written = self._write(process, pcm, cancel_event)
+                except (BrokenPipeError, OSError) as e:
+                    print(f"Speaker write failed: {e}")
+                    self.process = None
+                    return False
+            if not written:
+                return False
+        if wait:
+            remaining = len(pcm) / (2 * self.rate) - (time.monotonic() - start)
+            if remaining > 0:
+                if cancel_event is None:
+                    time.sleep(remaining)
+                elif cancel_event.wait(remaining):
+                    self.interrupt()
+                    return False
+        return True
+
+    def _write(self, process, pcm, cancel_event):
+        # Caller holds self.lock. Small writes so a cancel is noticed while the pipe is full
+        for offset in range(0, len(pcm), SINK_WRITE_BYTES):
+            if cancel_event is not None and cancel_event.is_set():
+                self._interrupt()
+                return False
+            process.stdin.write(pcm[offset:offset + SINK_WRITE_BYTES])
+        process.stdin.flush()
+        return True
+
+    def interrupt(self):
+        """Cut off whatever is still buffered in the speaker."""
+        with self.lock:
+            self._interrupt()
+
+    def _interrupt(self):
+        # Caller holds self.lock. Killing aplay drops its ALSA buffer.
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+class TextToSpeech:
+    """Cached synthesis played through the persistent sink."""
+    def __init__(self):
+        self.cache = TTSCache()
+        self.sink = AudioSink()
+
+    def prewarm(self, phrases=TTS_PREWARM):
+        """Render canned phrases ahead of time and open the speaker."""
+        try:
+            self.sink.start()
+        except OSError as e:
+            print(f"Could not open the speaker: {e}")
+        for text, voice in phrases:
+            try:
+                self.cache.get(text, voice)
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                print(f"Could not pre-render '{text}': {e}")
+
+    def get_stats(self):
+        stats = self.cache.get_stats()
+        stats["sink_restarts"] = self.sink.restarts
+        return stats
+
+
+# Singleton instance for easy access
+_tts_instance = None
+_tts_lock = Lock()
+
+def get_tts():
+    """Get the text-to-speech singleton."""
+    global _tts_instance
+    with _tts_lock:
+        if _tts_instance is None:
+            _tts_instance = TextToSpeech()
+        return _tts_instance
@@ -0,0 +1,162 @@
+# robot/voice.py
+"""
+Voice capture pipeline for streamed chat recordings.
+Browser PCM chunks are resampled to 16 kHz mono, trimmed of leading
+and trailing silence by a frame-energy voice activity detector and
+wrapped as a streaming WAV for the transcription upload.
+"""
+import struct
+import time
+from threading import Lock
+import numpy as np
+from config import VOICE_SAMPLE_RATE, VOICE_VAD_MIN_RMS, VOICE_VAD_PREROLL, VOICE_VAD_HANGOVER
+
+
+class StreamResampler:
+    """
+    Linear-interpolation resampler that keeps its phase across chunks.
+    Downsampling averages each output period first to limit aliasing;
+    the filter carries its history across chunks, so chunk edges are
+    filtered exactly like the rest of the stream.
+    """
+    def __init__(self, in_rate, out_rate=VOICE_SAMPLE_RATE):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.step = in_rate / out_rate
+        self.width = int(self.step) if self.step > 1 else 1
+        self.kernel = np.ones(self.width, dtype=np.float32) / self.width
+        self.history = np.zeros(self.width - 1, dtype=np.float32)  # last raw samples, for the filter
+        self.position = 0.0          # next output position, in input samples
+        self.carry = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples):
+        """Resample a chunk of int16 (or float) samples; returns int16."""
+        if self.in_rate == self.out_rate:
+            return np.asarray(samples, dtype=np.int16)
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.width > 1:
+            # Moving average over one output period, continued from the last chunk
+            padded = np.concatenate([self.history, samples])
+            smoothed = np.convolve(padded, self.kernel, mode="valid")
+            self.history = padded[len(padded) - (self.width - 1):]
+        else:
+            smoothed = samples
+        data = np.concatenate([self.carry, smoothed])
+        positions = np.arange(self.position, len(data) - 1, self.step)
+        out = np.interp(positions, np.arange(len(data)), data)
+        # Keep the tail needed for the next chunk
+        consumed = int(positions[-1]) if len(positions) else 0
+        next_position = (positions[-1] + self.step) if len(positions) else self.position
+        keep_from = max(0, min(consumed, len(data) - 1) - int(self.step) - 1)
+        self.carry = data[keep_from:]
+        self.position = next_position - keep_from
+        return np.clip(out, -32768, 32767).astype(np.int16)
+
+
+class VoiceActivityTrimmer:
+    """
+    Streaming energy VAD that drops leading and trailing silence.
+    Audio before the first voiced frame is held back except for a short
+    pre-roll; silence after speech is only released if speech resumes,
+    apart from a short hangover at the end.
+    """
+    def __init__(self, rate=VOICE_SAMPLE_RATE, frame_ms=20, min_rms=VOICE_VAD_MIN_RMS,
+                 preroll=VOICE_VAD_PREROLL, hangover=VOICE_VAD_HANGOVER):
+        self.frame_len = int(rate * frame_ms / 1000)
+        self.min_rms = min_rms
+        self.preroll_frames = int(preroll * 1000 / frame_ms)
+        self.hangover_frames = int(hangover * 1000 / frame_ms)
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.silence = []            # silent frames not yet released
+        self.noise_floor = None
+        self.speaking = False
+        self.voiced_frames = 0
+        self.total_frames = 0
+
+    def _is_voiced(self, frame):
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        threshold = max(self.min_rms, self.noise_floor * 3)
+        voiced = rms > threshold
+        if not voiced:
+            # Track the background level slowly
+            self.noise_floor += 0.05 * (rms - self.noise_floor)
+        return voiced
+
+    def process(self, samples):
+        """Feed int16 samples; returns the int16 samples to keep so far."""
+        data = np.concatenate([self.pending, samples])
+        whole = len(data) // self.frame_len * self.frame_len
+        self.pending = data[whole:]
+        out = []
+        for start in range(0, whole, self.frame_len):
+            frame = data[start:start + self.frame_len]
+            self.total_frames += 1
+            if self._is_voiced(frame):
+                self.voiced_frames += 1
+                if not self.speaking:
+                    # Keep a little audio before speech onset
+                    self.silence = self.silence[-self.preroll_frames:] if self.preroll_frames else []
+                    self.speaking = True
+                out.extend(self.silence)
+                self.silence = []
+                out.append(frame)
+            else:
+                self.silence.append(frame)
+                if not self.speaking and len(self.silence) > self.preroll_frames:
+                    self.silence.pop(0)
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int16)
+
+    def flush(self):
+        """End of input: release the hangover after the last speech."""
+        if not self.speaking:
+            return np.zeros(0, dtype=np.int16)
+        tail = self.silence[:self.hangover_frames]
+        self.silence = []
+        return np.concatenate(tail) if tail else np.zeros(0, dtype=np.int16)
+
+
+def streaming_wav_header(rate=VOICE_SAMPLE_RATE, channels=1, bits=16):
+    """
+    WAV header for a stream of unknown length. The RIFF and data sizes
+    are 0xFFFFFFFF, which decoders read as "until end of stream".
+    """
+    block_align = channels * bits // 8
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, rate, rate * block_align, block_align, bits)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+# Upload counters per path, to compare the file upload against streaming
+_voice_stats_lock = Lock()
+voice_stats = {
+    "file": {"count": 0, "bytes": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "stream": {"count": 0, "bytes": 0, "total_ms": 0.0, "max_ms": 0.0}
+}
+
+def record_upload(path, bytes_uploaded, started_at):
+    """
+    Record one upload. `started_at` is when the user stopped speaking
+    (end of recording), so the time is the time to first transcript.
+    """
+    elapsed_ms = (time.monotonic() - started_at) * 1000
+    with _voice_stats_lock:
+        stats = voice_stats[path]
+        stats["count"] += 1
+        stats["bytes"] += bytes_uploaded
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+def get_voice_stats():
+    """Average bytes uploaded and time to first transcript per path."""
+    with _voice_stats_lock:
+        return {
+            path: {
+                "count": stats["count"],
+                "avg_bytes": round(stats["bytes"] / stats["count"]) if stats["count"] else None,
+                "avg_transcript_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else None,
+                "max_transcript_ms": round(stats["max_ms"], 1)
+            }
+            for path, stats in voice_stats.items()
+        }
@@ -1,5 +1,15 @@
 # run.py
-from main import app
+import argparse
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    parser = argparse.ArgumentParser(description="IXMonitor robot server")
+    parser.add_argument("--asgi", action="store_true",
+                        help="serve on an asyncio event loop (uvicorn) instead of Flask's threaded server")
+    args = parser.parse_args()
+
+    if args.asgi:
+        import uvicorn
+        uvicorn.run("asgi:app", host="0.0.0.0", port=5000)
+    else:
+        from main import app
+        app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
@@ -6,12 +6,25 @@ const btns = {
   stop: document.getElementById("stop")
 };
 let holdInterval = null;
+let teleopSocket = null;
+let teleopSeq = 0;
+function connectTeleop(){
+  const proto = location.protocol === "https:" ? "wss:" : "ws:";
+  teleopSocket = new WebSocket(`${proto}//${location.host}/teleop/ws`);
+  teleopSocket.onclose = ()=>{teleopSocket=null;setTimeout(connectTeleop,2000);};
+}
+connectTeleop();
 function sendCommand(direction){
-  fetch("/move",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({direction})});
+  if(teleopSocket && teleopSocket.readyState===WebSocket.OPEN){
+    teleopSocket.send(JSON.stringify({seq:++teleopSeq,direction}));
+  } else {
+    fetch("/move",{method:"POST",headers:{"Content-Type":"application/json"},body:JSON.stringify({direction})});
+  }
 }
 function startHold(direction){
   sendCommand(direction);
-  holdInterval = setInterval(()=>sendCommand(direction),200);
+  const open = teleopSocket && teleopSocket.readyState===WebSocket.OPEN;
+  holdInterval = setInterval(()=>sendCommand(direction),open?100:200);
 }
 function stopHold(){
   clearInterval(holdInterval);
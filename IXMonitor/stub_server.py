@@ -0,0 +1,55 @@
+# stub_server.py
+"""
+Local stand-in for the Windows AI server, for trying the robot without it.
+Answers the detection endpoints with a fixed face box after an optional
+artificial delay. Point WINDOWS_SERVER_BASE at http://<host>:8000 to use it.
+
+    python stub_server.py [--port 8000] [--delay 0.1]
+"""
+import argparse
+import io
+import time
+from flask import Flask, request, jsonify, Response
+from PIL import Image
+from robot.imaging import draw_boxes
+
+app = Flask(__name__)
+delay = 0.0
+
+# One face in the middle of the frame, normalized coordinates
+STUB_BOXES = [{"box": [0.35, 0.25, 0.65, 0.75], "label": "face", "score": 0.99}]
+
+
+def _read_image():
+    image = request.files["image"].read()
+    time.sleep(delay)
+    return image
+
+
+@app.route("/detect", methods=["POST"])
+def detect():
+    """Annotated JPEG, like the real server's image mode."""
+    return Response(draw_boxes(_read_image(), STUB_BOXES), mimetype="image/jpeg")
+
+
+@app.route("/detect/boxes", methods=["POST"])
+def detect_boxes():
+    """JSON boxes for the robot to draw itself."""
+    image = _read_image()
+    width, height = Image.open(io.BytesIO(image)).size
+    return jsonify({"boxes": STUB_BOXES, "width": width, "height": height})
+
+
+@app.route("/detect/check_person", methods=["POST"])
+def check_person():
+    _read_image()
+    return jsonify({"person_detected": True, "count": len(STUB_BOXES)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in detection server")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    delay = args.delay
+    app.run(host="0.0.0.0", port=args.port, threaded=True)
@@ -0,0 +1,14 @@
+# tests/conftest.py
+"""
+Shared test setup. The robot modules import the GoPiGo3, distance
+sensor and camera drivers at module level; off the robot those are
+replaced by simulated ones so the logic can run against simulations.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import simulated_hardware  # noqa: E402
+
+simulated_hardware.install()
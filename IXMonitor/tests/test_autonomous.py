@@ -0,0 +1,136 @@
+# tests/test_autonomous.py
+"""
+Autonomous loop against a simulated AI server with a fixed latency.
+Checks that pipelined mode captures and queries the server while the
+action runs, compares its action rate with the serial loop, and checks
+that stale prefetched decisions are never acted on.
+"""
+import io
+import time
+from threading import local
+import numpy as np
+from PIL import Image
+from robot import autonomous
+
+SERVER_LATENCY = 0.5  # seconds per decision, well above the 0.2 s pause
+ACTION_TIME = 0.2     # seconds per motion
+
+
+def _scene_jpeg(seed):
+    """A smooth random scene; different seeds give perceptually unrelated frames."""
+    coarse = np.random.default_rng(seed).integers(0, 256, (6, 8), dtype=np.uint8)
+    image = Image.fromarray(coarse, "L").resize((320, 240), Image.BICUBIC)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=80)
+    return out.getvalue()
+
+SCENES = [_scene_jpeg(seed) for seed in range(2)]
+
+
+class SimulatedRun:
+    """Camera, AI server and motors; the server answers with the action mapped to the scene it sees."""
+    def __init__(self, scene_actions=None, outcomes=None, scene_changes=None):
+        self.scene_actions = scene_actions or {0: "forward"}
+        self.outcomes = outcomes or {}            # action number -> execute_action outcome
+        self.scene_changes = scene_changes or {}  # action number -> scene shown after it
+        self.scene = 0
+        self.captures = []        # capture times
+        self.requests = []        # (actions taken so far, capture time of its frame, start time) per request
+        self.action_spans = []    # (start, end) of each action
+        self.thread = local()     # last capture of the calling thread, as decide follows capture
+
+    def capture(self, camera_instance, stream_output=None):
+        self.thread.captured_at = time.monotonic()
+        self.captures.append(self.thread.captured_at)
+        return SCENES[self.scene]
+
+    def decide(self, frame, goal, previous_actions, store=True):
+        self.requests.append((len(previous_actions), self.thread.captured_at, time.monotonic()))
+        time.sleep(SERVER_LATENCY)
+        action = self.scene_actions.get(SCENES.index(frame), "forward")
+        return {"success": True, "decision": {"action": action, "progress": "50%"}}
+
+    def execute(self, action, speed_mode="normal"):
+        start = time.monotonic()
+        time.sleep(ACTION_TIME)
+        self.action_spans.append((start, time.monotonic()))
+        number = len(self.action_spans)
+        self.scene = self.scene_changes.get(number, self.scene)
+        return self.outcomes.get(number, "done")
+
+
+class StubMotion:
+    def stop(self, priority=None):
+        return self
+
+    def wait(self):
+        return "done"
+
+
+def _simulate(monkeypatch, **options):
+    run = SimulatedRun(**options)
+    monkeypatch.setattr(autonomous, "capture_frame_from_camera", run.capture)
+    monkeypatch.setattr(autonomous, "get_autonomous_decision", run.decide)
+    monkeypatch.setattr(autonomous, "execute_action", run.execute)
+    monkeypatch.setattr(autonomous, "get_obstacle_distance", lambda: None)
+    monkeypatch.setattr(autonomous, "get_motion_executor", StubMotion)
+    monkeypatch.setattr(autonomous.server_client, "post", lambda *args, **kwargs: None)
+    return run
+
+
+def _run(monkeypatch, max_actions, pipelined=True, **options):
+    run = _simulate(monkeypatch, **options)
+    result = autonomous.autonomous_navigation_loop(None, "test", max_actions=max_actions, pipelined=pipelined)
+    return run, result, autonomous.get_autonomous_progress()
+
+
+def _steady_actions_per_min(run):
+    # From the first action on, so the first (always serial) decision is not counted
+    starts = [start for start, _ in run.action_spans]
+    return (len(starts) - 1) / (starts[-1] - starts[0]) * 60
+
+
+def test_prefetch_overlaps_the_running_action(monkeypatch):
+    run, _, progress = _run(monkeypatch, max_actions=4)
+    assert progress["prefetch_used"] == 3
+    # The capture and the request for action n+1 both start before action n ends
+    for taken, captured_at, requested_at in run.requests[1:]:
+        action_end = run.action_spans[taken - 1][1]
+        assert captured_at < action_end
+        assert requested_at < action_end
+
+
+def test_pipelined_beats_serial_at_fixed_latency(monkeypatch):
+    serial_run, _, _ = _run(monkeypatch, max_actions=5, pipelined=False)
+    pipelined_run, _, _ = _run(monkeypatch, max_actions=5)
+    serial = _steady_actions_per_min(serial_run)
+    pipelined = _steady_actions_per_min(pipelined_run)
+    print(f"serial {serial:.0f}/min, pipelined {pipelined:.0f}/min, {pipelined / serial:.2f}x")
+    # Serial: latency + action + pause; pipelined: the longer of latency and action + pause
+    assert pipelined / serial > 1.5
+
+
+def test_turns_get_no_prefetch(monkeypatch):
+    run, _, progress = _run(monkeypatch, max_actions=3, scene_actions={0: "left"})
+    assert progress["prefetch_used"] == 0
+    assert progress["prefetch_skipped"] == 2
+    assert len(run.requests) == 3
+
+
+def test_changed_scene_discards_prefetched_decision(monkeypatch):
+    # After action 2 the scene is replaced; the server would answer "stop" to it
+    _, result, progress = _run(monkeypatch, max_actions=4, scene_actions={0: "forward", 1: "stop"},
+                               scene_changes={2: 1})
+    assert progress["prefetch_discarded"] == 1
+    # The "forward" prefetched during action 2 was replaced by a decision on the new scene
+    assert result["action_history"] == ["forward", "forward", "stop", "stop"]
+
+
+def test_blocked_forward_cancels_prefetch(monkeypatch):
+    run, _, progress = _run(monkeypatch, max_actions=4, outcomes={2: "blocked"})
+    assert progress["prefetch_cancelled"] == 1
+    # Action 3 was decided inline, from a frame taken after the blocked move
+    assert progress["prefetch_used"] == 2
+    blocked_end = run.action_spans[1][1]
+    third_start = run.action_spans[2][0]
+    assert any(blocked_end <= t < third_start for t in run.captures)
@@ -0,0 +1,143 @@
+# tests/test_movement.py
+"""
+Monitored drives against a simulated robot and distance sensor.
+Checks that an obstacle stops the motors within the advertised
+worst-case latency and that a frozen sensor stops the drive.
+"""
+import time
+from threading import Event, Lock, Thread
+import pytest
+from robot import movement
+from robot.distance_sensor import DistanceSampler
+
+
+class SimulatedRobot:
+    """GoPiGo3 stand-in whose encoders advance with wall-clock time."""
+    WHEEL_CIRCUMFERENCE = 66.5 * 3.14159  # mm
+    MOTOR_LEFT = 1
+    MOTOR_RIGHT = 2
+
+    def __init__(self):
+        self.lock = Lock()
+        self.speed = movement.NORMAL_SPEED  # wheel degrees per second
+        self.position = 0.0                 # wheel degrees at `since`
+        self.since = time.monotonic()
+        self.target = None
+        self.stopped_at = None
+
+    def _advance(self):
+        now = time.monotonic()
+        if self.target is not None:
+            step = self.speed * (now - self.since)
+            self.position = min(self.target, self.position + step)
+        self.since = now
+
+    def set_speed(self, speed):
+        with self.lock:
+            self._advance()
+            self.speed = speed
+
+    def drive_cm(self, distance_cm, blocking=True):
+        with self.lock:
+            self._advance()
+            self.target = self.position + distance_cm * 10 / self.WHEEL_CIRCUMFERENCE * 360
+            self.stopped_at = None
+
+    def stop(self):
+        with self.lock:
+            self._advance()
+            self.target = None
+            if self.stopped_at is None:
+                self.stopped_at = time.monotonic()
+
+    def get_motor_encoder(self, motor):
+        with self.lock:
+            self._advance()
+            return self.position
+
+    def target_reached(self, target_left, target_right):
+        return self.get_motor_encoder(self.MOTOR_LEFT) >= target_left - 5
+
+    def travelled_cm(self):
+        return self.get_motor_encoder(self.MOTOR_LEFT) / 360 * self.WHEEL_CIRCUMFERENCE / 10
+
+
+class SimulatedSensor:
+    """Distance to a wall in front of the simulated robot, in cm. freeze() makes read() hang."""
+    def __init__(self, robot, wall_cm):
+        self.robot = robot
+        self.wall_cm = wall_cm
+        self.running = Event()
+        self.running.set()
+
+    def read(self):
+        self.running.wait()
+        return max(0, round(self.wall_cm - self.robot.travelled_cm()))
+
+    def closing_speed(self):
+        return 0.0
+
+    def freeze(self):
+        self.running.clear()
+
+
+@pytest.fixture
+def robot(monkeypatch):
+    simulated = SimulatedRobot()
+    monkeypatch.setattr(movement, "gpg", simulated)
+    # Closing-speed stops need the real sensor filter; these tests cover the threshold stop
+    monkeypatch.setattr(movement, "get_time_to_collision", lambda distance_cm=None: None)
+    return simulated
+
+
+def _use_sensor(monkeypatch, robot, wall_cm):
+    sensor = SimulatedSensor(robot, wall_cm)
+    sampler = DistanceSampler(sensor).start()
+    monkeypatch.setattr(movement, "get_distance_sampler", lambda: sampler)
+    sampler.get_reading()  # wait for the first sample
+    return sensor, sampler
+
+
+def test_drive_without_obstacle_reaches_target(monkeypatch, robot):
+    _use_sensor(monkeypatch, robot, wall_cm=200)
+    result = movement.drive_monitored(10, speed=movement.FAST_SPEED)
+    assert result["result"] == "reached"
+    assert robot.travelled_cm() == pytest.approx(10, abs=0.5)
+
+
+@pytest.mark.parametrize("speed", [movement.NORMAL_SPEED, movement.FAST_SPEED])
+def test_obstacle_stop_latency_is_bounded(monkeypatch, robot, speed):
+    sensor, _ = _use_sensor(monkeypatch, robot, wall_cm=45)
+    threshold_cm = 25
+    result = movement.drive_monitored(100, speed=speed, threshold_cm=threshold_cm)
+
+    assert result["result"] == "obstacle"
+    # Reading-to-stop latency stays within one sensor period plus one poll period
+    assert result["stop_latency_ms"] <= result["latency_bound_ms"]
+    # Crossing-to-stop: from the moment the robot really crossed the threshold
+    cm_per_s = speed / 360 * robot.WHEEL_CIRCUMFERENCE / 10
+    crossed_at = robot.stopped_at - (robot.travelled_cm() - (sensor.wall_cm - threshold_cm)) / cm_per_s
+    overshoot_ms = (robot.stopped_at - crossed_at) * 1000
+    # Readings are rounded to whole cm, allow that much travel on top of the bound
+    slack_ms = 1000 / cm_per_s + 20
+    assert overshoot_ms <= result["latency_bound_ms"] + slack_ms
+
+
+def test_frozen_sensor_stops_drive(monkeypatch, robot):
+    sensor, _ = _use_sensor(monkeypatch, robot, wall_cm=500)
+    frozen_at = {}
+
+    def freeze_later():
+        time.sleep(0.3)
+        sensor.freeze()
+        frozen_at["t"] = time.monotonic()
+
+    Thread(target=freeze_later, daemon=True).start()
+    result = movement.drive_monitored(100)
+
+    assert result["result"] == "sensor_stale"
+    # Last reading is at most one sensor period before the freeze
+    stop_after_ms = (robot.stopped_at - frozen_at["t"]) * 1000
+    poll_ms = 1000 / movement.DRIVE_MONITOR_HZ
+    assert stop_after_ms <= movement.DRIVE_SENSOR_MAX_AGE_MS + poll_ms + 20
+    assert robot.travelled_cm() < 100